@@ -50,7 +50,8 @@ setup(
         'tlol_rl.lib',
         'tlol_rl.maps',
         'tlol_rl.rpc',
-        'tlol_rl.run_configs'
+        'tlol_rl.run_configs',
+        'tlol_rl.transports'
     ],
     install_requires=[
         'absl-py>=0.1.0'
@@ -34,8 +34,26 @@ point_flag.DEFINE_point("feature_map_size", "16000",
                         "Resolution for screen feature layers.")
 point_flag.DEFINE_point("feature_move_range", "8",
                         "Resolution for screen feature layers.")
-flags.DEFINE_string("host", "localhost", "IP Host of Redis")
-flags.DEFINE_integer("redis_port", 6379, "IP Port of Redis")
+flags.DEFINE_string("host", "localhost", "IP Host of a shared Redis server")
+flags.DEFINE_integer("redis_port", 6379, "IP Port of a shared Redis server")
+flags.DEFINE_string("redis_prefix", "", "Prefix of this agent's Redis keys")
+flags.DEFINE_integer("redis_db", 0, "Redis logical database of this agent")
+flags.DEFINE_bool("spawn_redis", True,
+    "Start a Redis server, rather than sharing the one at host:redis_port")
+flags.DEFINE_string("redis_socket", None,
+    "Unix domain socket for the Redis server started for this agent")
+flags.DEFINE_enum("transport", "redis", ["redis", "redis_streams", "shm", "tcp"],
+    "Transport between the environment and the TLoL-RL server")
+flags.DEFINE_bool("latest_only", False,
+    "Only keep the newest observation if the agent falls behind")
+flags.DEFINE_integer("keyframe_interval", 0,
+    "Send full observations this often and deltas in between, 0 to disable")
+flags.DEFINE_integer("action_repeat", 1,
+    "Number of game ticks each action is applied for per step")
+flags.DEFINE_list("reset_keys", [],
+    "Scan codes of the practice tool hotkeys pressed on reset, e.g. 59,60")
+flags.DEFINE_integer("reset_ticks", 1,
+    "Ticks to let a reset settle before the first observation")
 flags.DEFINE_integer("max_episodes", 0, "Maximum number of episodes to run")
 flags.DEFINE_integer("max_steps", 0, "Maximum number of steps to run")
 flags.DEFINE_string("config_path", "./config.txt",
@@ -58,7 +76,17 @@ def main(unused_argv):
             feature_map=FLAGS.feature_map_size,
             feature_move_range=FLAGS.feature_move_range),
         map_name=FLAGS.map,
-        config_path=FLAGS.config_path) as env:
+        config_path=FLAGS.config_path,
+        transport=FLAGS.transport,
+        transport_kwargs={"latest_only": FLAGS.latest_only},
+        keyframe_interval=FLAGS.keyframe_interval,
+        redis_prefix=FLAGS.redis_prefix,
+        redis_db=FLAGS.redis_db,
+        spawn_redis=FLAGS.spawn_redis,
+        redis_socket=FLAGS.redis_socket,
+        action_repeat=FLAGS.action_repeat,
+        reset_keys=[int(k) for k in FLAGS.reset_keys],
+        reset_ticks=FLAGS.reset_ticks) as env:
         
         run_loop.run_loop(agents, env, FLAGS.max_steps, FLAGS.max_episodes)
 
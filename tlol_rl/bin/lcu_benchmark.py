@@ -0,0 +1,76 @@
+# MIT License
+# 
+# Copyright (c) 2023 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Benchmark the latency of setting up a custom game lobby through the LCU
+API, against a local mock of the client."""
+
+import collections
+import time
+
+from absl import flags
+from absl import app
+import numpy as np
+
+from tlol_rl.lib import mock_lcu
+
+FLAGS = flags.FLAGS
+flags.DEFINE_integer("rounds", 20, "Number of lobbies to set up")
+flags.DEFINE_float("latency", 0.0, "Seconds the mock takes to answer a request")
+flags.DEFINE_float("transition_delay", 0.05,
+    "Seconds until the mock applies a change to the lobby")
+flags.DEFINE_bool("events", True,
+    "Wait for changes with the event feed rather than polling")
+
+def main(unused_argv):
+    timings = collections.defaultdict(list)
+    with mock_lcu.MockLCU(latency=FLAGS.latency,
+                          transition_delay=FLAGS.transition_delay) as mock:
+        lcu = mock.lcu(events=FLAGS.events, timeout=2)
+        lcu.wait_ready(timeout=10)
+        print("Waiting for changes with %s." % (
+            "the event feed" if lcu.subscribe() else "polling"))
+
+        steps = [
+            ("create_custom", lambda: lcu.create_custom(title="TLoL-RL")),
+            ("add_bot", lcu.add_bot),
+            ("start_champ_select", lcu.start_champ_select),
+            ("pick_champion", lambda: lcu.pick_champion(champ_id=22))
+        ]
+        for _ in range(FLAGS.rounds):
+            round_start = time.perf_counter()
+            for name, step in steps:
+                start = time.perf_counter()
+                res = step()
+                if not res.ok:
+                    raise RuntimeError("%s failed: %d %s" % (name, res.status_code, res.text))
+                timings[name].append(time.perf_counter() - start)
+            timings["total"].append(time.perf_counter() - round_start)
+        requests = mock.requests
+        lcu.close()
+
+    print("%-20s %10s %10s" % ("", "mean (ms)", "p50 (ms)"))
+    for name, values in timings.items():
+        print("%-20s %10.2f %10.2f" % (
+            name, 1000 * np.mean(values), 1000 * np.median(values)))
+    print("%d requests served for %d lobbies." % (requests, FLAGS.rounds))
+
+if __name__ == "__main__":
+    app.run(main)
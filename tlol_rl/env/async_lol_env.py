@@ -0,0 +1,91 @@
+# MIT License
+# 
+# Copyright (c) 2023 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""A League of Legends environment driven by asyncio."""
+
+import asyncio
+
+from absl import logging
+
+from tlol_rl.env import environment
+from tlol_rl.env import lol_env
+from tlol_rl.lib import async_remote_controller
+
+
+class AsyncLoLEnv(lol_env.LoLEnv):
+    """A `LoLEnv` whose `connect`, `reset` and `step` are coroutines.
+
+    Its controllers are `AsyncRemoteController`s, so many environments can
+    run in one event loop without a thread per game, e.g. interleaved with
+    requests to an async inference server. Only the `redis` transport is
+    supported. Takes the same arguments as `LoLEnv`.
+    """
+
+    controller_cls = async_remote_controller.AsyncRemoteController
+
+    async def connect(self):
+        """Wait until every controller is connected to its game."""
+        await asyncio.gather(*(c.connect() for c in self._controllers))
+
+    async def aclose(self):
+        """Close the asyncio clients of the controllers, then the
+        environment. The game is only shut down if the environment launched
+        it, see `LoLEnv.close`."""
+        if getattr(self, "_game", None) is None:
+            return
+        await asyncio.gather(*(c.aclose_transport() for c in self._controllers))
+        self.close()
+
+    async def reset(self):
+        """Starts a new episode."""
+        self._episode_steps = 0
+
+        # No need to restart for the first episode
+        if self._episode_count:
+            self._restart()
+
+        self._episode_count += 1
+
+        # Warm reset the game of every controller in place
+        await asyncio.gather(*(c.players_reset() for c in self._controllers))
+
+        logging.info("Starting episode %s: on %s" % (self._episode_count, self._map_name))
+        self._state = environment.StepType.FIRST
+
+        obs = await asyncio.gather(*(c.observe() for c in self._controllers))
+        return self._observe(list(obs))
+
+    async def step(self, actions):
+        """Apply actions, step the world forward, and return observations.
+        See `LoLEnv.step`."""
+        logging.info("Current env._state: " + str(self._state))
+        if self._state == environment.StepType.LAST:
+            return await self.reset()
+
+        batches = self._action_batches(actions)
+
+        # Send the actions and wait for the next observations concurrently
+        obs = await asyncio.gather(*(
+            c.step(batch) for c, batch in zip(self._controllers, batches)))
+
+        logging.info("post_actions")
+
+        return self._post_step(list(obs))
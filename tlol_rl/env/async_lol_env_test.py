@@ -0,0 +1,106 @@
+# MIT License
+# 
+# Copyright (c) 2023 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Tests for the asyncio League of Legends environment."""
+
+import asyncio
+
+from absl.testing import absltest
+
+from tlol_rl.env import async_lol_env
+from tlol_rl.env import lol_env
+
+PLAYERS = [lol_env.Agent(champion="Ezreal", team="BLUE")]
+MAP_NAME = "Summoners Rift"
+
+
+class FakeController(object):
+    """Stands in for an `AsyncRemoteController`."""
+
+    def __init__(self):
+        self.transport_closed = False
+        self.closed = False
+
+    async def aclose_transport(self):
+        self.transport_closed = True
+
+    async def aclose(self):
+        await self.aclose_transport()
+        self.close()
+
+    def close(self):
+        self.closed = True
+
+
+class FakeProcess(object):
+
+    def __init__(self):
+        self.controller = FakeController()
+
+    def close(self):
+        self.controller.close()
+
+
+def fake_game():
+    return lol_env.Game(procs=[FakeProcess()], players=PLAYERS, map_name=MAP_NAME)
+
+
+class FakeAsyncLoLEnv(async_lol_env.AsyncLoLEnv):
+
+    @classmethod
+    def launch_game(cls, players, map_name, **kwargs):
+        return fake_game()
+
+
+def make_env(game=None):
+    return FakeAsyncLoLEnv(
+        players=PLAYERS,
+        agent_interface_format=lol_env.parse_agent_interface_format(
+            feature_map=16000, feature_move_range=8),
+        map_name=MAP_NAME,
+        game=game)
+
+
+class AsyncLoLEnvCloseTest(absltest.TestCase):
+
+    def test_aclose_shuts_down_launched_game(self):
+        env = make_env()
+        controller = env._controllers[0]
+        asyncio.run(env.aclose())
+        self.assertTrue(controller.transport_closed)
+        self.assertTrue(controller.closed)
+
+    def test_aclose_leaves_leased_game(self):
+        game = fake_game()
+        env = make_env(game)
+        asyncio.run(env.aclose())
+        controller = game.controllers[0]
+        self.assertTrue(controller.transport_closed)
+        self.assertFalse(controller.closed)
+
+    def test_aclose_twice(self):
+        env = make_env()
+        asyncio.run(env.aclose())
+        asyncio.run(env.aclose())
+
+
+if __name__ == "__main__":
+    absltest.main()
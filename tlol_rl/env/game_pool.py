@@ -0,0 +1,215 @@
+# MIT License
+# 
+# Copyright (c) 2023 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""A pool of launched games which environments lease, so creating an
+environment doesn't have to wait for a game to launch."""
+
+from concurrent import futures
+import queue
+import threading
+
+from absl import logging
+
+from tlol_rl.env import lol_env
+
+
+class GamePoolError(Exception):
+    pass
+
+
+class GamePool(object):
+    """Keeps `size` games launched and joined, ready for environments to
+    attach to.
+
+    Leasing a game hands out one which is already waiting, and launches a
+    replacement in the background. A returned game is kept for the next
+    lease if the pool is short of one, as the environment attached to it
+    warm resets it, otherwise it's shut down.
+
+    Example:
+        with GamePool(4, players=players, map_name="Summoners Rift",
+                      config_path="./config.txt") as pool:
+            game = pool.lease()
+            env = lol_env.LoLEnv(players=players, map_name="Summoners Rift",
+                                 agent_interface_format=aif, game=game)
+            ...
+            pool.release(game)
+
+    Args:
+        size: Number of games to keep ready.
+        players: A list of Agent instances that specify who is playing.
+        map_name: Name of a League of Legends map.
+        env_cls: The environment class the games are launched for, e.g.
+            `AsyncLoLEnv`, which decides their controllers.
+        max_workers: Number of games launched at once. Defaults to one, as
+            every launch drives the same League client through the LCU.
+        max_retries: Number of times a failed launch is retried before the
+            error is handed to the next `lease`.
+        **launch_kwargs: The launch arguments of `LoLEnv.launch_game`, e.g.
+            `config_path` or `transport`.
+    """
+
+    def __init__(self,
+                 size,
+                 players,
+                 map_name,
+                 env_cls=lol_env.LoLEnv,
+                 max_workers=1,
+                 max_retries=2,
+                 **launch_kwargs):
+        if size < 1:
+            raise ValueError("size must be at least 1. Got: %s." % size)
+        self._size = size
+        self._players = players
+        self._map_name = map_name
+        self._env_cls = env_cls
+        self._max_retries = max_retries
+        self._launch_kwargs = launch_kwargs
+
+        self._lock = threading.Lock()
+        self._ready = queue.Queue()
+        self._launching = 0
+        self._leased = {} # By id, as games aren't hashable
+        self._closed = False
+        self._pool = futures.ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="GamePool")
+
+        for _ in range(size):
+            self._replenish()
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def num_ready(self):
+        """Number of games waiting to be leased."""
+        return self._ready.qsize()
+
+    @property
+    def num_leased(self):
+        return len(self._leased)
+
+    def lease(self, timeout=None):
+        """Take a ready game, waiting for one to finish launching if none is.
+
+        Args:
+            timeout: Seconds to wait for a game, or None to wait forever.
+
+        Returns:
+            A `lol_env.Game`, to pass as the `game` of an environment.
+
+        Raises:
+            GamePoolError: If the pool is closed, no game was ready within
+                `timeout` or the game failed to launch.
+        """
+        if self._closed:
+            raise GamePoolError("The game pool is closed.")
+        try:
+            game = self._ready.get(timeout=timeout)
+        except queue.Empty:
+            raise GamePoolError("No game was ready within %s seconds." % timeout)
+
+        # Start on the replacement before handing the game out
+        self._replenish()
+
+        if isinstance(game, Exception):
+            raise GamePoolError("Game failed to launch: %s" % game) from game
+        with self._lock:
+            self._leased[id(game)] = game
+        logging.info("GamePool leased a game, %d ready, %d leased." % (
+            self.num_ready, self.num_leased))
+        return game
+
+    def release(self, game, reuse=True):
+        """Return a leased game to the pool.
+
+        Args:
+            game: A game returned by `lease`.
+            reuse: Whether the game can be leased again. Set to False if it's
+                in a bad state, e.g. its environment failed, to shut it down.
+        """
+        with self._lock:
+            if self._leased.pop(id(game), None) is None:
+                raise ValueError("Game wasn't leased from this pool: %s" % (game,))
+            keep = (reuse and not self._closed and
+                    self._ready.qsize() + self._launching < self._size)
+        if keep:
+            self._ready.put(game)
+        else:
+            game.close()
+
+    def close(self):
+        """Shut down every game, including those still leased."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            leased, self._leased = self._leased, {}
+
+        # Wait for the launches in progress, which then shut down their games
+        self._pool.shutdown(wait=True)
+        for game in leased.values():
+            game.close()
+        while True:
+            try:
+                game = self._ready.get_nowait()
+            except queue.Empty:
+                break
+            if not isinstance(game, Exception):
+                game.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, unused_exception_type, unused_exc_value, unused_traceback):
+        self.close()
+
+    def _replenish(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._launching += 1
+            self._pool.submit(self._launch)
+
+    def _launch(self):
+        """Launch a game in the background and queue it, or the error which
+        stopped it launching."""
+        game = None
+        for attempt in range(self._max_retries + 1):
+            try:
+                game = self._env_cls.launch_game(players=self._players,
+                                                 map_name=self._map_name,
+                                                 **self._launch_kwargs)
+                break
+            except Exception as e:
+                logging.exception("GamePool failed to launch a game (attempt %d)." % (
+                    attempt + 1))
+                game = e
+
+        with self._lock:
+            self._launching -= 1
+            closed = self._closed
+        if closed and not isinstance(game, Exception):
+            game.close()
+        else:
+            self._ready.put(game)
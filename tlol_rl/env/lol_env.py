@@ -33,6 +33,8 @@ from tlol_rl.env import environment
 from tlol_rl.lib.lcu import LCU
 from tlol_rl.lib import features
 from tlol_rl.lib import common
+from tlol_rl.lib import lobby
+from tlol_rl.lib import startup
 
 def to_list(arg):
     return arg if isinstance(arg, list) else [arg]
@@ -42,6 +44,19 @@ class Team(enum.IntEnum):
     PURPLE = 1
     NEUTRAL = 2
 
+# In-game ids of each team, as found in the `team` of game objects
+TEAM_IDS = {
+    Team.BLUE: 100,
+    Team.PURPLE: 200,
+    Team.NEUTRAL: 300
+}
+
+def team_id(team):
+    """Get the in-game id of a `Team`, or of a team name such as "BLUE"."""
+    if isinstance(team, str):
+        team = Team[team.upper()]
+    return TEAM_IDS[Team(team)]
+
 def get_champ_ids():
     champ_ids = {}
     with open(Path(__file__).parent / "./champ_ids.txt") as f:
@@ -57,6 +72,61 @@ class Agent(collections.namedtuple("Agent", ["champ", "team"])):
         return super(Agent, cls).__new__(cls, champion, team)
 
 
+class Bot(collections.namedtuple("Bot", ["champ", "team", "difficulty"])):
+    """Define a Bot, which the client plays. Each bot has a champion, which
+    team it belongs to and a difficulty."""
+    def __new__(cls, champion, team="PURPLE", difficulty="MEDIUM"):
+        return super(Bot, cls).__new__(cls, champion, team, difficulty)
+
+
+# Bots of a game, unless an environment specifies them
+DEFAULT_BOTS = [Bot(champion="Galio")]
+
+
+class Game(collections.namedtuple("Game", ["procs", "players", "map_name", "timeline"],
+                                  defaults=(None,))):
+    """A launched game which the players have joined, ready for a `LoLEnv`
+    to attach to. See `LoLEnv.launch_game`. Its `timeline` is the
+    `startup.Timeline` of launching it."""
+
+    @property
+    def controllers(self):
+        return [p.controller for p in self.procs]
+
+    def close(self):
+        """Shut down the game and clean up its processes."""
+        for p in self.procs:
+            p.close()
+
+
+def load_run_config(config_path):
+    """Get the `RunConfig` for the directories in the configuration file."""
+    try:
+        with open(config_path) as f:
+            cfg = ConfigParser()
+            cfg.read_string(f.read())
+            tlol_rl_server = cfg.get("dirs", "tlol_rl_server")
+            lol_client     = cfg.get("dirs", "lol_client")
+            logging.info("TLoL-RL Server (Directory): " + tlol_rl_server)
+            logging.info("League of Legends Client (Directory): " + lol_client)
+    except:
+        raise IOError("Could not open config file: '%s'" % config_path)
+    return run_configs.get(lol_client, tlol_rl_server)
+
+
+def _create_join(lcu, players, bots=None):
+    """Create the custom game with the bots, and join it. `lcu` must be
+    ready, see `LCU.wait_ready`. Each step waits until the client applied
+    it."""
+    champ_ids = get_champ_ids()
+    bots = [lobby.Bot(champ_ids[b.champ], team_id(b.team), b.difficulty)
+            for b in (DEFAULT_BOTS if bots is None else bots)]
+    lobby.LobbyBuilder(lcu).build(
+        champ_id=champ_ids[players[0].champ],
+        bots=bots,
+        team_id=team_id(players[0].team))
+
+
 Dimensions = features.Dimensions
 AgentInterfaceFormat = features.AgentInterfaceFormat
 parse_agent_interface_format = features.parse_agent_interface_format
@@ -68,13 +138,29 @@ class LoLEnv(environment.Base):
     The implementation details ofthe action and observation specs
     are in lib/features.py
     """
+
+    # `RemoteController` subclass of the games launched for this environment
+    controller_cls = None
+
     def __init__(self,
                  host=None,
                  redis_port=None,
                  players=None,
                  agent_interface_format=None,
                  map_name=None,
-                 config_path=""):
+                 config_path="",
+                 transport="redis",
+                 transport_kwargs=None,
+                 keyframe_interval=0,
+                 redis_prefix="",
+                 redis_db=0,
+                 spawn_redis=True,
+                 redis_socket=None,
+                 action_repeat=1,
+                 game=None,
+                 bots=None,
+                 reset_keys=None,
+                 reset_ticks=1):
         """Create a League of Legends environment.
         
         Args:
@@ -83,8 +169,45 @@ class LoLEnv(environment.Base):
             players: A list of Agent instances that specify who is playing.
             config_path: Path to configuration file containing directories
             as specified in README.md.
+            bots: A list of Bot instances to add to the game, e.g. to fill
+            both teams of a 5v5. Defaults to `DEFAULT_BOTS`.
+            transport: Name of the transport used to talk to the TLoL-RL
+            server, e.g. `redis`, `redis_streams`, `shm` or `tcp` (see
+            `tlol_rl.transports`).
+            transport_kwargs: Extra settings for the transport, e.g.
+            `{"skip_backlog": True}` for `redis_streams`.
+            keyframe_interval: If above 0, the TLoL-RL server sends a full
+            observation every `keyframe_interval` observations and only the
+            changed object table rows in between.
+            redis_prefix: Prefix of the Redis keys of this environment, which
+            must be unique per environment sharing a Redis server.
+            redis_db: Redis logical database of this environment.
+            spawn_redis: Whether to start a Redis server for this
+            environment, listening on a free loopback port, rather than
+            using a shared one at `host` and `redis_port`.
+            redis_socket: Unix domain socket path for the Redis server, which
+            is then used instead of TCP.
+            action_repeat: Number of observation ticks the TLoL-RL server
+            keeps applying each step's actions for before it sends the next
+            observation, so one `step` spans `action_repeat` ticks.
+            reset_keys: Scan codes of the practice tool hotkeys which the
+            TLoL-RL server presses to restore the champion and the target
+            dummy when an episode is reset, e.g. refill health and mana and
+            reset cooldowns, as bound in the client. Without them, a reset
+            only teleports our champion back to the start.
+            reset_ticks: Number of ticks the TLoL-RL server lets a reset
+            settle before the first observation of the new episode.
+            game: A `Game` to attach to, e.g. one leased from a `GamePool`,
+            rather than launching a new one. Its players and map must match
+            `players` and `map_name`, and the launch arguments above are
+            ignored.
         """
 
+        if not 1 <= action_repeat <= 255:
+            raise ValueError(
+                "action_repeat must be in [1, 255]. Got: %s." % action_repeat)
+        self._action_repeat = action_repeat
+
         # Get and validate players
         if not players:
             raise ValueError("You must specify a list of players.")
@@ -106,31 +229,29 @@ class LoLEnv(environment.Base):
         if not map_name:
             raise ValueError("Missing a map name.")
         
-        # Extract configuration directories
-        try:
-            with open(config_path) as f:
-                cfg = ConfigParser()
-                cfg.read_string(f.read())
-                tlol_rl_server = cfg.get("dirs", "tlol_rl_server")
-                lol_client     = cfg.get("dirs", "lol_client")
-                logging.info("TLoL-RL Server (Directory): " + tlol_rl_server)
-                logging.info("League of Legends Client (Directory): " + lol_client)
-        except:
-            raise IOError("Could not open config file: '%s'" % config_path)
-
         # Store environment variables
         self._map_name   = map_name
-        self._run_config = run_configs.get(lol_client, tlol_rl_server)
         self._game_info  = None
-        self._lcu        = LCU(timeout=2)
 
         # Launch the client, create a custom game and join it
-        self._launch_game(host=host,
-                          redis_port=redis_port,
-                          players=players,
-                          map_name=map_name)
-        self._create_join(players=players,
-                          map_name=map_name)
+        self._owns_game = game is None
+        if game is None:
+            game = self.launch_game(players=players,
+                                    map_name=map_name,
+                                    config_path=config_path,
+                                    host=host,
+                                    redis_port=redis_port,
+                                    transport=transport,
+                                    transport_kwargs=transport_kwargs,
+                                    keyframe_interval=keyframe_interval,
+                                    redis_prefix=redis_prefix,
+                                    redis_db=redis_db,
+                                    spawn_redis=spawn_redis,
+                                    redis_socket=redis_socket,
+                                    reset_keys=reset_keys,
+                                    reset_ticks=reset_ticks,
+                                    bots=bots)
+        self._attach(game)
 
         # Finalise RL related variables for the environment
         self._finalise()
@@ -150,8 +271,15 @@ class LoLEnv(environment.Base):
     
     def close(self):
         """Cleanly closes the environment by releasing/destroying
-        resources which are no longer being used."""
-        pass
+        resources which are no longer being used. The game is shut down
+        if the environment launched it, while a `game` it was given, e.g.
+        one leased from a `GamePool`, is left to its owner."""
+        game = getattr(self, "_game", None)
+        if game is None:
+            return
+        self._game = None
+        if self._owns_game:
+            game.close()
 
     def _restart(self):
         # Restart the TLoL-RL server controllers
@@ -168,20 +296,45 @@ class LoLEnv(environment.Base):
 
         self._episode_count += 1
 
-        self._controllers[0].players_reset()
+        # Warm reset the game of every controller in place
+        for c in self._controllers:
+            c.players_reset()
 
         logging.info("Starting episode %s: on %s" % (self._episode_count, self._map_name))
         self._state = environment.StepType.FIRST
 
         return self._observe()
     
-    def _get_observations(self):
+    def _agent_controllers(self):
+        """Index of the controller of each agent. Each agent has its own
+        controller, unless there's only one, which all of them share."""
+        if len(self._controllers) == 1:
+            return [0] * self._num_agents
+        if len(self._controllers) != self._num_agents:
+            raise ValueError("Expected one controller per agent, got %d for %d agents." % (
+                len(self._controllers), self._num_agents))
+        return list(range(self._num_agents))
+
+    def _get_observations(self, obs=None):
         """Get the raw observations from the controllers and
-        convert them into NumPy arrays."""
+        convert them into NumPy arrays.
+
+        A single observation is received per controller and frame, then
+        fanned out into a view per agent from the perspective of its team.
+
+        Args:
+            obs: Raw observations, one per controller, which have already
+                been received (e.g. by `RemoteController.step`). Only the
+                missing observations are requested from the controllers.
+        """
         logging.info("_get_observations request and transform")
 
-        obs = [self._controllers[0].observe() for _ in self.players]
-        agent_obs = [self._features[0].transform_obs(o) for o in obs]
+        obs = list(obs or [])
+        obs.extend(c.observe() for c in self._controllers[len(obs):])
+        agent_controllers = self._agent_controllers()
+        obs = [obs[i] for i in agent_controllers]
+        agent_obs = [self._features[0].transform_obs(o, team=team_id(p.team))
+                     for o, p in zip(obs, self.players)]
         
         logging.info("_get_observations received")
 
@@ -191,10 +344,10 @@ class LoLEnv(environment.Base):
         # Set new observations
         self._obs, self._agent_obs = obs, agent_obs
 
-    def _observe(self):
+    def _observe(self, obs=None):
         """Take the NumPy arrays from the raw observations and
         convert them into `TimeStep`s."""
-        self._get_observations()
+        self._get_observations(obs)
 
         reward = [0] * self._num_agents
 
@@ -211,9 +364,9 @@ class LoLEnv(environment.Base):
 
         return ret_val
 
-    def _step(self):
+    def _step(self, obs=None):
         logging.info("_step")
-        return self._observe()
+        return self._observe(obs)
 
     def step(self, actions):
         """Apply actions, step the world forward, and return observations.
@@ -230,57 +383,73 @@ class LoLEnv(environment.Base):
         if self._state == environment.StepType.LAST:
             return self.reset()
         
-        new_actions = []
-        for _, a in zip(self._obs, actions):
-            # print("CURRENT OBS ENV STEP:", o)
-            new_actions.append(self._features[0].transform_action(a))
+        batches = self._action_batches(actions)
 
-        logging.info("new_actions: " + str(new_actions))
-
-        for c, a in zip(self._controllers, actions):
-            c.actions(common.RequestAction(actions=new_actions))
+        # Send the actions and wait for the next observation in one round trip
+        obs = [c.step(batch) for c, batch in zip(self._controllers, batches)]
 
         logging.info("post_actions")
 
+        return self._post_step(obs)
+
+    def step_async(self, actions):
+        """Send actions without waiting for the resulting observations, so
+        the caller can do other work (e.g. run its policy on another batch)
+        until it calls `step_wait`.
+
+        Args:
+            actions: The actions, as passed to `step`.
+        """
+        if self._pending_step is not None:
+            raise RuntimeError("step_async was called twice without step_wait.")
+
+        logging.info("Current env._state: " + str(self._state))
+        if self._state == environment.StepType.LAST:
+            # The next episode is started by `step_wait`
+            self._pending_step = []
+            return
+
+        batches = self._action_batches(actions)
+        self._pending_step = self._controllers
+        for c, batch in zip(self._controllers, batches):
+            c.step_async(batch)
+
+    def step_wait(self):
+        """Wait for the observations following `step_async`.
+
+        Returns:
+            A tuple of TimeStep namedtuples, one per agent."""
+        if self._pending_step is None:
+            raise RuntimeError("step_wait was called without step_async.")
+
+        controllers, self._pending_step = self._pending_step, None
+        if self._state == environment.StepType.LAST:
+            return self.reset()
+
+        return self._post_step([c.step_wait() for c in controllers])
+
+    def _action_batches(self, actions):
+        """Transform the actions of each agent and group them into one
+        `RequestAction` per controller. Every controller gets a batch, even
+        an empty one, so each of them steps once per frame."""
+        batches = [[] for _ in self._controllers]
+        for i, a in zip(self._agent_controllers(), actions):
+            batches[i].append(self._features[0].transform_action(a))
+
+        logging.info("new_actions: " + str(batches))
+        return [common.RequestAction(actions=batch, repeat=self._action_repeat)
+                for batch in batches]
+
+    def _post_step(self, obs):
+        """Turn the observations received after a step into `TimeStep`s."""
         self._state = environment.StepType.MID
 
-        _step = self._step()
+        _step = self._step(obs)
 
         logging.info("_step (obs): " + str(_step))
 
         return _step
 
-    def _create_join(self, **kwargs):
-        """Create the custom game, and join it."""
-        if not self._lcu.client_loaded():
-            raise OSError("Could not find League of Legends client")
-        else:
-            # Initialise LCU with `remoting-auth-token` and `app-port`
-            self._lcu.late_init()
-
-            # Create custom game
-            res = self._lcu.create_custom(title="TLoL-RL", map_id=11)
-            if not res.status_code == 200:
-                raise RuntimeError("Could not create custom game")
-
-            # Add bots
-            res = self._lcu.add_bot()
-            if not res.status_code == 204:
-                raise RuntimeError("Could not add bots to custom game")
-
-            # Start champion select
-            res = self._lcu.start_champ_select()
-            print(res.status_code, res.text)
-            if not res.status_code == 200:
-                raise RuntimeError("Could not start champion select")
-            
-            # Select champion
-            champ_ids = get_champ_ids()
-            res = self._lcu.pick_champion(
-                champ_id=champ_ids[kwargs["players"][0].champ]) # Aphelios
-            if not res.status_code == 204:
-                raise RuntimeError("Could not pick champion")
-
     def _finalise(self):
         # Init episode / step counts
         self._total_steps = 0
@@ -298,14 +467,66 @@ class LoLEnv(environment.Base):
         self._agent_obs = [None] * self._num_agents
         self._state = environment.StepType.LAST
 
+        # Controllers waiting for the observations of a `step_async`
+        self._pending_step = None
+
         logging.info("Environment is ready.")
     
-    def _launch_game(self, **kwargs):
-        """Either launch or attach to an existing game."""
+    @classmethod
+    def launch_game(cls, players, map_name, config_path="", bots=None, **kwargs):
+        """Launch the client, create a custom game and have the players
+        join it, ready for an environment to attach to.
+
+        The TLoL-RL server and its transport start up while the client is
+        still loading, and each step only waits until what it needs is
+        ready. The startup timeline is logged and kept in the `Game`.
+
+        Args:
+            players: A list of Agent instances that specify who is playing.
+            map_name: Name of a League of Legends map.
+            config_path: Path to configuration file containing directories
+            as specified in README.md.
+            bots: A list of Bot instances to add to the game.
+            **kwargs: The launch arguments of `LoLEnv`, e.g. `transport`.
+
+        Returns:
+            A `Game`.
+        """
         logging.info("Initialising/attaching a game")
 
-        kwargs["host"] = kwargs["host"]
-        kwargs["redis_port"] = kwargs["redis_port"]
+        run_config = load_run_config(config_path)
+        if cls.controller_cls:
+            kwargs["controller_cls"] = cls.controller_cls
 
-        self._lol_procs   = [self._run_config.start(**kwargs)]
-        self._controllers = [p.controller for p in self._lol_procs]
\ No newline at end of file
+        lcu = LCU(timeout=2,
+                  client_dir=getattr(run_config, "riot_client_dir", None))
+
+        launch = startup.Startup()
+        launch.add("processes", lambda: run_config.start(players=players,
+                                                         map_name=map_name,
+                                                         **kwargs))
+        launch.add("client", lcu.wait_ready)
+        launch.add("lobby", lambda: _create_join(lcu, players, bots),
+                   after=("processes", "client"))
+        try:
+            results = launch.run()
+        except:
+            if "processes" in launch.results:
+                launch.results["processes"].close()
+            raise
+        finally:
+            lcu.close()
+
+        return Game(procs=[results["processes"]],
+                    players=list(players),
+                    map_name=map_name,
+                    timeline=launch.timeline)
+
+    def _attach(self, game):
+        """Take control of a launched `Game`."""
+        if list(game.players) != list(self.players) or game.map_name != self._map_name:
+            raise ValueError("Game of %s on %s doesn't match players %s on %s." % (
+                game.players, game.map_name, self.players, self._map_name))
+        self._game        = game
+        self._lol_procs   = game.procs
+        self._controllers = game.controllers
@@ -80,4 +80,50 @@ def run_loop(agents, env, max_steps=0, max_episodes=0):
     finally:
         elapsed_time = (time.time() - start_time) + 1e-9 # NOTE: Make sure it's never 0
         print("Took %.3f seconds for %s steps: %.3f fps" % (
-            elapsed_time, steps-1, (steps-1) / elapsed_time))
\ No newline at end of file
+            elapsed_time, steps-1, (steps-1) / elapsed_time))
+
+async def async_run_loop(agents, env, max_steps=0, max_episodes=0):
+    """The same as `run_loop`, for an `AsyncLoLEnv`. Running one of these per
+    environment with `asyncio.gather` steps all of them concurrently."""
+    # Connect
+    await env.connect()
+
+    # A run loop for agent/environment interaction
+    total_episodes = 0
+    steps = 0
+    start_time = time.time()
+
+    # Obs / Act Specs
+    observation_spec = [env.observation_spec() for _ in agents]
+    action_spec = [env.action_spec() for _ in agents]
+
+    # Agent Initialisation
+    for agent, obs_spec, act_spec in zip(agents, observation_spec, action_spec):
+        agent.setup(obs_spec, act_spec)
+
+    try:
+        while not max_episodes or total_episodes < max_episodes:
+            logging.info("async_run_loop->env.reset()")
+            total_episodes += 1
+            timesteps = await env.reset()
+
+            for a in agents:
+                a.reset()
+
+            while True:
+                steps += 1
+                if max_steps and steps > max_steps: # +1 for initial reset action
+                    return
+                actions = [agent.step(timestep)
+                           for agent, timestep in zip(agents, timesteps)]
+
+                if timesteps[0].last():
+                    break
+
+                logging.info("async_run_loop->env step: " + str(steps))
+                timesteps = await env.step(actions)
+
+    finally:
+        elapsed_time = (time.time() - start_time) + 1e-9 # NOTE: Make sure it's never 0
+        print("Took %.3f seconds for %s steps: %.3f fps" % (
+            elapsed_time, steps-1, (steps-1) / elapsed_time))
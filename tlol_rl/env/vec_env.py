@@ -0,0 +1,431 @@
+# MIT License
+# 
+# Copyright (c) 2023 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Vectorized environments, which step many `LoLEnv`s at once."""
+
+import collections
+from concurrent import futures
+import multiprocessing
+from multiprocessing import shared_memory
+import traceback
+
+from absl import logging
+import numpy as np
+
+from tlol_rl.env import environment
+from tlol_rl.lib import actions
+from tlol_rl.lib import codec
+from tlol_rl.lib import features
+from tlol_rl.lib import named_array
+
+
+def _connect(env):
+    for controller in env._controllers:
+        controller.connect()
+
+
+def stack_observations(observations):
+    """Stack the observations of several environments along a new first axis.
+
+    Values whose shapes differ between the environments, e.g. the list of
+    `available_actions`, are kept as a list instead.
+    """
+    out = named_array.NamedDict()
+    for key in observations[0]:
+        values = [np.asarray(o[key]) for o in observations]
+        if all(v.shape == values[0].shape for v in values):
+            out[key] = np.stack(values)
+        else:
+            out[key] = [o[key] for o in observations]
+    return out
+
+
+def stack_timesteps(timesteps):
+    """Stack the `TimeStep`s of several environments.
+
+    Args:
+        timesteps: A list with a tuple of `TimeStep`s, one per agent, for
+            every environment.
+
+    Returns:
+        A tuple with one `TimeStep` per agent, whose fields are arrays with
+        one entry per environment.
+    """
+    return tuple(environment.TimeStep(
+        step_type=np.array([t.step_type for t in agent_timesteps]),
+        reward=np.array([t.reward for t in agent_timesteps]),
+        discount=np.array([t.discount for t in agent_timesteps]),
+        observation=stack_observations([t.observation for t in agent_timesteps])
+    ) for agent_timesteps in zip(*timesteps))
+
+
+class VecLoLEnv(environment.Base):
+    """Steps many `LoLEnv`s concurrently on a thread pool.
+
+    Stepping an environment is almost entirely spent waiting for its next
+    observation, so one thread per environment lets all of the games make
+    progress at the same time and a step takes as long as the slowest game
+    rather than the sum of all of them.
+
+    Args:
+        env_fns: A list of callables which each create an environment, e.g.
+            `functools.partial(lol_env.LoLEnv, ...)`. They are called on the
+            thread pool as well, so the games start up concurrently.
+        max_workers: Number of threads. Defaults to one per environment.
+    """
+
+    def __init__(self, env_fns, max_workers=None):
+        if not env_fns:
+            raise ValueError("You must specify at least one environment.")
+        self._envs = []
+        self._pool = futures.ThreadPoolExecutor(
+            max_workers=max_workers or len(env_fns),
+            thread_name_prefix="VecLoLEnv")
+
+        # Keep every environment which started, so they are closed on failure
+        pending = [self._pool.submit(env_fn) for env_fn in env_fns]
+        try:
+            self._envs = [future.result() for future in pending]
+        except:
+            futures.wait(pending)
+            self._envs = [f.result() for f in pending if f.exception() is None]
+            self.close()
+            raise
+
+        # Connect to the game of every environment
+        self._map(_connect)
+
+        logging.info("VecLoLEnv is ready with %d environments." % len(self._envs))
+
+    @property
+    def num_envs(self):
+        return len(self._envs)
+
+    @property
+    def envs(self):
+        """The underlying environments."""
+        return self._envs
+
+    def _map(self, fn, *iterables):
+        """Call `fn` for every environment on the thread pool and return
+        the results in environment order."""
+        return list(self._pool.map(fn, self._envs, *iterables))
+
+    def observation_spec(self):
+        """The observation spec of a single environment."""
+        return self._envs[0].observation_spec()
+
+    def action_spec(self):
+        """The action spec of a single environment."""
+        return self._envs[0].action_spec()
+
+    def reset(self):
+        """Start a new episode in every environment.
+
+        Returns:
+            A tuple of stacked `TimeStep`s, one per agent.
+        """
+        return stack_timesteps(self._map(lambda env: env.reset()))
+
+    def step(self, actions):
+        """Step every environment forward.
+
+        Args:
+            actions: A list with the actions of every environment, as passed
+                to `LoLEnv.step`.
+
+        Returns:
+            A tuple of stacked `TimeStep`s, one per agent.
+        """
+        if len(actions) != len(self._envs):
+            raise ValueError("Expected actions for %d environments, got %d." % (
+                len(self._envs), len(actions)))
+        return stack_timesteps(self._map(lambda env, a: env.step(a), actions))
+
+    def close(self):
+        """Close every environment and stop the thread pool."""
+        if getattr(self, "_pool", None) is None:
+            return
+        for env in self._envs:
+            env.close()
+        self._envs = []
+        self._pool.shutdown(wait=False)
+        self._pool = None
+
+
+
+class VecEnvError(Exception):
+    pass
+
+
+# Layout of the shared observation buffers of `SubprocVecLoLEnv`, i.e. the
+# shape and dtype of every value of `Features.transform_obs`. The variable
+# length list of `available_actions` is padded with -1.
+OBSERVATION_LAYOUT = collections.OrderedDict(
+    [("time", ((), np.float64)),
+     ("available_actions", ((len(actions.FUNCTIONS),), np.int32))] +
+    [(object_type, ((codec.OBJECT_CAPACITY[object_type], len(features.TABLE_FEATURES)),
+                    np.float32)) for object_type in codec.OBJECT_TYPES] +
+    [(object_type + "_net_id", ((codec.OBJECT_CAPACITY[object_type],), np.int32))
+     for object_type in codec.OBJECT_TYPES] +
+    [(object_type + "_mask", ((codec.OBJECT_CAPACITY[object_type],), np.bool_))
+     for object_type in codec.OBJECT_TYPES])
+
+
+def _shared_buffers(shms, num_envs, num_agents):
+    """View shared memory blocks as observation buffers of `num_envs` by
+    `num_agents` rows of each value of `OBSERVATION_LAYOUT`."""
+    return {key: np.ndarray((num_envs, num_agents) + shape, dtype=dtype, buffer=shm.buf)
+            for shm, (key, (shape, dtype)) in zip(shms, OBSERVATION_LAYOUT.items())}
+
+
+def _write_observation(row, observation):
+    """Copy an observation into its rows of the shared buffers."""
+    for key, buf in row.items():
+        value = observation.get(key)
+        if key == "available_actions":
+            buf[:] = -1
+            if value is not None:
+                buf[:len(value)] = value
+        elif value is None:
+            buf[...] = 0
+        else:
+            buf[...] = value
+
+
+def _worker(index, env_fn, conn, parent_conn, names, num_envs, num_agents):
+    """Run one environment in its own process.
+
+    Observations are written straight into this environment's rows of the
+    shared buffers, so only commands, actions and the small per-agent
+    (step_type, reward, discount) results travel over `conn`.
+    """
+    parent_conn.close()
+    env = None
+    shms = []
+    try:
+        shms = [shared_memory.SharedMemory(name=name) for name in names]
+        buffers = _shared_buffers(shms, num_envs, num_agents)
+
+        env = env_fn()
+        if env._num_agents != num_agents:
+            raise ValueError("Expected %d agents, the environment has %d." % (
+                num_agents, env._num_agents))
+        _connect(env)
+        conn.send(("ready", (env.observation_spec(), env.action_spec())))
+
+        while True:
+            cmd, data = conn.recv()
+            try:
+                if cmd == "reset":
+                    timesteps = env.reset()
+                elif cmd == "step":
+                    timesteps = env.step(data)
+                elif cmd == "close":
+                    break
+                else:
+                    raise ValueError("Unknown command: %s" % cmd)
+
+                for agent, t in enumerate(timesteps):
+                    _write_observation(
+                        {key: buf[index, agent, ...] for key, buf in buffers.items()},
+                        t.observation)
+                conn.send(("ok", [
+                    (int(t.step_type), t.reward, t.discount) for t in timesteps]))
+            except Exception:
+                conn.send(("error", traceback.format_exc()))
+    except (KeyboardInterrupt, EOFError):
+        pass
+    except Exception:
+        conn.send(("error", traceback.format_exc()))
+    finally:
+        for shm in shms:
+            shm.close()
+        if env is not None:
+            env.close()
+        conn.close()
+
+
+class SubprocVecLoLEnv(environment.Base):
+    """Steps many `LoLEnv`s concurrently, each in its own worker process.
+
+    Unlike `VecLoLEnv`, the observation transforms of the environments run
+    in parallel instead of contending for the GIL. Each worker writes its
+    transformed observations into preallocated shared memory arrays (see
+    `OBSERVATION_LAYOUT`), so observations are never pickled and only small
+    control messages go through the pipes to the workers.
+
+    Args:
+        env_fns: A list of picklable callables which each create an
+            environment, e.g. `functools.partial(lol_env.LoLEnv, ...)`.
+        num_agents: Number of agents of every environment.
+        start_method: `multiprocessing` start method of the workers, e.g.
+            `spawn`. Defaults to the platform default.
+        copy_observations: Whether to return copies of the shared buffers.
+            If False, the observations are views which the next `reset` or
+            `step` overwrites.
+    """
+
+    def __init__(self,
+                 env_fns,
+                 num_agents=1,
+                 start_method=None,
+                 copy_observations=True):
+        if not env_fns:
+            raise ValueError("You must specify at least one environment.")
+        self._num_agents = num_agents
+        self._copy_observations = copy_observations
+        self._closed = False
+        self._waiting = False
+        self._conns = []
+        self._procs = []
+        self._shms = []
+
+        try:
+            # Allocate the buffers before starting the workers, which attach
+            # to them
+            for shape, dtype in OBSERVATION_LAYOUT.values():
+                size = (len(env_fns) * num_agents *
+                        int(np.prod(shape)) * np.dtype(dtype).itemsize)
+                self._shms.append(
+                    shared_memory.SharedMemory(create=True, size=max(size, 1)))
+            self._buffers = _shared_buffers(self._shms, len(env_fns), num_agents)
+            names = [shm.name for shm in self._shms]
+
+            ctx = multiprocessing.get_context(start_method)
+            for index, env_fn in enumerate(env_fns):
+                parent_conn, child_conn = ctx.Pipe()
+                proc = ctx.Process(
+                    target=_worker,
+                    args=(index, env_fn, child_conn, parent_conn,
+                          names, len(env_fns), num_agents),
+                    daemon=True)
+                proc.start()
+                child_conn.close()
+                self._conns.append(parent_conn)
+                self._procs.append(proc)
+
+            # Every worker reports the specs once its environment is ready
+            ready = self._recv_all()
+            self._observation_spec, self._action_spec = ready[0]
+        except:
+            self.close()
+            raise
+
+        logging.info("SubprocVecLoLEnv is ready with %d environments." % len(env_fns))
+
+    @property
+    def num_envs(self):
+        return len(self._conns)
+
+    def _recv_all(self):
+        """Receive a reply from every worker, raising once all have replied
+        if any of them failed."""
+        replies, errors = [], []
+        for index, conn in enumerate(self._conns):
+            try:
+                status, data = conn.recv()
+            except EOFError:
+                status, data = "error", "Worker exited unexpectedly."
+            if status == "error":
+                errors.append("Environment %d failed:\n%s" % (index, data))
+            replies.append(data)
+        if errors:
+            raise VecEnvError("\n".join(errors))
+        return replies
+
+    def observation_spec(self):
+        """The observation spec of a single environment."""
+        return self._observation_spec
+
+    def action_spec(self):
+        """The action spec of a single environment."""
+        return self._action_spec
+
+    def _send(self, cmd, data=None):
+        if self._waiting:
+            raise VecEnvError("Already waiting for a previous step.")
+        for i, conn in enumerate(self._conns):
+            conn.send((cmd, data[i] if data is not None else None))
+        self._waiting = True
+
+    def _wait(self):
+        """Collect the results of every worker into stacked `TimeStep`s."""
+        self._waiting = False
+        results = self._recv_all()
+        timesteps = []
+        for agent in range(self._num_agents):
+            observation = named_array.NamedDict({
+                key: buf[:, agent].copy() if self._copy_observations else buf[:, agent]
+                for key, buf in self._buffers.items()})
+            step_types, rewards, discounts = zip(*(r[agent] for r in results))
+            timesteps.append(environment.TimeStep(
+                step_type=np.array(step_types),
+                reward=np.array(rewards),
+                discount=np.array(discounts),
+                observation=observation))
+        return tuple(timesteps)
+
+    def reset(self):
+        """Start a new episode in every environment.
+
+        Returns:
+            A tuple of stacked `TimeStep`s, one per agent.
+        """
+        self._send("reset")
+        return self._wait()
+
+    def step(self, actions):
+        """Step every environment forward.
+
+        Args:
+            actions: A list with the actions of every environment, as passed
+                to `LoLEnv.step`.
+
+        Returns:
+            A tuple of stacked `TimeStep`s, one per agent.
+        """
+        if len(actions) != self.num_envs:
+            raise ValueError("Expected actions for %d environments, got %d." % (
+                self.num_envs, len(actions)))
+        self._send("step", actions)
+        return self._wait()
+
+    def close(self):
+        """Stop the workers and release the shared memory."""
+        if getattr(self, "_closed", True):
+            return
+        self._closed = True
+        for conn in self._conns:
+            try:
+                conn.send(("close", None))
+            except (OSError, BrokenPipeError):
+                pass
+        for proc in self._procs:
+            proc.join(timeout=30)
+            if proc.is_alive():
+                proc.terminate()
+        for conn in self._conns:
+            conn.close()
+        for shm in self._shms:
+            shm.close()
+            shm.unlink()
+        self._shms = []
@@ -0,0 +1,258 @@
+# MIT License
+# 
+# Copyright (c) 2023 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Tests for the vectorized environments."""
+
+import functools
+import os
+import tempfile
+
+from absl.testing import absltest
+import numpy as np
+
+from tlol_rl.env import environment
+from tlol_rl.env import lol_env
+from tlol_rl.env import vec_env
+from tlol_rl.lib import actions
+from tlol_rl.lib import codec
+from tlol_rl.lib import features
+
+PLAYERS = [lol_env.Agent(champion="Ezreal", team="BLUE")]
+MAP_NAME = "Summoners Rift"
+
+
+NET_ID = 0x40000001
+
+
+class FakeController(object):
+    """Observes our champion with a health of 100 times `index` plus the
+    number of steps since the last reset."""
+
+    def __init__(self, index=0):
+        self.index = index
+        self.ticks = 0
+        self.batches = []
+
+    def connect(self):
+        pass
+
+    def restart(self):
+        pass
+
+    def players_reset(self):
+        self.ticks = 0
+
+    def observe(self):
+        tables = codec.new_tables()
+        champs = tables["champs"]
+        champs.count = 1
+        champs["net_id"][0] = NET_ID + self.index
+        champs["team"][0] = 100
+        champs["health"][0] = 100.0 * self.index + self.ticks
+        return codec.decode_observation(codec.encode_observation({
+            "time": 30.0 + self.ticks,
+            "available_actions": {"can_no_op": True, "can_move": True},
+            "tables": tables}))
+
+    def step(self, batch):
+        self.batches.append(batch)
+        self.ticks += 1
+        return self.observe()
+
+
+class FakeProcess(object):
+    """Stands in for a `LoLProcess`, and touches `closed_path` on close."""
+
+    def __init__(self, closed_path=None, index=0):
+        self.controller = FakeController(index)
+        self.closed = False
+        self._closed_path = closed_path
+
+    def close(self):
+        self.closed = True
+        if self._closed_path:
+            open(self._closed_path, "w").close()
+
+
+def fake_game(closed_path=None, index=0):
+    return lol_env.Game(procs=[FakeProcess(closed_path, index)],
+                        players=PLAYERS,
+                        map_name=MAP_NAME)
+
+
+class FakeLoLEnv(lol_env.LoLEnv):
+    """A `LoLEnv` which launches fake games instead of the client."""
+
+    closed_path = None
+    launched = []
+
+    @classmethod
+    def launch_game(cls, players, map_name, **kwargs):
+        game = fake_game(cls.closed_path)
+        cls.launched.append(game)
+        return game
+
+
+def make_env(game=None):
+    return FakeLoLEnv(
+        players=PLAYERS,
+        agent_interface_format=lol_env.parse_agent_interface_format(
+            feature_map=16000, feature_move_range=8),
+        map_name=MAP_NAME,
+        game=game)
+
+
+def make_env_numbered(index):
+    """Create an environment whose observations depend on `index`."""
+    return make_env(fake_game(index=index))
+
+
+def make_env_closing(closed_path):
+    """Create an environment whose game touches `closed_path` on close,
+    which works across processes."""
+    FakeLoLEnv.closed_path = closed_path
+    return make_env()
+
+
+class VecEnvStepMixin(object):
+    """Reset and step tests shared by both vectorized environments."""
+
+    def make_vec_env(self, env_fns):
+        raise NotImplementedError()
+
+    def assertTimeSteps(self, timesteps, step_type, ticks):
+        self.assertLen(timesteps, len(PLAYERS))
+        t = timesteps[0]
+        np.testing.assert_array_equal(t.step_type, [step_type, step_type])
+        np.testing.assert_array_equal(t.reward, [0, 0])
+        np.testing.assert_array_equal(t.discount, [1, 1])
+
+        obs = t.observation
+        np.testing.assert_array_equal(obs["time"], [30.0 + ticks] * 2)
+        capacity = codec.OBJECT_CAPACITY["champs"]
+        self.assertEqual(obs["champs"].shape,
+                         (2, capacity, len(features.TABLE_FEATURES)))
+        self.assertEqual(obs["champs_net_id"].shape, (2, capacity))
+        self.assertEqual(obs["champs_mask"].shape, (2, capacity))
+        self.assertEqual(obs["minions"].shape[:2],
+                         (2, codec.OBJECT_CAPACITY["minions"]))
+
+        health = features.TABLE_FEATURES.index("health")
+        np.testing.assert_array_equal(obs["champs"][:, 0, health],
+                                      [ticks, 100.0 + ticks])
+        np.testing.assert_array_equal(obs["champs_net_id"][:, 0],
+                                      [NET_ID, NET_ID + 1])
+        np.testing.assert_array_equal(obs["champs_mask"][:, :2],
+                                      [[True, False], [True, False]])
+
+    def reset_and_step(self):
+        env = self.make_vec_env([functools.partial(make_env_numbered, i)
+                                 for i in range(2)])
+        self.addCleanup(env.close)
+        self.assertEqual(env.num_envs, 2)
+
+        self.assertTimeSteps(env.reset(), environment.StepType.FIRST, 0)
+        no_op = actions.FunctionCall(actions.FUNCTIONS.no_op.id, [])
+        for tick in range(1, 3):
+            timesteps = env.step([[no_op], [no_op]])
+            self.assertTimeSteps(timesteps, environment.StepType.MID, tick)
+        return env
+
+    def test_reset_and_step(self):
+        self.reset_and_step()
+
+    def test_step_with_wrong_number_of_actions(self):
+        env = self.make_vec_env([functools.partial(make_env_numbered, i)
+                                 for i in range(2)])
+        self.addCleanup(env.close)
+        env.reset()
+        with self.assertRaises(ValueError):
+            env.step([[]])
+
+
+class LoLEnvCloseTest(absltest.TestCase):
+
+    def setUp(self):
+        super(LoLEnvCloseTest, self).setUp()
+        FakeLoLEnv.launched = []
+
+    def test_close_shuts_down_launched_game(self):
+        env = make_env()
+        env.close()
+        self.assertTrue(FakeLoLEnv.launched[0].procs[0].closed)
+
+    def test_close_leaves_given_game(self):
+        game = fake_game()
+        env = make_env(game)
+        env.close()
+        self.assertFalse(game.procs[0].closed)
+
+
+class VecLoLEnvTest(VecEnvStepMixin, absltest.TestCase):
+
+    def make_vec_env(self, env_fns):
+        return vec_env.VecLoLEnv(env_fns)
+
+    def test_reset_and_step(self):
+        env = self.reset_and_step()
+        # Every step sends one batch of actions to each game
+        for e in env.envs:
+            self.assertLen(e._controllers[0].batches, 2)
+
+    def setUp(self):
+        super(VecLoLEnvTest, self).setUp()
+        FakeLoLEnv.launched = []
+
+    def test_close_shuts_down_every_game(self):
+        env = vec_env.VecLoLEnv([make_env, make_env])
+        self.assertEqual(env.num_envs, 2)
+        env.close()
+        self.assertLen(FakeLoLEnv.launched, 2)
+        self.assertTrue(all(g.procs[0].closed for g in FakeLoLEnv.launched))
+
+    def test_failed_start_shuts_down_started_games(self):
+        def fail():
+            raise RuntimeError("Could not launch")
+        with self.assertRaises(RuntimeError):
+            vec_env.VecLoLEnv([make_env, fail])
+        self.assertLen(FakeLoLEnv.launched, 1)
+        self.assertTrue(FakeLoLEnv.launched[0].procs[0].closed)
+
+
+class SubprocVecLoLEnvTest(VecEnvStepMixin, absltest.TestCase):
+
+    def make_vec_env(self, env_fns):
+        return vec_env.SubprocVecLoLEnv(env_fns)
+
+    def test_close_shuts_down_games_of_workers(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        paths = [os.path.join(tmp_dir.name, "closed_%d" % i) for i in range(2)]
+        env = vec_env.SubprocVecLoLEnv(
+            [functools.partial(make_env_closing, path) for path in paths])
+        self.assertEqual(env.num_envs, 2)
+        env.close()
+        for path in paths:
+            self.assertTrue(os.path.exists(path))
+
+
+if __name__ == "__main__":
+    absltest.main()
@@ -52,6 +52,7 @@ class LoLGameEnv(gym.Env):
 
         self._kwargs = kwargs
         self._env = None
+        self._async_failed = False
 
         self.n_agents = 1
 
@@ -63,20 +64,46 @@ class LoLGameEnv(gym.Env):
     def step(self, actions):
         return self._safe_step(actions)
 
-    def _safe_step(self, acts):
+    def step_async(self, actions):
+        """Send actions without waiting for the resulting observations,
+        which `step_wait` returns."""
+        failed = self._safe_call(
+            lambda: self._env.step_async(self._function_calls(actions)))
+        self._async_failed = failed is not None
+
+    def step_wait(self):
+        """Wait for the results of the actions sent by `step_async`."""
+        if self._async_failed:
+            return self._failed_step()
+        return self._safe_call(self._env.step_wait, self._step_results)
+
+    def _function_calls(self, acts):
         self._num_step += 1
+        return [actions.FunctionCall(act[0], act[1:]) for act in acts]
+
+    def _safe_step(self, acts):
+        return self._safe_call(
+            lambda: self._env.step(self._function_calls(acts)),
+            self._step_results)
+
+    def _safe_call(self, fn, on_result=None):
+        """Call `fn` and pass its result to `on_result`, or return the
+        results of a failed step if it raises."""
         try:
-            cur_actions = [actions.FunctionCall(act[0], act[1:])
-                           for act in acts]
-            obs_n = self._env.step(cur_actions)
+            result = fn()
         except KeyboardInterrupt:
             logger.info(" Interrupted. Quitting...")
-            return [None] * self.n_agents, [0] * self.n_agents, [True] * self.n_agents, \
-                [{}] * self.n_agents
+            return self._failed_step()
         except Exception:
             logger.exception(" An unexpected error occurred while applying action to environment.")
-            return [None] * self.n_agents, [0] * self.n_agents, [True] * self.n_agents, \
-                [{}] * self.n_agents
+            return self._failed_step()
+        return on_result(result) if on_result else result
+
+    def _failed_step(self):
+        return [None] * self.n_agents, [0] * self.n_agents, [True] * self.n_agents, \
+            [{}] * self.n_agents
+
+    def _step_results(self, obs_n):
         reward_n = [obs.reward for obs in obs_n]
         self._episode_reward = [self._episode_reward[i] + reward_n[i] for i in range(self.n_agents)]
         self._total_reward = [self._total_reward[i] + reward_n[i] for i in range(self.n_agents)]
@@ -0,0 +1,156 @@
+# MIT License
+# 
+# Copyright (c) 2023 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""An asyncio version of `RemoteController`."""
+
+from absl import logging
+import time
+
+from tlol_rl.lib import codec
+from tlol_rl.lib import remote_controller
+from tlol_rl.transports import lib as transport_lib
+from tlol_rl.transports import redis_transport
+
+
+class AsyncRemoteController(remote_controller.RemoteController):
+    """A `RemoteController` whose exchanges with the TLoL-RL server are
+    coroutines, built on an asyncio Redis client.
+
+    Launching and killing the Redis and TLoL-RL server processes, encoding
+    actions and decoding observations all work the same as in
+    `RemoteController`, and so does the actor. Only the `redis` transport
+    has an asyncio equivalent (see `redis_transport.AsyncRedisTransport`).
+
+    `connect`, `observe`, `step`, `actions` and `players_reset` are
+    coroutines. The remaining helpers, e.g. `player_move`, still block.
+    """
+
+    def __init__(self, host, port, timeout_seconds, kwargs=[]):
+        super(AsyncRemoteController, self).__init__(
+            host, port, timeout_seconds, kwargs=kwargs)
+        try:
+            self._async_transport = \
+                redis_transport.AsyncRedisTransport.from_transport(self._transport)
+        except:
+            self.close()
+            raise
+
+    async def aclose(self):
+        """Close the asyncio client, then kill the related processes."""
+        await self.aclose_transport()
+        self.close()
+
+    async def aclose_transport(self):
+        """Close only the asyncio client, leaving the related processes
+        running, e.g. for a game which goes back to a `GamePool`."""
+        await self._async_transport.close()
+
+    async def connect(self):
+        """Reset pipes after connecting, see `RemoteController.connect`."""
+        await self._async_transport.clear(
+            transport_lib.OBSERVATION,
+            transport_lib.ACTION)
+
+    async def players_reset(self):
+        """Reset players for a new episode, see
+        `RemoteController.players_reset`."""
+        logging.info("Resetting players for new episode.")
+
+        await self._async_transport.send_actions(
+            self._encode_batch([(codec.Opcode.RESET, 0, 0.0, 0.0)]))
+        self._wait_step = self._action_step
+
+    async def observe(self):
+        """Get a current observation."""
+
+        # Start observing if we haven't already
+        if self._last_obs == None:
+            logging.info("controller.observe->start_observing")
+            await self._async_transport.clear(
+                transport_lib.OBSERVATION,
+                transport_lib.COMMAND)
+            if self._decoder:
+                self._decoder.reset() # The actor starts with a keyframe
+            await self._async_transport.send_command("start_observing")
+
+        logging.info("controller.observe->blocking for next observation")
+        obs = await self._parse_observation_async(
+            await self._async_transport.recv_observation(self.timeout))
+        while self._is_stale(obs):
+            obs = await self._parse_observation_async(
+                await self._async_transport.recv_observation(self.timeout))
+        return obs
+
+    async def step(self, req_action):
+        """Send an action request and wait for the next observation in one
+        pipelined round trip, see `RemoteController.step`."""
+
+        # The first observation also has to start the observer
+        if self._last_obs == None:
+            await self.actions(req_action)
+            return await self.observe()
+
+        start_time = time.perf_counter()
+
+        payload = self._encode_actions(req_action)
+        encode_time = time.perf_counter()
+
+        payload = await self._async_transport.step(payload, self.timeout)
+        round_trip_time = time.perf_counter()
+
+        obs = await self._parse_observation_async(payload)
+        while self._is_stale(obs):
+            obs = await self._parse_observation_async(
+                await self._async_transport.recv_observation(self.timeout))
+        decode_time = time.perf_counter()
+
+        self.last_step_timings = remote_controller.StepTimings(
+            encode=encode_time - start_time,
+            round_trip=round_trip_time - encode_time,
+            decode=decode_time - round_trip_time,
+            total=decode_time - start_time)
+        logging.info("controller.step->timings: " + str(self.last_step_timings))
+
+        return obs
+
+    async def actions(self, req_action):
+        """Send an action request, which may include multiple actions."""
+        await self._async_transport.send_actions(self._encode_actions(req_action))
+
+    def _decode_observation(self, payload):
+        """Decode an observation, letting `MissingBaseError` through so
+        `_parse_observation_async` can wait for a keyframe without
+        blocking the event loop."""
+        if not self._decoder:
+            return codec.decode_observation(payload)
+        return self._decoder.decode(payload)
+
+    async def _parse_observation_async(self, payload):
+        keyframe_requested = False
+        while True:
+            try:
+                return self._parse_observation(payload)
+            except codec.MissingBaseError as e:
+                logging.info("controller.observe->%s, waiting for keyframe" % e)
+                if not keyframe_requested:
+                    await self._async_transport.send_command("keyframe")
+                    keyframe_requested = True
+                payload = await self._async_transport.recv_observation(self.timeout)
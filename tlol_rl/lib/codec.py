@@ -0,0 +1,606 @@
+# MIT License
+# 
+# Copyright (c) 2023 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Binary wire format shared by the TLoL-RL actor and `RemoteController`.
+
+Every message starts with a fixed `HEADER` holding the codec version, the
+message kind, flags, a step id and the game time. Observations are numbered
+by the actor and action batches by the controller, each with monotonically
+increasing step ids. Observations are followed by the step id of the last
+action batch the actor applied, the available actions bitmask, a mask of
+which unit slots are present and one fixed-layout `UNIT` record per present
+slot. If the `FLAG_TABLES` flag is set, they end with one `ObjectTable` per
+entry of `OBJECT_TYPES`, each sent as a `TABLE` row count followed by the
+valid rows of every column in `COLUMNS`. If the `FLAG_DELTA` flag is also
+set, the tables are a delta against the tables of an earlier observation,
+the base, whose step id is sent as a `DELTA` record after the unit records.
+The base is always an observation the controller acknowledged, so deltas
+stay decodable when observations in between are dropped.
+Each table is then sent as its row count, the number and indices of the
+rows which changed since the base, and only the values of those rows for
+every column. Rows past the row count are always zero, so they never need
+to be sent. Observations without `FLAG_DELTA` are keyframes.
+
+Action batches carry the game time of the observation they respond to and
+are followed by an action count, the number of observation ticks the actor
+repeats the batch for, the step id of the last observation whose tables the
+controller acknowledged, and one fixed-layout `ACTION` record per action,
+keyed by a numeric `Opcode`.
+
+Fixed records are encoded with `struct` and object tables straight from
+their preallocated NumPy columns, so the actor never builds per-object
+Python structures inside the game's frame callback, while decoding
+observations builds NumPy arrays directly from the received buffer.
+"""
+
+import collections
+import enum
+import struct
+
+import numpy as np
+
+VERSION = 6
+
+
+class CodecError(Exception):
+    pass
+
+
+class MissingBaseError(CodecError):
+    """A delta observation arrived whose base observation isn't the one
+    held by the receiver, so a keyframe is needed to resume decoding.
+
+    Attributes:
+        base_step: Step id of the base observation of the delta.
+    """
+
+    def __init__(self, message, base_step=None):
+        super(MissingBaseError, self).__init__(message)
+        self.base_step = base_step
+
+
+class MessageKind(enum.IntEnum):
+    OBSERVATION = 1
+    ACTIONS = 2
+
+
+class Opcode(enum.IntEnum):
+    NO_OP = 0
+    MOVE = 1
+    SPELL = 2
+    TELEPORT = 3
+    RESET = 4
+
+
+# Action type names used by the raw action format.
+OPCODE_NAMES = {
+    "noop": Opcode.NO_OP,
+    "no_op": Opcode.NO_OP,
+    "move": Opcode.MOVE,
+    "spell": Opcode.SPELL,
+    "teleport": Opcode.TELEPORT,
+    "reset": Opcode.RESET
+}
+
+# Bit order of the available actions bitmask.
+AVAILABLE_ACTIONS = (
+    "can_no_op",
+    "can_move",
+    "can_auto",
+    "can_spell_0",
+    "can_spell_1",
+    "can_spell_2",
+    "can_spell_3",
+    "can_spell_4",
+    "can_spell_5"
+)
+AVAILABLE_ACTIONS_DTYPE = np.dtype(
+    [(name, np.bool_) for name in AVAILABLE_ACTIONS])
+
+# Bit order of the unit slot mask.
+UNIT_SLOTS = ("self", "enemy_unit")
+
+# Observation flags.
+FLAG_TABLES = 1 << 0
+FLAG_DELTA  = 1 << 1
+
+# Object types with a table in the observation, in wire order, and the
+# maximum number of objects of each type which are observed.
+OBJECT_TYPES = ("champs", "minions", "turrets", "jungle", "missiles")
+OBJECT_CAPACITY = {
+    "champs":   10,
+    "minions":  128,
+    "turrets":  32,
+    "jungle":   32,
+    "missiles": 64
+}
+
+# Columns of every object table, in wire order.
+COLUMNS = (
+    ("net_id",     np.dtype("<i4")),
+    ("team",       np.dtype("<i4")),
+    ("pos_x",      np.dtype("<f4")),
+    ("pos_y",      np.dtype("<f4")),
+    ("health",     np.dtype("<f4")),
+    ("max_health", np.dtype("<f4"))
+)
+
+UNIT_NAME_SIZE = 24
+
+HEADER      = struct.Struct("<BBHId") # version, kind, flags, step, time
+OBSERVATION = struct.Struct("<IHB")   # action step, available actions, unit slots
+UNIT        = struct.Struct("<%dsiff" % UNIT_NAME_SIZE) # name, team, pos_x, pos_y
+DELTA       = struct.Struct("<I")     # step of the base observation
+TABLE       = struct.Struct("<H")     # object table row count
+ROWS        = struct.Struct("<H")     # changed row count
+ROW_DTYPE   = np.dtype("<u2")         # changed row index
+ACTIONS     = struct.Struct("<HBI")   # action count, repeat, acknowledged step
+ACTION      = struct.Struct("<BBff")  # opcode, spell_slot, x, y
+
+UNIT_DTYPE = np.dtype([
+    ("name",  "S%d" % UNIT_NAME_SIZE),
+    ("team",  "<i4"),
+    ("pos_x", "<f4"),
+    ("pos_y", "<f4")
+])
+assert UNIT_DTYPE.itemsize == UNIT.size
+
+
+class ObjectTable(object):
+    """Fixed-capacity column arrays holding the objects of one type.
+
+    Only the first `count` rows of each column are valid, the rest are
+    zeros.
+
+    Attributes:
+        capacity: Maximum number of rows.
+        count: Number of valid rows.
+        columns: A dict of column name to a NumPy array of `capacity` rows.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.count = 0
+        self.columns = {
+            name: np.zeros(capacity, dtype=dtype) for name, dtype in COLUMNS}
+
+    @property
+    def mask(self):
+        """Boolean array of which rows are valid."""
+        return np.arange(self.capacity) < self.count
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    def assign(self, other):
+        """Copy the rows and row count of `other` into this table."""
+        for name, column in self.columns.items():
+            column[:] = other.columns[name]
+        self.count = other.count
+
+    def __repr__(self):
+        return "ObjectTable(count={}, capacity={})".format(
+            self.count, self.capacity)
+
+
+def new_tables():
+    """Create an empty `ObjectTable` for each of the `OBJECT_TYPES`."""
+    return {object_type: ObjectTable(OBJECT_CAPACITY[object_type])
+            for object_type in OBJECT_TYPES}
+
+
+class ActionBatch(collections.namedtuple(
+        "ActionBatch", ["step", "time", "actions", "repeat", "ack"])):
+    """A decoded action batch.
+    Attributes:
+        step: Step id of the batch, assigned by the controller.
+        time: Game time of the observation the batch responds to.
+        actions: A list of (opcode, spell_slot, x, y) tuples.
+        repeat: Number of observation ticks to apply the actions for.
+        ack: Step id of the last observation the controller acknowledged
+            as a delta base, or 0 if none.
+    """
+    __slots__ = ()
+
+
+def _pack_header(kind, step=0, time=0.0, flags=0):
+    return HEADER.pack(VERSION, kind, flags, step, float(time))
+
+
+def _unpack_header(buf, kind):
+    """Validate the header of `buf` and return its (flags, step, time)."""
+    if len(buf) < HEADER.size:
+        raise CodecError("Message too short: %d bytes" % len(buf))
+    version, msg_kind, flags, step, time = HEADER.unpack_from(buf)
+    if version != VERSION:
+        raise CodecError(
+            "Unsupported codec version: %d, expected %d" % (version, VERSION))
+    if msg_kind != kind:
+        raise CodecError(
+            "Unexpected message kind: %d, expected %d" % (msg_kind, kind))
+    return flags, step, time
+
+
+def encode_observation(obs, base=None, base_step=0):
+    """Encode an observation dict as built by the actor.
+    Args:
+        obs: A dict with the game `time`, the observation `step` id, the
+            `action_step` id of the last applied action batch, an
+            `available_actions` dict of booleans, optionally a dict per
+            unit slot in `UNIT_SLOTS` holding `name`, `team`, `pos_x` and
+            `pos_y` and optionally `tables`, a dict of `ObjectTable` per
+            object type as created by `new_tables`.
+        base: Optional tables of the observation `base_step`. If given, the
+            tables of `obs` are encoded as a delta against them.
+        base_step: Step id of the observation `base` belongs to.
+    
+    Returns:
+        The encoded observation as bytes.
+    """
+    available_actions = obs["available_actions"]
+    action_mask = 0
+    for i, name in enumerate(AVAILABLE_ACTIONS):
+        if available_actions.get(name):
+            action_mask |= 1 << i
+
+    slot_mask = 0
+    units = []
+    for i, slot in enumerate(UNIT_SLOTS):
+        unit = obs.get(slot)
+        if unit:
+            slot_mask |= 1 << i
+            units.append(UNIT.pack(
+                unit["name"].encode("utf-8")[:UNIT_NAME_SIZE],
+                int(unit["team"]),
+                float(unit["pos_x"]),
+                float(unit["pos_y"])))
+
+    flags = 0
+    tables = []
+    if obs.get("tables"):
+        flags |= FLAG_TABLES
+        if base is not None:
+            flags |= FLAG_DELTA
+            tables.append(DELTA.pack(base_step))
+        for object_type in OBJECT_TYPES:
+            table = obs["tables"][object_type]
+            tables.append(TABLE.pack(table.count))
+            if base is None:
+                tables.extend(table.columns[name][:table.count].tobytes()
+                              for name, _ in COLUMNS)
+            else:
+                tables.extend(_encode_table_delta(table, base[object_type]))
+
+    return b"".join([
+        _pack_header(MessageKind.OBSERVATION, obs.get("step", 0), obs["time"], flags),
+        OBSERVATION.pack(obs.get("action_step", 0), action_mask, slot_mask)] +
+        units + tables)
+
+
+def _encode_table_delta(table, base):
+    """Encode the rows of `table` which differ from `base`."""
+    count = max(table.count, base.count)
+    changed = np.zeros(count, dtype=np.bool_)
+    for name, _ in COLUMNS:
+        changed |= table.columns[name][:count] != base.columns[name][:count]
+    # Rows past the row count are zeroed by the receiver
+    rows = np.flatnonzero(changed[:table.count]).astype(ROW_DTYPE)
+    return [ROWS.pack(len(rows)), rows.tobytes()] + [
+        table.columns[name][rows].tobytes() for name, _ in COLUMNS]
+
+
+def decode_observation(buf, base=None, base_step=None):
+    """Decode an observation into NumPy records which view `buf`.
+
+    Args:
+        buf: The encoded observation.
+        base: Optional tables, as created by `new_tables`, which the object
+            tables are decoded into in place instead of into new tables.
+            Delta observations are applied on top of them.
+        base_step: Step id of the observation `base` currently holds.
+    
+    Returns:
+        A dict with the game `time`, the `step` and `action_step` ids, an
+        `available_actions` record of booleans, a `UNIT_DTYPE` record per
+        present unit slot and, if they were sent, a dict of `ObjectTable`
+        per object type under `tables`. Records can be indexed by field name
+        in the same way as the dicts passed to `encode_observation`.
+    
+    Raises:
+        MissingBaseError: if the observation is a delta against another
+            observation than `base_step`, or no `base` was given.
+        CodecError: if the message is malformed or from another version.
+    """
+    flags, step, time = _unpack_header(buf, MessageKind.OBSERVATION)
+    if len(buf) < HEADER.size + OBSERVATION.size:
+        raise CodecError("Observation has the wrong size: %d bytes" % len(buf))
+    action_step, action_mask, slot_mask = OBSERVATION.unpack_from(buf, HEADER.size)
+
+    bits = (action_mask >> np.arange(len(AVAILABLE_ACTIONS))) & 1
+    obs = {
+        "time": time,
+        "step": step,
+        "action_step": action_step,
+        "available_actions": bits.astype(np.bool_).view(AVAILABLE_ACTIONS_DTYPE)[0]
+    }
+
+    slots = [s for i, s in enumerate(UNIT_SLOTS) if slot_mask & (1 << i)]
+    offset = HEADER.size + OBSERVATION.size
+    if len(buf) < offset + len(slots) * UNIT.size:
+        raise CodecError("Observation has the wrong size: %d bytes" % len(buf))
+    units = np.frombuffer(buf, dtype=UNIT_DTYPE, count=len(slots), offset=offset)
+    for slot, unit in zip(slots, units):
+        obs[slot] = unit
+    offset += len(slots) * UNIT.size
+
+    if flags & FLAG_TABLES and flags & FLAG_DELTA:
+        if len(buf) < offset + DELTA.size:
+            raise CodecError("Observation has the wrong size: %d bytes" % len(buf))
+        (delta_step,) = DELTA.unpack_from(buf, offset)
+        if base is None or delta_step != base_step:
+            raise MissingBaseError(
+                "Delta against step %d, but holding step %s" % (delta_step, base_step),
+                delta_step)
+        obs["tables"], offset = _decode_tables(
+            buf, offset + DELTA.size, base, delta=True)
+    elif flags & FLAG_TABLES:
+        obs["tables"], offset = _decode_tables(buf, offset, base)
+
+    if len(buf) != offset:
+        raise CodecError("Observation has the wrong size: %d bytes" % len(buf))
+
+    return obs
+
+
+def _decode_tables(buf, offset, tables=None, delta=False):
+    """Decode the object tables starting at `offset` into `tables`, or into
+    new tables if not given. Returns the tables and the offset after them."""
+    tables = new_tables() if tables is None else tables
+    row_size = sum(dtype.itemsize for _, dtype in COLUMNS)
+    for object_type in OBJECT_TYPES:
+        table = tables[object_type]
+        if len(buf) < offset + TABLE.size:
+            raise CodecError("Observation has the wrong size: %d bytes" % len(buf))
+        (count,) = TABLE.unpack_from(buf, offset)
+        offset += TABLE.size
+        if count > table.capacity:
+            raise CodecError("Invalid %s table of %d rows" % (object_type, count))
+
+        if delta:
+            if len(buf) < offset + ROWS.size:
+                raise CodecError("Observation has the wrong size: %d bytes" % len(buf))
+            (num_rows,) = ROWS.unpack_from(buf, offset)
+            offset += ROWS.size
+            if len(buf) < offset + num_rows * (ROW_DTYPE.itemsize + row_size):
+                raise CodecError("Invalid %s table delta of %d rows" % (
+                    object_type, num_rows))
+            rows = np.frombuffer(buf, dtype=ROW_DTYPE, count=num_rows, offset=offset)
+            offset += num_rows * ROW_DTYPE.itemsize
+            if num_rows and rows.max() >= count:
+                raise CodecError("Invalid %s table delta row" % object_type)
+        else:
+            if len(buf) < offset + count * row_size:
+                raise CodecError("Invalid %s table of %d rows" % (object_type, count))
+            rows, num_rows = slice(0, count), count
+
+        for name, dtype in COLUMNS:
+            column = table.columns[name]
+            column[rows] = np.frombuffer(
+                buf, dtype=dtype, count=num_rows, offset=offset)
+            column[count:] = 0
+            offset += num_rows * dtype.itemsize
+        table.count = count
+    return tables, offset
+
+
+class DeltaEncoder(object):
+    """Encodes observations as deltas against the last observation the
+    receiver acknowledged, with a keyframe every `keyframe_interval`
+    observations.
+
+    Deltas are never based on an observation the receiver may not have
+    decoded, so observations can be dropped on the way, e.g. in
+    `latest_only` mode. Observations are keyframes until the receiver
+    acknowledges one of them.
+
+    Args:
+        keyframe_interval: Number of observations from one keyframe to the
+            next. Every observation is a keyframe if this is 1 or less. Also
+            the number of unacknowledged observations which are kept as
+            possible bases.
+    """
+
+    def __init__(self, keyframe_interval):
+        self.keyframe_interval = keyframe_interval
+        self._base = None
+        self._base_step = None
+        # Tables of the observations sent since the base, by step id
+        self._sent = collections.OrderedDict()
+        self._free = []
+        self._since_keyframe = 0
+
+    def request_keyframe(self):
+        """Make the next observations keyframes until the receiver
+        acknowledges another one, e.g. because it lost track of the
+        deltas."""
+        self._release(self._base)
+        self._base, self._base_step = None, None
+
+    def acknowledge(self, step):
+        """Base the following deltas on the observation `step`, which the
+        receiver decoded. Unknown or outdated steps are ignored."""
+        if step not in self._sent:
+            return
+        while self._sent:
+            sent_step, tables = self._sent.popitem(last=False)
+            if sent_step == step:
+                break
+            self._release(tables)
+        self._release(self._base)
+        self._base, self._base_step = tables, step
+
+    def encode(self, obs):
+        """Encode `obs` as a keyframe or a delta, see `encode_observation`."""
+        tables = obs.get("tables")
+        if not tables:
+            return encode_observation(obs)
+
+        self._since_keyframe += 1
+        if (self._base_step is None or
+                self._since_keyframe >= self.keyframe_interval):
+            payload = encode_observation(obs)
+            self._since_keyframe = 0
+        else:
+            payload = encode_observation(obs, self._base, self._base_step)
+
+        # Keep the tables until we know whether they were received
+        if len(self._sent) >= max(self.keyframe_interval, 1):
+            self._release(self._sent.popitem(last=False)[1])
+        sent = self._free.pop() if self._free else new_tables()
+        for object_type, table in tables.items():
+            sent[object_type].assign(table)
+        self._sent[obs.get("step", 0)] = sent
+        return payload
+
+    def _release(self, tables):
+        if tables is not None:
+            self._free.append(tables)
+
+
+class DeltaDecoder(object):
+    """Decodes keyframes and deltas into one persistent set of tables.
+
+    The tables of every decoded observation are the same `ObjectTable`
+    instances, updated in place, so they are only valid until the next
+    observation is decoded. Copies of the tables of acknowledged
+    observations are kept until the sender bases its deltas on a later one.
+
+    Args:
+        max_acknowledged: Maximum number of acknowledged observations held.
+    """
+
+    def __init__(self, max_acknowledged=16):
+        self.tables = new_tables()
+        self.max_acknowledged = max_acknowledged
+        self._base_step = None
+        self._acknowledged = collections.OrderedDict()
+        self._free = []
+
+    def reset(self):
+        """Forget the held observations, so only a keyframe is accepted."""
+        self._base_step = None
+        while self._acknowledged:
+            self._free.append(self._acknowledged.popitem()[1])
+
+    def acknowledge(self):
+        """Acknowledge the last decoded observation, so the sender may base
+        its deltas on it.
+
+        Returns:
+            The step id of the acknowledged observation, or 0 if no tables
+            have been decoded.
+        """
+        if self._base_step is None:
+            return 0
+        if self._base_step not in self._acknowledged:
+            if len(self._acknowledged) >= self.max_acknowledged:
+                self._free.append(self._acknowledged.popitem(last=False)[1])
+            tables = self._free.pop() if self._free else new_tables()
+            for object_type, table in self.tables.items():
+                tables[object_type].assign(table)
+            self._acknowledged[self._base_step] = tables
+        return self._base_step
+
+    def decode(self, buf):
+        """Decode an observation, see `decode_observation`.
+
+        Raises:
+            MissingBaseError: if `buf` is a delta against another
+                observation than the last decoded or an acknowledged one.
+        """
+        base_step = self._base_step
+        try:
+            try:
+                obs = decode_observation(buf, self.tables, base_step)
+            except MissingBaseError as e:
+                # Rewind to the acknowledged observation the delta is against
+                base = self._acknowledged.get(e.base_step)
+                if base is None:
+                    raise
+                for object_type, table in self.tables.items():
+                    table.assign(base[object_type])
+                base_step = e.base_step
+                obs = decode_observation(buf, self.tables, base_step)
+        except CodecError:
+            # The tables may be partially updated
+            self._base_step = None
+            raise
+        if "tables" in obs:
+            self._base_step = obs["step"]
+            # The sender never goes back to a base older than this delta's
+            if HEADER.unpack_from(buf)[2] & FLAG_DELTA:
+                while self._acknowledged:
+                    step = next(iter(self._acknowledged))
+                    if step >= base_step:
+                        break
+                    self._free.append(self._acknowledged.pop(step))
+        return obs
+
+
+def encode_actions(actions, step=0, time=0.0, repeat=1, ack=0):
+    """Encode a batch of (opcode, spell_slot, x, y) actions.
+    Args:
+        actions: A list of (opcode, spell_slot, x, y) tuples.
+        step: Step id of the batch.
+        time: Game time of the observation the batch responds to.
+        repeat: Number of observation ticks to apply the actions for, from
+            1 to 255. The actor only sends the observation of the last tick.
+        ack: Step id of the observation acknowledged by
+            `DeltaDecoder.acknowledge`, or 0 if none.
+    """
+    if not 1 <= repeat <= 255:
+        raise CodecError("Invalid action repeat: %d" % repeat)
+    return b"".join([
+        _pack_header(MessageKind.ACTIONS, step, time),
+        ACTIONS.pack(len(actions), repeat, ack)] +
+        [ACTION.pack(*action) for action in actions])
+
+
+def decode_actions(buf):
+    """Decode a batch of actions into an `ActionBatch`.
+    
+    Raises:
+        CodecError: if the message is malformed or from another version.
+    """
+    _, step, time = _unpack_header(buf, MessageKind.ACTIONS)
+    if len(buf) < HEADER.size + ACTIONS.size:
+        raise CodecError("Action batch has the wrong size: %d bytes" % len(buf))
+    count, repeat, ack = ACTIONS.unpack_from(buf, HEADER.size)
+    offset = HEADER.size + ACTIONS.size
+    if len(buf) != offset + count * ACTION.size:
+        raise CodecError("Action batch has the wrong size: %d bytes" % len(buf))
+    try:
+        actions = [
+            (Opcode(opcode), spell_slot, x, y) for opcode, spell_slot, x, y in
+            ACTION.iter_unpack(memoryview(buf)[offset:])]
+    except ValueError as e:
+        raise CodecError("Invalid action: %s" % e)
+    return ActionBatch(step, time, actions, repeat, ack)
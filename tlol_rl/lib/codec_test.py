@@ -0,0 +1,177 @@
+# MIT License
+# 
+# Copyright (c) 2023 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Tests for the observation and action codec."""
+
+import numpy as np
+from absl.testing import absltest
+
+from tlol_rl.lib import codec
+from tlol_rl.transports import shm_transport
+
+
+def make_obs(step, tables):
+    return {
+        "time": 30.0 + step / 10.0,
+        "step": step,
+        "action_step": 0,
+        "available_actions": {"can_move": True},
+        "tables": tables
+    }
+
+
+def advance(tables, step):
+    """Move a few minions and spawn or kill one, like a game tick would."""
+    minions = tables["minions"]
+    minions.count = 5 + step % 3
+    minions["net_id"][:minions.count] = np.arange(minions.count)
+    minions["pos_x"][:minions.count] += 1.0
+    minions["health"][step % minions.count] = float(step)
+    for name, _ in codec.COLUMNS:
+        minions[name][minions.count:] = 0
+
+
+class DeltaCodecTest(absltest.TestCase):
+
+    def assertTablesEqual(self, actual, expected):
+        for object_type in codec.OBJECT_TYPES:
+            self.assertEqual(actual[object_type].count, expected[object_type].count)
+            for name, _ in codec.COLUMNS:
+                np.testing.assert_array_equal(
+                    actual[object_type][name], expected[object_type][name])
+
+    def test_deltas_survive_dropped_observations(self):
+        encoder = codec.DeltaEncoder(keyframe_interval=100)
+        decoder = codec.DeltaDecoder()
+        tables = codec.new_tables()
+        deltas = 0
+        for step in range(1, 60):
+            advance(tables, step)
+            payload = encoder.encode(make_obs(step, tables))
+            # Drop two of every three observations
+            if step % 3:
+                continue
+            obs = decoder.decode(payload)
+            self.assertTablesEqual(obs["tables"], tables)
+            if codec.HEADER.unpack_from(payload)[2] & codec.FLAG_DELTA:
+                deltas += 1
+            batch = codec.decode_actions(
+                codec.encode_actions([], step, obs["time"], ack=decoder.acknowledge()))
+            encoder.acknowledge(batch.ack)
+        # Only the first observation is a keyframe
+        self.assertEqual(deltas, 59 // 3 - 1)
+
+    def test_acknowledgement_in_flight(self):
+        encoder = codec.DeltaEncoder(keyframe_interval=100)
+        decoder = codec.DeltaDecoder()
+        tables = codec.new_tables()
+
+        advance(tables, 1)
+        decoder.decode(encoder.encode(make_obs(1, tables)))
+        encoder.acknowledge(decoder.acknowledge())
+
+        # Acknowledge step 2 while the actor already sent step 3 against 1
+        advance(tables, 2)
+        decoder.decode(encoder.encode(make_obs(2, tables)))
+        ack = decoder.acknowledge()
+        advance(tables, 3)
+        obs = decoder.decode(encoder.encode(make_obs(3, tables)))
+        self.assertTablesEqual(obs["tables"], tables)
+
+        encoder.acknowledge(ack)
+        advance(tables, 4)
+        obs = decoder.decode(encoder.encode(make_obs(4, tables)))
+        self.assertTablesEqual(obs["tables"], tables)
+
+    def test_unknown_base_needs_keyframe(self):
+        encoder = codec.DeltaEncoder(keyframe_interval=100)
+        tables = codec.new_tables()
+        advance(tables, 1)
+        encoder.encode(make_obs(1, tables))
+        encoder.acknowledge(1)
+        advance(tables, 2)
+        payload = encoder.encode(make_obs(2, tables))
+
+        decoder = codec.DeltaDecoder()
+        with self.assertRaises(codec.MissingBaseError):
+            decoder.decode(payload)
+        encoder.request_keyframe()
+        obs = decoder.decode(encoder.encode(make_obs(3, tables)))
+        self.assertTablesEqual(obs["tables"], tables)
+
+    def test_latest_only_transport(self):
+        controller = shm_transport.ShmTransport(capacity=1 << 16, latest_only=True)
+        self.addCleanup(controller.close)
+        actor = shm_transport.ShmTransport.from_environ(controller.actor_environ())
+        self.addCleanup(actor.close)
+
+        encoder = codec.DeltaEncoder(keyframe_interval=100)
+        decoder = codec.DeltaDecoder()
+        tables = codec.new_tables()
+        step = 0
+        for action_step in range(1, 20):
+            # The actor observes a few ticks before the controller receives
+            for _ in range(4):
+                step += 1
+                advance(tables, step)
+                actor.send_observation(encoder.encode(make_obs(step, tables)))
+            obs = decoder.decode(controller.recv_observation(1))
+            self.assertEqual(obs["step"], step)
+            self.assertTablesEqual(obs["tables"], tables)
+
+            controller.send_actions(codec.encode_actions(
+                [], action_step, obs["time"], ack=decoder.acknowledge()))
+            for payload in actor.recv_actions():
+                encoder.acknowledge(codec.decode_actions(payload).ack)
+        self.assertGreater(controller.dropped, 0)
+
+
+class TruncatedMessageTest(absltest.TestCase):
+
+    def test_truncated_observations(self):
+        tables = codec.new_tables()
+        advance(tables, 1)
+        obs = make_obs(1, tables)
+        obs["self"] = {"name": "Ezreal", "team": 100, "pos_x": 1.0, "pos_y": 2.0}
+        keyframe = codec.encode_observation(obs)
+        delta = codec.encode_observation(obs, codec.new_tables(), 0)
+        for payload in (keyframe, delta):
+            for size in range(len(payload)):
+                with self.assertRaises(codec.CodecError):
+                    codec.decode_observation(payload[:size], codec.new_tables(), 0)
+
+    def test_truncated_actions(self):
+        payload = codec.encode_actions(
+            [(codec.Opcode.MOVE, 0, 1.0, 2.0), (codec.Opcode.SPELL, 1, 3.0, 4.0)],
+            step=1, time=30.0, repeat=2, ack=1)
+        self.assertEqual(len(codec.decode_actions(payload).actions), 2)
+        for size in range(len(payload)):
+            with self.assertRaises(codec.CodecError):
+                codec.decode_actions(payload[:size])
+
+    def test_invalid_opcode(self):
+        payload = codec.encode_actions([(255, 0, 0.0, 0.0)])
+        with self.assertRaises(codec.CodecError):
+            codec.decode_actions(payload)
+
+
+if __name__ == "__main__":
+    absltest.main()
@@ -39,5 +39,8 @@ class Action(object):
         return str(self.props)
 
 class RequestAction(object):
-    def __init__(self, actions):
-        self.actions = actions
\ No newline at end of file
+    """The actions to send in one batch, which the TLoL-RL server applies
+    for `repeat` consecutive observation ticks."""
+    def __init__(self, actions, repeat=1):
+        self.actions = actions
+        self.repeat = repeat
\ No newline at end of file
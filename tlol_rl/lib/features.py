@@ -28,9 +28,16 @@ import numpy as np
 from tlol_rl.lib import named_array
 from tlol_rl.lib import point
 from tlol_rl.lib import actions
+from tlol_rl.lib import codec
 from tlol_rl.lib import common
 
 
+# Columns of the object tables which are given to agents as float32
+# features, i.e. every column but the network id. Network ids are given as
+# separate int32 arrays, as float32 can't tell most of them apart.
+TABLE_FEATURES = tuple(name for name, _ in codec.COLUMNS if name != "net_id")
+
+
 class ChampUnit(enum.IntEnum):
     """Indices into the `ChampUnit` observation."""
     pass
@@ -192,6 +199,13 @@ class Features(object):
 
         obs_spec["available_actions"] = (0,)
 
+        # One row of `TABLE_FEATURES` per observed object of each type
+        for object_type in codec.OBJECT_TYPES:
+            capacity = codec.OBJECT_CAPACITY[object_type]
+            obs_spec[object_type] = (capacity, len(TABLE_FEATURES))
+            obs_spec[object_type + "_net_id"] = (capacity,)
+            obs_spec[object_type + "_mask"] = (capacity,)
+
         return obs_spec
 
     def action_spec(self):
@@ -277,8 +291,16 @@ class Features(object):
 
         return lol_action
 
-    def transform_obs(self, obs):
-        """Render some TLoL-RL Server observations into something an agent can handle."""
+    def transform_obs(self, obs, team=None):
+        """Render some TLoL-RL Server observations into something an agent can handle.
+
+        Args:
+            obs: A decoded observation.
+            team: Optional in-game team id (e.g. 100 for blue) of the agent
+                the observation is for. If given, the `team` column of the
+                object tables is relative to that agent: 1 for its allies, -1
+                for its enemies and 0 for neither, e.g. jungle monsters.
+        """
 
         # Print original observation
         logging.info("transform_obs().obs: " + str(obs))
@@ -293,10 +315,34 @@ class Features(object):
             np.array(
                 self.available_actions(obs),
                 dtype=np.int32)
+
+        # Object tables, with the rows of invalid objects zeroed
+        if "tables" in obs:
+            for object_type, table in obs["tables"].items():
+                out[object_type] = np.stack(
+                    [table[name].astype(np.float32) for name in TABLE_FEATURES],
+                    axis=-1)
+                out[object_type + "_net_id"] = table["net_id"].astype(np.int32)
+                out[object_type + "_mask"] = table.mask
+                if team is not None:
+                    out[object_type][:, _TEAM_COLUMN] = _relative_team(table["team"], team)
         
         return out
 
 
+_TEAM_COLUMN = TABLE_FEATURES.index("team")
+
+# In-game ids of the two opposing teams
+_OPPOSING_TEAMS = {100: 200, 200: 100}
+
+
+def _relative_team(teams, team):
+    """Map in-game team ids to 1 for `team`, -1 for its enemy and 0 for
+    anything else."""
+    enemy = _OPPOSING_TEAMS.get(team)
+    return (teams == team).astype(np.float32) - (teams == enemy).astype(np.float32)
+
+
 def _init_valid_functions(action_dimensions):
     """Initialize ValidFunctions and set up the callbacks."""
     sizes = {
@@ -0,0 +1,70 @@
+# MIT License
+# 
+# Copyright (c) 2023 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Tests for converting observations into agent features."""
+
+import numpy as np
+from absl.testing import absltest
+
+from tlol_rl.lib import codec
+from tlol_rl.lib import features
+
+
+class TransformObsTest(absltest.TestCase):
+
+    def setUp(self):
+        super(TransformObsTest, self).setUp()
+        self.features = features.Features(
+            agent_interface_format=features.parse_agent_interface_format(
+                feature_map=16000, feature_move_range=8))
+
+    def _obs(self):
+        tables = codec.new_tables()
+        champs = tables["champs"]
+        champs.count = 2
+        champs["net_id"][:2] = [0x40000001, 0x40000002]
+        champs["team"][:2] = [100, 200]
+        champs["health"][:2] = [500.0, 250.0]
+        return codec.decode_observation(codec.encode_observation(
+            {"time": 31.0, "available_actions": {"can_move": True}, "tables": tables}))
+
+    def test_net_ids_stay_distinct(self):
+        out = self.features.transform_obs(self._obs())
+        np.testing.assert_array_equal(
+            out["champs_net_id"][:3], [0x40000001, 0x40000002, 0])
+        self.assertEqual(out["champs_net_id"].dtype, np.int32)
+
+    def test_table_features(self):
+        out = self.features.transform_obs(self._obs(), team=200)
+        spec = self.features.observation_spec()
+        for object_type in codec.OBJECT_TYPES:
+            for key in (object_type, object_type + "_net_id", object_type + "_mask"):
+                self.assertEqual(out[key].shape, spec[key])
+        champs = out["champs"]
+        self.assertEqual(champs.dtype, np.float32)
+        health = features.TABLE_FEATURES.index("health")
+        team = features.TABLE_FEATURES.index("team")
+        np.testing.assert_array_equal(champs[:2, health], [500.0, 250.0])
+        np.testing.assert_array_equal(champs[:3, team], [-1.0, 1.0, 0.0])
+
+
+if __name__ == "__main__":
+    absltest.main()
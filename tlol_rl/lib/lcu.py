@@ -27,96 +27,432 @@ from absl import logging
 import base64
 import requests
 import json
+import os
 import psutil
-import uuid
+import ssl
+import threading
 import time
+import uuid
+
+from tlol_rl.lib import startup
 
 import urllib3
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# The event feed is optional, without it state changes are polled for
+try:
+    import websocket
+except ImportError:
+    websocket = None
+
+# WAMP message types of the client's event feed
+WAMP_SUBSCRIBE = 5
+WAMP_EVENT = 8
+
+# Process of the client which serves the LCU API
+CLIENT_PROCESS_NAME = "LeagueClientUx.exe"
+
+# The client writes `name:pid:port:password:protocol` to this file in its
+# installation directory while it runs
+LOCKFILE_NAME = "lockfile"
+DEFAULT_CLIENT_DIRS = [
+    "C:/Riot Games/League of Legends"
+]
+
+# Credentials found per client directory, shared by every LCU in the
+# process so launching many environments doesn't search for each one
+_credentials = {}
+_credentials_lock = threading.Lock()
+
+
+def read_lockfile(client_dir):
+    """Read the `remoting_auth_token` and `app_port` from the lockfile of
+    the client installed in `client_dir`.
+
+    Returns:
+        The token and port, or None if there is no lockfile or the process
+        which wrote it isn't running anymore.
+    """
+    path = os.path.join(os.path.expanduser(client_dir), LOCKFILE_NAME)
+    try:
+        with open(path) as f:
+            _, pid, port, token, _ = f.read().strip().split(":")
+    except (OSError, ValueError):
+        return None
+    if not psutil.pid_exists(int(pid)):
+        logging.info("Ignoring stale LCU lockfile: %s" % path)
+        return None
+    return token, port
+
+
+def scan_processes():
+    """Find the `remoting_auth_token` and `app_port` on the command line of
+    a running client. Only the names of processes are read until it's found.
+
+    Returns:
+        The token and port, or None if no client is running.
+    """
+    for proc in psutil.process_iter(["name"]):
+        if proc.info["name"] != CLIENT_PROCESS_NAME:
+            continue
+        try:
+            cmdline = proc.cmdline()
+        except (psutil.NoSuchProcess, psutil.AccessDenied) as e:
+            logging.info("Couldn't read the client's command line: %s" % e)
+            continue
+        port = None
+        tok = None
+        for arg in cmdline:
+            if "--app-port" in arg:
+                port = arg.split("=")[1]
+            elif "--remoting-auth-token" in arg:
+                tok = arg.split("=")[1]
+        if tok and port:
+            return tok, port
+    return None
+
+
+def find_credentials(client_dir=None):
+    """Find the `remoting_auth_token` and `app_port` of a running client.
+
+    Cached credentials are used first, then the lockfile of the client in
+    `client_dir` (or a default installation directory) and only then the
+    command lines of the running processes.
+
+    Returns:
+        The token and port, or (None, None) if no client is running.
+    """
+    with _credentials_lock:
+        if client_dir in _credentials:
+            return _credentials[client_dir]
+
+    client_dirs = [client_dir] if client_dir else DEFAULT_CLIENT_DIRS
+    for d in client_dirs:
+        credentials = read_lockfile(d)
+        if credentials:
+            break
+    else:
+        credentials = scan_processes()
+    if not credentials:
+        return None, None
+
+    with _credentials_lock:
+        _credentials[client_dir] = credentials
+    return credentials
+
+
+def invalidate_credentials(client_dir=None):
+    """Forget the cached credentials of a client, e.g. after it restarted."""
+    with _credentials_lock:
+        _credentials.pop(client_dir, None)
+
+
+class LCUEvents(object):
+    """Subscription to the client's websocket event feed, which pushes an
+    event (its `uri`, `eventType` and `data`) for every change of an API
+    resource.
+
+    Requires the `websocket-client` package.
+
+    Args:
+        url: URL of the feed, e.g. `wss://127.0.0.1:<app-port>/`.
+        headers: HTTP headers of the handshake, i.e. the authorization.
+        timeout: Seconds to wait for the handshake.
+    """
+
+    def __init__(self, url, headers, timeout=5):
+        if websocket is None:
+            raise ImportError("The LCU event feed requires `websocket-client`.")
+        self._ws = websocket.create_connection(
+            url,
+            header=["%s: %s" % h for h in headers.items()],
+            sslopt={"cert_reqs": ssl.CERT_NONE},
+            timeout=timeout)
+        self._ws.settimeout(None)
+        self._ws.send(json.dumps([WAMP_SUBSCRIBE, "OnJsonApiEvent"]))
+
+        # Latest event and its sequence number, per resource
+        self._cond = threading.Condition()
+        self._events = {}
+        self._seq = 0
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def seq(self):
+        """Sequence number of the last event received."""
+        with self._cond:
+            return self._seq
+
+    def _run(self):
+        while True:
+            try:
+                msg = self._ws.recv()
+            except Exception:
+                break
+            if not msg:
+                continue
+            try:
+                msg_type, _, event = json.loads(msg)
+            except ValueError:
+                continue
+            if msg_type != WAMP_EVENT:
+                continue
+            with self._cond:
+                self._seq += 1
+                self._events[event["uri"]] = (self._seq, event)
+                self._cond.notify_all()
+
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def wait(self, uri, predicate, timeout, after=0):
+        """Wait for an event of `uri` received after the event numbered
+        `after` whose data satisfies `predicate`.
+
+        Args:
+            uri: Resource, e.g. `/lol-lobby/v2/lobby`.
+            predicate: Callable taking the data of the resource, which is
+                None once it has been deleted.
+            timeout: Seconds to wait for the event.
+            after: Sequence number from `seq` before the request causing the
+                event was sent.
+
+        Returns:
+            The data of the event.
+
+        Raises:
+            startup.StartupError: If no such event arrived within `timeout`.
+            ConnectionError: If the feed closed.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                seq, event = self._events.get(uri, (0, None))
+                if seq > after:
+                    data = None if event["eventType"] == "Delete" else event["data"]
+                    if predicate(data):
+                        return data
+                if self._closed:
+                    raise ConnectionError("The LCU event feed closed.")
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise startup.StartupError(
+                        "No event of %s after %s seconds" % (uri, timeout))
+                self._cond.wait(remaining)
+
+    def close(self):
+        self._ws.close()
+
 
 class LCU(object):
-    def __init__(self, remoting_auth_token=None, app_port=None, timeout=0.5):
+    def __init__(self,
+                 remoting_auth_token=None,
+                 app_port=None,
+                 timeout=0.5,
+                 state_timeout=30,
+                 events=True,
+                 protocol="https",
+                 pool_size=4,
+                 client_dir=None):
         """Initialises LCU API using either provided `remoting_auth_token`
         and `app_port` or tries to automatically find it from a running
         client.
+
+        Requests share one HTTP session, which keeps its connections to the
+        client alive. After changing the lobby, each call waits until the
+        client applied the change, using the client's event feed if
+        `websocket-client` is installed and polling otherwise.
+
+        Args:
+            timeout: Seconds to wait for the client to answer a request.
+            state_timeout: Seconds to wait for the client to apply a change.
+            events: Whether to subscribe to the client's event feed, rather
+            than polling for changes.
+            protocol: `https`, or `http` for a mock client.
+            pool_size: Number of connections kept open to the client.
+            client_dir: Installation directory of the client, whose lockfile
+            holds its credentials.
         """
+        self.timeout = timeout
+        self.state_timeout = state_timeout
+        self.protocol = protocol
+        self.client_dir = client_dir
+        self._discovered = False
+        self._use_events = events and websocket is not None
+        self._events = None
+
+        self._session = requests.Session()
+        self._session.verify = False
+        self._session.headers["Content-Type"] = "application/json"
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_size)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+        self._set_credentials(remoting_auth_token, app_port)
+
+    def _set_credentials(self, remoting_auth_token, app_port):
         self.remoting_auth_token = remoting_auth_token
         self.app_port = app_port
-        self.timeout = timeout
+
+        # Encode the authorization once for every request
+        auth_token = base64.b64encode(
+            f"riot:{self.remoting_auth_token}".encode("utf-8"))
+        self._session.headers["Authorization"] = \
+            "Basic " + str(auth_token, encoding="utf-8")
 
     def late_init(self):
         """Allows initialising an LCU class without having an
         already running client. Useful if running the client
         asynchronously."""
-        self.remoting_auth_token, self.app_port = \
-            self.get_lcu_params()
-    
+        self._set_credentials(*self.get_lcu_params())
+        self._discovered = self.app_port is not None
+
+    def invalidate(self):
+        """Forget credentials which no longer work, if they were found
+        automatically, so `late_init` searches for them again."""
+        if self._discovered:
+            logging.info("Invalidating LCU credentials of port %s." % self.app_port)
+            invalidate_credentials(self.client_dir)
+            self._set_credentials(None, None)
+            self._discovered = False
+
+    def wait_ready(self, timeout=60):
+        """Waits until the client runs and its API answers requests, then
+        initialises the LCU with its `remoting-auth-token` and `app-port`
+        and subscribes to its event feed.
+
+        Raises:
+            startup.StartupError: if the client isn't ready within `timeout`
+                seconds.
+        """
+        def probe():
+            if not self.app_port:
+                self.late_init()
+                if not self.app_port:
+                    return False
+            return self.responds("/lol-gameflow/v1/gameflow-phase")
+
+        startup.wait_for(probe, timeout, "League of Legends client",
+                         initial_delay=0.1, max_delay=1.0)
+        self.subscribe()
+
+    def subscribe(self):
+        """Subscribe to the client's event feed, if enabled and not already.
+
+        Returns:
+            Whether state changes are waited for with events.
+        """
+        if self._use_events and self._events is None:
+            ws_protocol = "wss" if self.protocol == "https" else "ws"
+            try:
+                self._events = LCUEvents(
+                    f"{ws_protocol}://127.0.0.1:{self.app_port}/",
+                    {"Authorization": self._session.headers["Authorization"]},
+                    timeout=self.timeout)
+            except Exception as e:
+                logging.warning("Polling the LCU, as its event feed failed: %s" % e)
+                self._use_events = False
+        return self._events is not None
+
+    def close(self):
+        """Close the event feed and the connections to the client."""
+        if self._events:
+            self._events.close()
+            self._events = None
+        self._session.close()
+
+    def responds(self, suffix_url):
+        """Whether a GET request of `suffix_url` succeeds, which probes for
+        the client being ready, e.g. for a champion select to start."""
+        try:
+            return self.request(suffix_url=suffix_url, method="get").status_code == 200
+        except requests.RequestException:
+            return False
+
+    def get(self, suffix_url):
+        """Get the data of a resource, or None if it doesn't exist."""
+        res = self.request(suffix_url=suffix_url, method="get")
+        if res.status_code != 200:
+            return None
+        return res.json()
+
     def request(self, suffix_url, method, data=None):
         """Sends a request to the LCU API."""
-        
-        time.sleep(self.timeout)
-
-        # Auth and port
-        auth_token = base64.b64encode(
-            f"riot:{self.remoting_auth_token}".encode("utf-8"))
-        auth_token = str(auth_token, encoding="utf-8")
-        app_port = self.app_port
-        url = f"https://127.0.0.1:{app_port}{suffix_url}"
+        url = f"{self.protocol}://127.0.0.1:{self.app_port}{suffix_url}"
 
         # Validate HTTP method
         if not method in ["get", "post", "patch"]:
             raise ValueError("Invalid HTTP method: " + url + " " + method)
 
-        # Execute HTTP call and return data
-        if method == "post":
-            req = requests.post(
-                url=url,
-                headers={
-                    "Authorization": f"Basic {auth_token}",
-                    "Content-Type": "application/json"
-                },
-                data=json.dumps(data),
-                verify=False)
-        elif method == "patch":
-            req = requests.patch(
-                url=url,
-                headers={
-                    "Authorization": f"Basic {auth_token}",
-                    "Content-Type": "application/json"
-                },
-                data=json.dumps(data),
-                verify=False)
-        elif method == "get":
-            print("CUSTOM START:", url)
-            req = requests.get(
-                url=url,
-                headers={
-                    "Authorization": f"Basic {auth_token}",
-                    "Content-Type": "application/json"
-                },
-                verify=False)
-        return req
+        # Execute HTTP call and return data, and stop using credentials
+        # which the client doesn't accept anymore
+        try:
+            if method == "get":
+                res = self._session.get(url, timeout=self.timeout)
+            else:
+                res = self._session.request(
+                    method, url, data=json.dumps(data), timeout=self.timeout)
+        except requests.ConnectionError:
+            self.invalidate()
+            raise
+        if res.status_code == 401:
+            self.invalidate()
+        return res
+
+    @property
+    def seq(self):
+        """Marks the state changes seen so far, for `wait_state`."""
+        return self._events.seq if self._events else 0
+
+    def wait_state(self, uri, predicate, after=0):
+        """Wait until the data of the resource `uri` satisfies `predicate`.
+
+        Args:
+            uri: Resource, e.g. `/lol-lobby/v2/lobby`.
+            predicate: Callable taking the data of the resource, which is
+                None if it doesn't exist.
+            after: `seq` from before the requests which change the resource.
+
+        Returns:
+            The data of the resource.
+
+        Raises:
+            startup.StartupError: If the change wasn't applied within
+                `state_timeout`.
+        """
+        if self._events:
+            return self._events.wait(uri, predicate, self.state_timeout, after=after)
+
+        def probe():
+            data = self.get(uri)
+            return (data,) if predicate(data) else None
+        data, = startup.wait_for(probe, self.state_timeout, uri,
+                                 initial_delay=0.02, max_delay=0.5)
+        return data
+
+    def _change(self, uri, predicate, suffix_url, method, data=None, wait=True):
+        """Send a request which changes the resource `uri`, then wait until
+        its data satisfies `predicate`, unless `wait` is False.
+
+        Returns:
+            The response of the request.
+        """
+        after = self.seq
+        res = self.request(suffix_url=suffix_url, method=method, data=data)
+        if res.ok and wait:
+            self.wait_state(uri, predicate, after=after)
+        return res
 
     def get_lcu_params(self):
         """Attempts to automatically acquire the `remoting_auth_token`
-        and `app_port` from a running League of Legends client."""
-        for proc in psutil.process_iter():
-            try:
-                n = proc.name()
-                if n == "LeagueClientUx.exe":
-                    cmdline = proc.cmdline()
-                    port = None
-                    tok = None
-                    for arg in cmdline:
-                        if "--app-port" in arg:
-                            port = arg.split("=")[1]
-                        elif "--remoting-auth-token" in arg:
-                            tok = arg.split("=")[1]
-                    return tok, port
-            except:
-                pass
-        return None, None
+        and `app_port` from a running League of Legends client. See
+        `find_credentials`."""
+        return find_credentials(self.client_dir)
 
     def create_custom(self, title, map_id=11):
         data = {
@@ -135,80 +471,115 @@ class LCU(object):
             },
             "isCustom": True
         }
-        res = self.request(
+        return self._change(
+            "/lol-lobby/v2/lobby",
+            lambda lobby: lobby is not None,
             suffix_url="/lol-lobby/v2/lobby",
             method="post",
             data=data)
-        return res
     
-    def add_bot(self, champ_id=3, difficulty="MEDIUM", team="200"):
+    def add_bot(self, champ_id=3, difficulty="MEDIUM", team="200", wait=True):
+        """Add a bot to the custom game lobby. Set `wait` to False to add
+        several at once, then wait for all of them, see
+        `lobby.LobbyBuilder`."""
         data = {
             "botDifficulty": difficulty,
             "championId": champ_id,
             "teamId": team
         }
-        res = self.request(
+        return self._change(
+            "/lol-lobby/v2/lobby",
+            lambda lobby: lobby is not None and any(
+                m.get("isBot") and m.get("botChampionId") == champ_id
+                for m in lobby.get("members", [])),
             suffix_url="/lol-lobby/v1/lobby/custom/bots",
             method="post",
-            data=data)
-        return res
+            data=data,
+            wait=wait)
 
     def client_loaded(self, timeout=30):
         """Waits until the client is loaded. Tries
         until `timeout` number of seconds before giving up."""
-        for tm in range(timeout):
-            for proc in psutil.process_iter():
-                try:
-                    n = proc.name()
-                    if n == "LeagueClientUx.exe":
-                        return True
-                except:
-                    pass
-            logging.info(
-                "Waiting for League of Legends client for %d/%d seconds." %
-                (tm, timeout))
-            time.sleep(1)
-        return False
+        def probe():
+            if self.get_lcu_params()[1] is not None:
+                return True
+            logging.info("Waiting for League of Legends client.")
+            return False
+
+        try:
+            return startup.wait_for(probe, timeout, "League of Legends client",
+                                    initial_delay=0.1)
+        except startup.StartupError:
+            return False
     
     def start_champ_select(self):
         """Start champion selection process after creating a custom
         game."""
-        res = self.request(
+        return self._change(
+            "/lol-champ-select/v1/session",
+            lambda session: session is not None,
             suffix_url="/lol-lobby/v1/lobby/custom/start-champ-select",
             method="post")
-        return res
     
-    def pick_champion(self, champ_id):
-        """Selects a champion to lock in during pick-phase."""
+    def switch_teams(self, team="200"):
+        """Move our player to the other team of the custom game lobby, and
+        wait until it's on `team`."""
+        return self._change(
+            "/lol-lobby/v2/lobby",
+            lambda lobby: lobby is not None and
+                lobby["localMember"]["teamId"] == int(team),
+            suffix_url="/lol-lobby/v1/lobby/custom/switch-teams",
+            method="post")
+
+    def pick_action_id(self, session=None):
+        """Get the id of our own pick action in the champion select.
+
+        Args:
+            session: The champion select session, which is fetched if None.
+
+        Returns:
+            The id, or None if there's no champion select or we already
+            picked.
         """
-        data = {
-            "actorCellId": 0,
-            "championId": 0,
-            "completed": True,
-            "id": champ_id,
-            "isAllyAction": True,
-            "type": "string"
-        }
-        
-        res = self.request(
-            suffix_url="/lol-champ-select/v1/session",
-            method="get")
-        
-        print(res.status_code, res.text)
-        if not res.status_code == 200:
-            return res
-        actions = json.loads(res.text)
+        if session is None:
+            session = self.get("/lol-champ-select/v1/session")
+        if not session:
+            return None
+        for phase in session.get("actions", []):
+            for action in phase:
+                if (action["actorCellId"] == session["localPlayerCellId"] and
+                        action["type"] == "pick" and not action["completed"]):
+                    return action["id"]
+        return None
+
+    def pick_champion(self, champ_id, action_id=None):
+        """Selects a champion to lock in during pick-phase.
+
+        Args:
+            champ_id: Id of the champion.
+            action_id: Id of our pick action, which is looked up from the
+                champion select session if None.
         """
+        session = self.get("/lol-champ-select/v1/session")
+        if not session:
+            raise RuntimeError("No champion select")
+        if action_id is None:
+            action_id = self.pick_action_id(session)
+            if action_id is None:
+                raise RuntimeError("No pick action of ours in the champion select")
 
         data = {
-            "actorCellId": 0,
-            "championId": champ_id, # Aphelios
+            "actorCellId": session["localPlayerCellId"],
+            "championId": champ_id,
             "completed": True,
-            "id": 1,
+            "id": action_id,
             "isAllyAction": True,
         }
-        res = self.request(
-            suffix_url="/lol-champ-select/v1/session/actions/2",
+        return self._change(
+            "/lol-champ-select/v1/session",
+            lambda session: session is not None and any(
+                a["id"] == action_id and a["completed"]
+                for phase in session.get("actions", []) for a in phase),
+            suffix_url="/lol-champ-select/v1/session/actions/%d" % action_id,
             method="patch",
             data=data)
-        return res
\ No newline at end of file
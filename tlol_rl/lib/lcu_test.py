@@ -0,0 +1,102 @@
+# MIT License
+# 
+# Copyright (c) 2023 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Tests for the LCU API client, against `mock_lcu.MockLCU`."""
+
+from absl.testing import absltest
+from absl.testing import parameterized
+
+from tlol_rl.lib import lcu as lcu_lib
+from tlol_rl.lib import mock_lcu
+
+
+class LCUTest(parameterized.TestCase):
+
+    def _lcu(self, events, **kwargs):
+        if events and lcu_lib.websocket is None:
+            self.skipTest("The LCU event feed requires `websocket-client`.")
+        mock = mock_lcu.MockLCU(transition_delay=0.01, **kwargs).start()
+        self.addCleanup(mock.close)
+        client = mock.lcu(events=events, state_timeout=5)
+        self.addCleanup(client.close)
+        client.wait_ready(timeout=5)
+        self.assertEqual(client.subscribe(), events)
+        return mock, client
+
+    @parameterized.named_parameters(("events", True), ("polling", False))
+    def test_custom_game_flow(self, events):
+        mock, client = self._lcu(events)
+
+        res = client.create_custom(title="TLoL-RL")
+        self.assertEqual(res.status_code, 200)
+        # Each call returns once the client applied its change
+        self.assertIsNotNone(mock.lobby)
+
+        res = client.add_bot(champ_id=22, team="200")
+        self.assertTrue(res.ok)
+        bots = [m for m in mock.lobby["members"] if m["isBot"]]
+        self.assertEqual([(b["botChampionId"], b["teamId"]) for b in bots], [(22, 200)])
+
+        res = client.start_champ_select()
+        self.assertEqual(res.status_code, 200)
+        self.assertIsNotNone(mock.session)
+        self.assertEqual(client.pick_action_id(), mock.first_action_id)
+
+        res = client.pick_champion(champ_id=81)
+        self.assertEqual(res.status_code, 204)
+        action = mock.session["actions"][0][0]
+        self.assertEqual(action["championId"], 81)
+        self.assertTrue(action["completed"])
+        self.assertIsNone(client.pick_action_id())
+
+    @parameterized.named_parameters(("events", True), ("polling", False))
+    def test_pick_champion_from_another_cell(self, events):
+        mock, client = self._lcu(events)
+        client.create_custom(title="TLoL-RL")
+        client.add_bot(champ_id=22, team="100")
+        client.switch_teams(team="200")
+        client.start_champ_select()
+        self.assertEqual(mock.session["localPlayerCellId"], 1)
+
+        res = client.pick_champion(champ_id=81)
+        self.assertEqual(res.status_code, 204)
+        action = mock.session["actions"][0][1]
+        self.assertEqual(action["championId"], 81)
+        self.assertTrue(action["completed"])
+
+    def test_pick_champion_without_champ_select(self):
+        _, client = self._lcu(False)
+        with self.assertRaises(RuntimeError):
+            client.pick_champion(champ_id=81)
+
+    def test_wrong_credentials(self):
+        mock = mock_lcu.MockLCU().start()
+        self.addCleanup(mock.close)
+        client = lcu_lib.LCU(remoting_auth_token="wrong",
+                             app_port=mock.port,
+                             protocol="http",
+                             events=False)
+        self.addCleanup(client.close)
+        self.assertFalse(client.responds("/lol-gameflow/v1/gameflow-phase"))
+
+
+if __name__ == "__main__":
+    absltest.main()
@@ -0,0 +1,164 @@
+# MIT License
+# 
+# Copyright (c) 2023 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Set up custom game lobbies, e.g. for 5v5 games, through the LCU API."""
+
+import collections
+from concurrent import futures
+
+from absl import logging
+
+LOBBY_URI = "/lol-lobby/v2/lobby"
+
+# Most players of each team in a custom game
+TEAM_SIZE = 5
+
+# Team ids of a custom game, the first of which our client joins
+TEAM_IDS = (100, 200)
+
+
+class LobbyError(Exception):
+    pass
+
+
+class Bot(collections.namedtuple("Bot", ["champ_id", "team_id", "difficulty"])):
+    """A bot to add to a lobby, by champion id and in-game team id."""
+    def __new__(cls, champ_id, team_id=200, difficulty="MEDIUM"):
+        return super(Bot, cls).__new__(cls, champ_id, team_id, difficulty)
+
+
+def _lobby_bots(lobby):
+    """Count the bots of a lobby by (champion id, team id)."""
+    return collections.Counter(
+        (m.get("botChampionId"), m.get("teamId"))
+        for m in lobby.get("members", []) if m.get("isBot"))
+
+
+class LobbyBuilder(object):
+    """Creates a custom game lobby with a team composition, and picks our
+    champion.
+
+    Every bot is added concurrently, then the lobby is verified once with
+    the state which follows all of them, rather than waiting for each bot
+    in turn.
+
+    Args:
+        lcu: A ready `lcu.LCU`.
+        max_workers: Most requests sent to the client at once.
+        title: Name of the lobby.
+        map_id: Id of the map.
+    """
+
+    def __init__(self, lcu, max_workers=4, title="TLoL-RL", map_id=11):
+        self._lcu = lcu
+        self._max_workers = max_workers
+        self._title = title
+        self._map_id = map_id
+
+    def _validate(self, bots, team_id):
+        for team in [team_id] + [bot.team_id for bot in bots]:
+            if team not in TEAM_IDS:
+                raise ValueError("Invalid team id: %s" % team)
+        counts = collections.Counter(bot.team_id for bot in bots)
+        counts[team_id] += 1
+        for team, count in counts.items():
+            if count > TEAM_SIZE:
+                raise ValueError("Team %d has %d players, at most %d fit." % (
+                    team, count, TEAM_SIZE))
+
+    def add_bots(self, bots):
+        """Add bots to the lobby concurrently, and wait until all of them
+        joined.
+
+        Returns:
+            The lobby.
+
+        Raises:
+            LobbyError: If the client refused a bot.
+        """
+        # No change of the lobby to wait for
+        if not bots:
+            return self._lcu.get(LOBBY_URI)
+
+        after = self._lcu.seq
+        def add(bot):
+            return self._lcu.add_bot(champ_id=bot.champ_id,
+                                     difficulty=bot.difficulty,
+                                     team=str(bot.team_id),
+                                     wait=False)
+
+        with futures.ThreadPoolExecutor(
+                max_workers=self._max_workers,
+                thread_name_prefix="LobbyBuilder") as pool:
+            responses = list(pool.map(add, bots))
+        for bot, res in zip(bots, responses):
+            if not res.ok:
+                raise LobbyError("Could not add %s: %d %s" % (
+                    bot, res.status_code, res.text))
+
+        expected = collections.Counter((bot.champ_id, bot.team_id) for bot in bots)
+        return self._lcu.wait_state(
+            LOBBY_URI,
+            lambda lobby: lobby is not None and not expected - _lobby_bots(lobby),
+            after=after)
+
+    def build(self, champ_id, bots, team_id=100):
+        """Create the lobby, add the bots, start the champion select and
+        pick our champion.
+
+        Args:
+            champ_id: Id of our champion.
+            bots: A list of `Bot`s.
+            team_id: Our team, which we switch to before the bots are added
+                if the client didn't join it.
+
+        Returns:
+            The lobby, once every bot joined.
+
+        Raises:
+            ValueError: If a team id is invalid or a team would be overfull.
+            LobbyError: If a step of the setup failed.
+        """
+        self._validate(bots, team_id)
+
+        res = self._lcu.create_custom(title=self._title, map_id=self._map_id)
+        if not res.status_code == 200:
+            raise LobbyError("Could not create custom game")
+
+        lobby = self._lcu.get(LOBBY_URI)
+        if lobby is None:
+            raise LobbyError("Could not create custom game")
+        if lobby["localMember"]["teamId"] != team_id:
+            res = self._lcu.switch_teams(team=str(team_id))
+            if not res.ok:
+                raise LobbyError("Could not switch to team %d" % team_id)
+
+        lobby = self.add_bots(bots)
+        logging.info("Lobby has %d bots." % sum(_lobby_bots(lobby).values()))
+
+        res = self._lcu.start_champ_select()
+        if not res.status_code == 200:
+            raise LobbyError("Could not start champion select")
+
+        res = self._lcu.pick_champion(champ_id=champ_id)
+        if not res.status_code == 204:
+            raise LobbyError("Could not pick champion")
+        return lobby
@@ -0,0 +1,88 @@
+# MIT License
+# 
+# Copyright (c) 2023 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Tests for building custom game lobbies, against `mock_lcu.MockLCU`."""
+
+from absl.testing import absltest
+from absl.testing import parameterized
+
+from tlol_rl.lib import lcu as lcu_lib
+from tlol_rl.lib import lobby
+from tlol_rl.lib import mock_lcu
+
+
+class LobbyBuilderTest(parameterized.TestCase):
+
+    def _builder(self, events):
+        if events and lcu_lib.websocket is None:
+            self.skipTest("The LCU event feed requires `websocket-client`.")
+        self.mock = mock_lcu.MockLCU(transition_delay=0.01).start()
+        self.addCleanup(self.mock.close)
+        client = self.mock.lcu(events=events, state_timeout=5)
+        self.addCleanup(client.close)
+        client.wait_ready(timeout=5)
+        return lobby.LobbyBuilder(client)
+
+    def _picked(self):
+        session = self.mock.session
+        action = session["actions"][0][session["localPlayerCellId"]]
+        return action["championId"] if action["completed"] else None
+
+    @parameterized.named_parameters(("events", True), ("polling", False))
+    def test_build(self, events):
+        builder = self._builder(events)
+        bots = [lobby.Bot(22, 100), lobby.Bot(1, 200), lobby.Bot(1, 200)]
+        result = builder.build(81, bots)
+        self.assertEqual(lobby._lobby_bots(result),
+                         {(22, 100): 1, (1, 200): 2})
+        self.assertEqual(self.mock.lobby["localMember"]["teamId"], 100)
+        self.assertEqual(self._picked(), 81)
+
+    @parameterized.named_parameters(("events", True), ("polling", False))
+    def test_build_without_bots(self, events):
+        builder = self._builder(events)
+        result = builder.build(81, [])
+        self.assertEqual(len(result["members"]), 1)
+        self.assertEqual(self._picked(), 81)
+
+    @parameterized.named_parameters(("events", True), ("polling", False))
+    def test_build_on_other_team(self, events):
+        builder = self._builder(events)
+        result = builder.build(81, [lobby.Bot(22, 100)], team_id=200)
+        self.assertEqual(result["localMember"]["teamId"], 200)
+        self.assertEqual(self.mock.session["localPlayerCellId"], 1)
+        self.assertEqual(self._picked(), 81)
+
+    def test_invalid_team(self):
+        builder = lobby.LobbyBuilder(lcu=None)
+        with self.assertRaises(ValueError):
+            builder.build(81, [], team_id=300)
+        with self.assertRaises(ValueError):
+            builder.build(81, [lobby.Bot(22, 0)])
+
+    def test_overfull_team(self):
+        builder = lobby.LobbyBuilder(lcu=None)
+        with self.assertRaises(ValueError):
+            builder.build(81, [lobby.Bot(22, 100)] * lobby.TEAM_SIZE)
+
+
+if __name__ == "__main__":
+    absltest.main()
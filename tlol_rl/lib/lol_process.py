@@ -57,6 +57,8 @@ class LoLProcess(object):
             host: IP Address for for Redis server to be hosted on.
             port: Port for Redis server to be hosted on.
             timeout_seconds: Timeout for the TLoL-RL server to start before we give up.
+            controller_cls: Optional `RemoteController` subclass to create,
+                e.g. `AsyncRemoteController`.
         """
 
         self.controller = None
@@ -69,16 +71,22 @@ class LoLProcess(object):
 
         agent_count = len(kwargs["players"])
 
+        self._proc = None
         try:
+            # The client takes the longest to load, so launch it first and
+            # start the controller's processes while it loads
+            args = [riot_client_exec_path, "--mode unattended"]
+            self._proc = self.launch(run_config, args, **kwargs)
+
             kwargs["tlol_rl_server_path"] = tlol_rl_server_path
+            controller_cls = kwargs.pop(
+                "controller_cls", remote_controller.RemoteController)
             self.controller = \
-                remote_controller.RemoteController(
+                controller_cls(
                     host,
                     port,
                     timeout_seconds,
                     kwargs=kwargs)
-            args = [riot_client_exec_path, "--mode unattended"]
-            self._proc = self.launch(run_config, args, **kwargs)
         except:
             self.close()
             raise
@@ -109,8 +117,15 @@ class LoLProcess(object):
         self.shutdown()
     
     def shutdown(self):
-        """(Optionally) Shutdown the game."""
-        pass
+        """(Optionally) Shutdown the game, i.e. the client we launched."""
+        if getattr(self, "_proc", None) and self._proc.poll() is None:
+            self._proc.terminate()
+            try:
+                self._proc.wait(5)
+            except subprocess.TimeoutExpired:
+                self._proc.kill()
+                self._proc.wait()
+        self._proc = None
     
     def check_exists(self, exec_path):
         if not os.path.isfile(exec_path):
@@ -0,0 +1,428 @@
+# MIT License
+# 
+# Copyright (c) 2023 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""A local mock of the League of Legends client's LCU API, to test and
+benchmark the custom game flow of `lcu.LCU` without a client."""
+
+import base64
+import hashlib
+from http import server
+import json
+import re
+import socket
+import struct
+import threading
+import time
+
+from absl import logging
+
+from tlol_rl.lib import lcu as lcu_lib
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+# Websocket frame opcodes
+WS_TEXT = 0x1
+WS_CLOSE = 0x8
+WS_PING = 0x9
+WS_PONG = 0xA
+
+
+def _ws_frame(opcode, payload):
+    """Encode an unmasked server to client websocket frame."""
+    header = bytes([0x80 | opcode])
+    if len(payload) < 126:
+        header += bytes([len(payload)])
+    elif len(payload) < 1 << 16:
+        header += bytes([126]) + struct.pack("!H", len(payload))
+    else:
+        header += bytes([127]) + struct.pack("!Q", len(payload))
+    return header + payload
+
+
+def _ws_read_frame(rfile):
+    """Read a (masked) client to server websocket frame.
+
+    Returns:
+        The opcode and payload of the frame, or None if the connection closed.
+    """
+    header = rfile.read(2)
+    if len(header) < 2:
+        return None
+    opcode = header[0] & 0x0F
+    masked = header[1] & 0x80
+    length = header[1] & 0x7F
+    if length == 126:
+        length, = struct.unpack("!H", rfile.read(2))
+    elif length == 127:
+        length, = struct.unpack("!Q", rfile.read(8))
+    mask = rfile.read(4) if masked else b"\0\0\0\0"
+    payload = rfile.read(length)
+    return opcode, bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+
+
+class _Handler(server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super(_Handler, self).setup()
+        self.server.mock.connect(self.connection)
+
+    def finish(self):
+        self.server.mock.disconnect(self.connection)
+        super(_Handler, self).finish()
+
+    def log_message(self, format, *args):
+        logging.debug("MockLCU: " + format % args)
+
+    def _authorized(self):
+        if self.headers.get("Authorization") == self.server.mock.authorization:
+            return True
+        self._reply(401, {"message": "Unauthorized"})
+        return False
+
+    def _reply(self, status, data=None):
+        body = b"" if data is None else json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return None
+        return json.loads(self.rfile.read(length))
+
+    def _handle(self, method):
+        mock = self.server.mock
+        mock.requests += 1
+        if mock.latency:
+            time.sleep(mock.latency)
+        if not self._authorized():
+            return
+        if method == "get" and self.headers.get("Upgrade", "").lower() == "websocket":
+            return self._websocket()
+        status, data = mock.handle(method, self.path, self._body())
+        self._reply(status, data)
+
+    def do_GET(self):
+        self._handle("get")
+
+    def do_POST(self):
+        self._handle("post")
+
+    def do_PATCH(self):
+        self._handle("patch")
+
+    def _websocket(self):
+        """Upgrade to a websocket, then push every event to it until the
+        client closes it."""
+        key = self.headers["Sec-WebSocket-Key"] + WEBSOCKET_GUID
+        accept = base64.b64encode(hashlib.sha1(key.encode("utf-8")).digest())
+        self.send_response(101)
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", accept.decode("utf-8"))
+        self.end_headers()
+
+        lock = threading.Lock()
+        def send(opcode, payload):
+            with lock:
+                self.wfile.write(_ws_frame(opcode, payload))
+
+        mock = self.server.mock
+        try:
+            while True:
+                frame = _ws_read_frame(self.rfile)
+                if frame is None or frame[0] == WS_CLOSE:
+                    break
+                opcode, payload = frame
+                if opcode == WS_PING:
+                    send(WS_PONG, payload)
+                elif opcode == WS_TEXT:
+                    msg = json.loads(payload)
+                    if msg[0] == lcu_lib.WAMP_SUBSCRIBE:
+                        mock.subscribe(send)
+        except (OSError, ValueError):
+            pass
+        finally:
+            mock.unsubscribe(send)
+            self.close_connection = True
+
+
+class MockLCU(object):
+    """A mock LCU API which serves the custom game flow of `lcu.LCU`, i.e.
+    creating a custom lobby, switching teams, adding bots, starting champion
+    select and picking a champion, along with the websocket event feed.
+
+    Each change is applied `transition_delay` seconds after the request
+    which caused it was answered, like the client does asynchronously, so
+    an LCU has to wait for it. Plain HTTP is served, so clients must use
+    `protocol="http"`, see `lcu`.
+
+    Example:
+        with MockLCU(transition_delay=0.05) as mock:
+            client = mock.lcu()
+            client.create_custom(title="TLoL-RL")
+
+    Args:
+        host: Address to serve on.
+        port: Port to serve on. A free port is picked if 0.
+        auth_token: The `remoting-auth-token` clients must authorize with.
+        latency: Seconds each request takes to answer.
+        transition_delay: Seconds until a change is applied.
+        first_action_id: Id of the first champion select action.
+    """
+
+    def __init__(self,
+                 host="127.0.0.1",
+                 port=0,
+                 auth_token="mock",
+                 latency=0.0,
+                 transition_delay=0.0,
+                 first_action_id=2):
+        self.auth_token = auth_token
+        self.authorization = "Basic " + base64.b64encode(
+            f"riot:{auth_token}".encode("utf-8")).decode("utf-8")
+        self.latency = latency
+        self.transition_delay = transition_delay
+        self.first_action_id = first_action_id
+
+        # Number of requests served, including websocket handshakes
+        self.requests = 0
+
+        self._lock = threading.RLock()
+        self._subscribers = []
+        self._connections = set()
+        self._timers = []
+        self.lobby = None
+        self.session = None
+
+        self._server = server.ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.mock = self
+        self._thread = None
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        logging.info("MockLCU serving on port %d." % self.port)
+        return self
+
+    def close(self):
+        for timer in self._timers:
+            timer.cancel()
+        self._server.shutdown()
+        self._server.server_close()
+
+        # Drop the kept alive connections too, like an exiting client
+        with self._lock:
+            connections, self._connections = self._connections, set()
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, unused_exception_type, unused_exc_value, unused_traceback):
+        self.close()
+
+    def lcu(self, **kwargs):
+        """Create an `lcu.LCU` connected to this mock."""
+        return lcu_lib.LCU(remoting_auth_token=self.auth_token,
+                           app_port=self.port,
+                           protocol="http",
+                           **kwargs)
+
+    def connect(self, connection):
+        with self._lock:
+            self._connections.add(connection)
+
+    def disconnect(self, connection):
+        with self._lock:
+            self._connections.discard(connection)
+
+    def subscribe(self, send):
+        with self._lock:
+            self._subscribers.append(send)
+
+    def unsubscribe(self, send):
+        with self._lock:
+            if send in self._subscribers:
+                self._subscribers.remove(send)
+
+    def _event(self, uri, data):
+        """Encode the event of a change of the resource `uri`."""
+        event = {
+            "data": data,
+            "eventType": "Delete" if data is None else "Update",
+            "uri": uri
+        }
+        return json.dumps(
+            [lcu_lib.WAMP_EVENT, "OnJsonApiEvent", event]).encode("utf-8")
+
+    def _publish(self, payload):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for send in subscribers:
+            try:
+                send(WS_TEXT, payload)
+            except OSError:
+                self.unsubscribe(send)
+
+    def _later(self, fn):
+        """Apply a change after `transition_delay`, then publish it."""
+        def apply():
+            with self._lock:
+                events = [self._event(uri, data) for uri, data in fn()]
+            for payload in events:
+                self._publish(payload)
+        if self.transition_delay:
+            timer = threading.Timer(self.transition_delay, apply)
+            timer.daemon = True
+            self._timers = [t for t in self._timers if t.is_alive()] + [timer]
+            timer.start()
+        else:
+            apply()
+
+    def handle(self, method, path, data):
+        """Serve a request of the LCU API.
+
+        Returns:
+            The status code and data of the response.
+        """
+        with self._lock:
+            if method == "get" and path == "/lol-gameflow/v1/gameflow-phase":
+                if self.session:
+                    return 200, "ChampSelect"
+                return 200, "Lobby" if self.lobby else "None"
+            elif method == "get" and path == "/lol-lobby/v2/lobby":
+                return (200, self.lobby) if self.lobby else (404, None)
+            elif method == "get" and path == "/lol-champ-select/v1/session":
+                return (200, self.session) if self.session else (404, None)
+            elif method == "post" and path == "/lol-lobby/v2/lobby":
+                lobby = self._new_lobby(data)
+                self._later(lambda: self._set_lobby(lobby))
+                return 200, lobby
+            elif method == "post" and path == "/lol-lobby/v1/lobby/custom/bots":
+                if not self.lobby:
+                    return 404, {"message": "No lobby"}
+                self._later(lambda: self._add_bot(data))
+                return 204, None
+            elif method == "post" and path == "/lol-lobby/v1/lobby/custom/switch-teams":
+                if not self.lobby:
+                    return 404, {"message": "No lobby"}
+                self._later(self._switch_teams)
+                return 204, None
+            elif method == "post" and path == "/lol-lobby/v1/lobby/custom/start-champ-select":
+                if not self.lobby:
+                    return 404, {"message": "No lobby"}
+                self._later(self._start_champ_select)
+                return 200, {"success": True}
+            elif method == "patch":
+                match = re.fullmatch(r"/lol-champ-select/v1/session/actions/(\d+)", path)
+                if match:
+                    action = self._action(int(match.group(1)))
+                    if action is None:
+                        return 404, {"message": "No such action"}
+                    self._later(lambda: self._update_action(action["id"], data))
+                    return 204, None
+            return 404, {"message": "Not found: %s %s" % (method.upper(), path)}
+
+    def _new_lobby(self, data):
+        config = data["customGameLobby"]["configuration"]
+        return {
+            "gameConfig": {
+                "gameMode": config["gameMode"],
+                "isCustom": data["isCustom"],
+                "mapId": config["mapId"],
+                "maxLobbySize": config["teamSize"] * 2
+            },
+            "localMember": {"isBot": False, "summonerId": 1, "teamId": 100},
+            "members": [{"isBot": False, "summonerId": 1, "teamId": 100}]
+        }
+
+    def _set_lobby(self, lobby):
+        self.lobby = lobby
+        self.session = None
+        return [("/lol-lobby/v2/lobby", lobby)]
+
+    def _add_bot(self, data):
+        self.lobby["members"].append({
+            "botChampionId": data["championId"],
+            "botDifficulty": data["botDifficulty"],
+            "isBot": True,
+            "teamId": int(data["teamId"])
+        })
+        return [("/lol-lobby/v2/lobby", self.lobby)]
+
+    def _switch_teams(self):
+        local = self.lobby["localMember"]
+        local["teamId"] = 300 - local["teamId"]
+        for member in self.lobby["members"]:
+            if member.get("summonerId") == local["summonerId"]:
+                member["teamId"] = local["teamId"]
+        return [("/lol-lobby/v2/lobby", self.lobby)]
+
+    def _start_champ_select(self):
+        # The cells of the first team come first
+        members = sorted(self.lobby["members"], key=lambda m: m["teamId"])
+        local = self.lobby["localMember"]
+        self.session = {
+            "localPlayerCellId": next(
+                cell_id for cell_id, member in enumerate(members)
+                if member.get("summonerId") == local["summonerId"]),
+            "actions": [[{
+                "actorCellId": cell_id,
+                "championId": member.get("botChampionId", 0),
+                "completed": member["isBot"],
+                "id": self.first_action_id + cell_id,
+                "isAllyAction": member["teamId"] == local["teamId"],
+                "type": "pick"
+            } for cell_id, member in enumerate(members)]]
+        }
+        return [("/lol-champ-select/v1/session", self.session)]
+
+    def _action(self, action_id):
+        if not self.session:
+            return None
+        for phase in self.session["actions"]:
+            for action in phase:
+                if action["id"] == action_id:
+                    return action
+        return None
+
+    def _update_action(self, action_id, data):
+        action = self._action(action_id)
+        if data.get("actorCellId") != action["actorCellId"]:
+            # The client ignores picks for another cell
+            return []
+        action["championId"] = data.get("championId", action["championId"])
+        action["completed"] = data.get("completed", action["completed"])
+        return [("/lol-champ-select/v1/session", self.session)]
@@ -0,0 +1,169 @@
+# MIT License
+# 
+# Copyright (c) 2023 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Launch and manage a private, in-memory only Redis server."""
+
+import atexit
+import socket
+import subprocess
+import tempfile
+
+from absl import logging
+import redis
+
+from tlol_rl.lib import startup
+
+
+class RedisServerError(Exception):
+    pass
+
+
+def free_port(host="127.0.0.1"):
+    """Find a TCP port on `host` which isn't in use."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind((host, 0))
+        return s.getsockname()[1]
+
+
+class RedisServer(object):
+    """A `redis-server` process owned by a single controller.
+
+    The server never persists anything (no RDB snapshots or append only
+    file), so it neither writes `dump.rdb` nor stalls while forking for a
+    snapshot. `start` only returns once the server answers a `PING`, and
+    `close` shuts it down, which also happens at interpreter exit if the
+    owner never closed it.
+
+    Args:
+        host: Address the server binds to.
+        port: TCP port of the server. A free port is picked if this is None.
+        unix_socket: Optional Unix domain socket path. If given, the server
+            only listens on this socket, which avoids the overhead of TCP
+            loopback for clients on the same host.
+        exec_path: Path to the `redis-server` binary.
+        startup_timeout: Seconds to wait for the server to become ready.
+    """
+
+    def __init__(self,
+                 host="127.0.0.1",
+                 port=None,
+                 unix_socket=None,
+                 exec_path="redis-server",
+                 startup_timeout=10):
+        self.host = host
+        self.port = port if port or unix_socket else free_port(host)
+        self.unix_socket = unix_socket
+        self.exec_path = exec_path
+        self.startup_timeout = startup_timeout
+        self._proc = None
+        self._dir = None
+
+    def args(self):
+        """Command line of the server."""
+        args = [
+            self.exec_path,
+            "--save", "",
+            "--appendonly", "no",
+            "--bind", str(self.host)
+        ]
+        if self.unix_socket:
+            args += ["--port", "0",
+                     "--unixsocket", self.unix_socket,
+                     "--unixsocketperm", "700"]
+        else:
+            args += ["--port", str(self.port)]
+        return args
+
+    def connection_kwargs(self):
+        """Keyword arguments of `redis.Redis` to reach this server."""
+        if self.unix_socket:
+            return {"unix_socket_path": self.unix_socket}
+        return {"host": self.host, "port": self.port}
+
+    def start(self):
+        """Start the server and wait until it's ready.
+
+        Raises:
+            RedisServerError: if the server exits or doesn't answer in time.
+        """
+        # Run from a scratch directory, so nothing can land next to the config
+        self._dir = tempfile.TemporaryDirectory(prefix="tlol_rl_redis_")
+        args = self.args()
+        logging.info("Redis Args: " + str(args))
+        try:
+            self._proc = subprocess.Popen(
+                args,
+                cwd=self._dir.name,
+                stdout=subprocess.DEVNULL)
+        except OSError as e:
+            self.close()
+            raise RedisServerError("Could not start Redis: %s" % e)
+        atexit.register(self.close)
+
+        try:
+            self._wait_ready()
+        except:
+            self.close()
+            raise
+        return self
+
+    def _wait_ready(self):
+        """Ping the server with exponential backoff until it answers."""
+        client = redis.Redis(socket_connect_timeout=1, **self.connection_kwargs())
+
+        def probe():
+            if self._proc.poll() is not None:
+                raise RedisServerError(
+                    "Redis exited with code %d" % self._proc.returncode)
+            try:
+                return client.ping()
+            except (redis.ConnectionError, redis.BusyLoadingError):
+                return False
+
+        try:
+            startup.wait_for(probe, self.startup_timeout, "Redis",
+                             initial_delay=0.005, max_delay=0.5)
+            logging.info("Redis is ready.")
+        except startup.StartupError as e:
+            raise RedisServerError(str(e))
+        finally:
+            client.close()
+
+    def close(self, timeout=5):
+        """Shut the server down, killing it if it doesn't exit in time."""
+        atexit.unregister(self.close)
+        if self._proc and self._proc.poll() is None:
+            self._proc.terminate()
+            try:
+                self._proc.wait(timeout)
+            except subprocess.TimeoutExpired:
+                self._proc.kill()
+                self._proc.wait()
+        self._proc = None
+        if self._dir:
+            self._dir.cleanup()
+            self._dir = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, unused_exception_type, unused_exc_value, unused_traceback):
+        self.close()
@@ -22,11 +22,17 @@
 """Controllers take actions and generate observations."""
 
 from absl import logging
+import collections
+import os
 import subprocess
 from subprocess import SubprocessError
+import time
 
-import redis
-import json
+from tlol_rl import transports
+from tlol_rl.lib import codec
+from tlol_rl.lib import redis_server
+from tlol_rl.transports import lib as transport_lib
+from tlol_rl.transports import redis_transport
 
 
 class ConnectError(Exception):
@@ -39,10 +45,49 @@ class RequestError(Exception):
         self.res = res
 
 
+class StepTimings(collections.namedtuple(
+        "StepTimings", ["encode", "round_trip", "decode", "total"])):
+    """Latency breakdown of a single `RemoteController.step`, in seconds.
+    Attributes:
+        encode: Time spent encoding the actions.
+        round_trip: Time spent in the transport round trip, which includes
+            waiting for the TLoL-RL server to publish the next observation.
+        decode: Time spent parsing the observation.
+        total: Wall time of the whole step.
+    """
+    __slots__ = ()
+
+
 class RemoteController(object):
     """Implements a python interface to interact with a League of Legends client.
 
-    Will use Redis for now, may change to gRPC interface in the future.
+    Messages are exchanged with the TLoL-RL server through a transport
+    (see `tlol_rl.transports`), which is Redis unless the `transport`
+    kwarg selects another one, e.g. `shm` for same-host runs or `tcp` for a
+    direct connection without a broker. Extra settings for the transport
+    are given by the `transport_kwargs` kwarg.
+
+    With a Redis transport, the `redis_prefix` and `redis_db` kwargs
+    namespace the keys of this instance, so many instances can share one
+    Redis server. Unless the `spawn_redis` kwarg is False, a private,
+    in-memory only `redis-server` is started for this instance (see
+    `redis_server.RedisServer`), listening on the `redis_socket` Unix domain
+    socket if that kwarg is given and on a free loopback port otherwise.
+    Otherwise an already running server at `host` and the `redis_port`
+    kwarg is used.
+
+    If the `keyframe_interval` kwarg is above 0, the actor only sends a
+    full observation every `keyframe_interval` observations and otherwise
+    the object table rows which changed since the last observation this
+    controller acknowledged with an action batch, so observations may be
+    dropped in between, e.g. by a `latest_only` transport. These are
+    reconstructed into one persistent set of tables, so the tables of an
+    observation are only valid until the next observation is received.
+
+    On a reset, the actor presses the `reset_keys` kwarg, a list of scan
+    codes of the practice tool hotkeys which restore the champion and the
+    target dummy as bound in the client, then waits `reset_ticks` ticks
+    before the first observation of the new episode.
 
     All of these are implemented as blocking calls, so wait for the response
     before returning.
@@ -51,18 +96,73 @@ class RemoteController(object):
     def __init__(self, host, port, timeout_seconds, kwargs=[]):
         self._kwargs = kwargs
 
-        # Initialise client connection to a Redis server
         timeout_seconds = timeout_seconds # or FLAGS.lol_timeout
-        host = host or "192.168.0.16"
+        host = host or "localhost"
         port = port or 6379
         self.host = host
         self.port = port
-        logging.info("Redis IP: " + str(host) + ":" + str(self._kwargs["redis_port"]))
-        self.pool = redis.ConnectionPool(host=host, port=self._kwargs["redis_port"], db=0)
-        self.r = redis.Redis(connection_pool=self.pool)
-        self.timeout = timeout_seconds        
+        self.timeout = timeout_seconds
+        self._redis_server = None
+        self._tlol_proc = None
+
+        transport_name = self._kwargs.get("transport") or "redis"
+        transport_cls = transports.get(transport_name)
+        transport_kwargs = self._kwargs.get("transport_kwargs") or {}
+        uses_redis = issubclass(transport_cls, redis_transport.RedisTransport)
+
+        # Initialise Redis server and wait until it's ready, unless another
+        # transport or a shared Redis server is used
+        redis_port = self._kwargs.get("redis_port") or port
+        redis_socket = self._kwargs.get("redis_socket")
+        if uses_redis and self._kwargs.get("spawn_redis", True):
+            # Our own server is only reachable from this host, on a free
+            # port rather than the one of a shared server
+            logging.info("Initialising Redis.")
+            self._redis_server = redis_server.RedisServer(
+                unix_socket=redis_socket).start()
+            host = self._redis_server.host
+            redis_port = self._redis_server.port
+
+        # Initialise client side of the transport
+        if uses_redis:
+            logging.info("Redis IP: " + str(host) + ":" + str(redis_port))
+            self._transport = transport_cls(**{
+                "host": host,
+                "port": redis_port,
+                "db": self._kwargs.get("redis_db") or 0,
+                "prefix": self._kwargs.get("redis_prefix") or "",
+                "unix_socket": redis_socket,
+                **transport_kwargs})
+        else:
+            self._transport = transport_cls(**transport_kwargs)
 
         self._last_obs = None
+        self.last_step_timings = None
+        self._step_start = None
+        self._step_encoded = None
+
+        # Reconstructs delta encoded observations, if enabled
+        self._keyframe_interval = int(self._kwargs.get("keyframe_interval") or 0)
+        self._decoder = codec.DeltaDecoder() if self._keyframe_interval > 0 else None
+
+        # Warm reset settings of the actor
+        self._reset_keys = [int(k) for k in self._kwargs.get("reset_keys") or []]
+        reset_ticks = self._kwargs.get("reset_ticks")
+        self._reset_ticks = 1 if reset_ticks is None else int(reset_ticks)
+
+        # Action batch step ids and send times which haven't been
+        # acknowledged by an observation yet
+        self._action_step = 0
+        self._action_sent = collections.deque(maxlen=1024)
+
+        # Step id of the last action batch which observations have to
+        # follow, i.e. one repeated over several ticks or a reset
+        self._wait_step = 0
+        self.last_action_latency = None
+
+        # Observations which the actor produced but we never received,
+        # e.g. because they were replaced in `latest_only` mode
+        self.dropped_observations = 0
 
         # Accept custom client port, if provided
         self._kwargs["client_port"] = \
@@ -70,32 +170,46 @@ class RemoteController(object):
                 if "client_port" in kwargs else "5119"
 
         try:
-            # Initialise Redis server
-            logging.info("Initialising Redis.")
-            arr = ["redis-server"]
-            """,
-                "redis.conf",
-                "--bind", str(host),
-                "--port", str(self._kwargs["redis_port"])]
-            """
-            logging.info("Redis Args: " + str(arr))
-            self._redis_proc = subprocess.Popen(arr)
-
-            # Initialise TLoL-RL Server
+            # Initialise TLoL-RL Server, which tells the actor how to reach
+            # the transport through its environment
             logging.info("Initialising TLoL-RL Server.")
             tlol_rl_server_path = kwargs["tlol_rl_server_path"]
             tlol_arr = [tlol_rl_server_path]
-            logging.info("TLoL-RL Server Args: " + str(arr))
+            logging.info("TLoL-RL Server Args: " + str(tlol_arr))
             self._tlol_proc = subprocess.Popen(
                 tlol_arr,
-                cwd=kwargs["tlol_rl_server_dir"])
+                cwd=kwargs["tlol_rl_server_dir"],
+                env={**os.environ, **self.actor_environ()})
         except SubprocessError as e:
-            logging.error("Could not open Redis. Error message: %s" % e)
+            logging.error("Could not open TLoL-RL Server. Error message: %s" % e)
+        except OSError:
+            # Don't leave our Redis server behind
+            self.close()
+            raise
+
+    def actor_environ(self):
+        """Environment variables which configure the actor, i.e. how to
+        reach the transport and the settings of this controller."""
+        environ = self._transport.actor_environ()
+        environ.update({
+            "TLOL_RL_KEYFRAME_INTERVAL": str(self._keyframe_interval),
+            "TLOL_RL_RESET_KEYS": ",".join(str(k) for k in self._reset_keys),
+            "TLOL_RL_RESET_TICKS": str(self._reset_ticks)
+        })
+        return environ
+
+    def _kill_procs(self):
+        if self._tlol_proc:
+            self._tlol_proc.kill()
+            self._tlol_proc = None
+        if self._redis_server:
+            self._redis_server.close()
+            self._redis_server = None
     
     def close(self):
         """Kill the related processes when the controller is done."""
-        self._redis_proc.kill()
-        self._tlol_proc.kill()
+        self._transport.close()
+        self._kill_procs()
     
     def connect(self):
         """Waits until this TLoL-RL instance can connect to a TLoL-RL server
@@ -128,32 +242,40 @@ class RemoteController(object):
                 cleared_all = True
         """
         
-        # Reset pipes after connecting
-        self.r.delete("observation") # Reset action pipe
-        self.r.delete("action") # Reset action pipe
+        # Reset pipes after connecting, unless the transport lets us resume
+        if not self._transport.resumable:
+            self._transport.clear(
+                transport_lib.OBSERVATION,
+                transport_lib.ACTION)
 
     def send_raw_action(self, action):
-        """Send an action using the raw redis format."""
+        """Send an action using the raw format, i.e. an `action_type` name
+        and an `action_data` dict with optional `spell_slot`, `x` and `y`."""
         print("action data:", action)
 
-        action_type = action["action_type"]
-        action_data = action["action_data"]
+        opcode = codec.OPCODE_NAMES[action["action_type"]]
+        action_data = action["action_data"] or {}
 
-        self.r.lpush("action", action_type)
-        self.r.lpush("action", action_data)
+        self._transport.send_actions(self._encode_batch([(
+            opcode,
+            int(action_data.get("spell_slot", 0)),
+            float(action_data.get("x", 0.0)),
+            float(action_data.get("y", 0.0)))]))
         
     def quit(self):
-        """Shut down the redis process."""
-        self.r = None
-        self._redis_proc.kill()
-        self._tlol_proc.kill()
+        """Shut down the redis and TLoL-RL server processes."""
+        self._transport.close()
+        self._kill_procs()
 
     def players_reset(self):
-        """Reset players for a new episode."""
+        """Reset players for a new episode. The actor warm resets the game in
+        place, and the first observation which follows the reset is the
+        first one `observe` returns."""
         logging.info("Resetting players for new episode.")
 
-        self.r.lpush("action", "reset")
-        self.r.lpush("action", "")
+        self._transport.send_actions(
+            self._encode_batch([(codec.Opcode.RESET, 0, 0.0, 0.0)]))
+        self._wait_step = self._action_step
 
     # """Implement player actions and observations here..."""
 
@@ -176,17 +298,39 @@ class RemoteController(object):
         # Start observing if we haven't already
         if self._last_obs == None:
             logging.info("controller.observe->start_observing")
-            self.r.delete("observation") # Reset observation pipe
-            self.r.delete("command")
-            self.r.lpush("command", "start_observing") # Start observing
+            if not self._transport.resumable:
+                self._transport.clear(
+                    transport_lib.OBSERVATION, # Reset observation pipe
+                    transport_lib.COMMAND)
+            if self._decoder:
+                self._decoder.reset() # The actor starts with a keyframe
+            self._transport.send_command("start_observing") # Start observing
         
         logging.info("controller.observe->blocking for next observation")
-        json_txt = self.r.brpop("observation", self.timeout)
-        if json_txt == None:
+        obs = self._parse_observation(self._transport.recv_observation(self.timeout))
+        while self._is_stale(obs):
+            obs = self._parse_observation(self._transport.recv_observation(self.timeout))
+        return obs
+
+    def _parse_observation(self, payload):
+        """Decode an encoded observation received from the transport."""
+        if payload == None:
             print("Error: Observation timed out")
             return None
         else:
-            obs = json.loads(json_txt[1].decode("utf-8"))
+            obs = self._decode_observation(payload)
+            if obs == None:
+                logging.warning("controller.observe->could not decode the "
+                                "observation, no keyframe arrived to resume from")
+                return None
+            self._ack_actions(obs["action_step"])
+
+            if self._last_obs != None:
+                dropped = obs["step"] - self._last_obs["step"] - 1
+                if dropped > 0:
+                    self.dropped_observations += dropped
+                    logging.info("controller.observe->dropped %d observations (%d total)" %
+                                 (dropped, self.dropped_observations))
             
             # Print first observation for testing...
             if self._last_obs == None: print("FIRST OBSERVATION:", obs)
@@ -194,24 +338,157 @@ class RemoteController(object):
             
             self._last_obs = obs
             return obs
+
+    def _decode_observation(self, payload):
+        """Decode an observation, reconstructing delta encoded ones. If a
+        delta doesn't apply to an observation we hold, e.g. because we
+        were reset, ask the actor for a keyframe and skip ahead to it."""
+        if not self._decoder:
+            return codec.decode_observation(payload)
+
+        keyframe_requested = False
+        while True:
+            try:
+                return self._decoder.decode(payload)
+            except codec.MissingBaseError as e:
+                logging.info("controller.observe->%s, waiting for keyframe" % e)
+                if not keyframe_requested:
+                    self._transport.send_command("keyframe")
+                    keyframe_requested = True
+                payload = self._transport.recv_observation(self.timeout)
+                if payload == None:
+                    return None
+
+    def _ack_actions(self, action_step):
+        """Measure the latency from sending action batch `action_step` until
+        the first observation produced after the actor applied it."""
+        now = time.perf_counter()
+        while self._action_sent and self._action_sent[0][0] <= action_step:
+            step, sent_time = self._action_sent.popleft()
+            if step == action_step:
+                self.last_action_latency = now - sent_time
+                logging.info("controller.observe->action latency: %f" %
+                             self.last_action_latency)
+
+    def step(self, req_action):
+        """Send an action request and wait for the next observation.
+
+        All of the actions are sent as one batch together with the blocking
+        observation fetch, so with Redis a step costs a single pipelined
+        round trip no matter how many actions the request holds. The latency
+        breakdown of the step is stored in `last_step_timings`."""
+
+        # The first observation also has to start the observer
+        if self._last_obs == None:
+            self.actions(req_action)
+            return self.observe()
+
+        start_time = time.perf_counter()
+
+        payload = self._encode_actions(req_action)
+        encode_time = time.perf_counter()
+
+        payload = self._transport.step(payload, self.timeout)
+        round_trip_time = time.perf_counter()
+
+        obs = self._parse_observation(payload)
+        while self._is_stale(obs):
+            obs = self._parse_observation(self._transport.recv_observation(self.timeout))
+        decode_time = time.perf_counter()
+
+        self.last_step_timings = StepTimings(
+            encode=encode_time - start_time,
+            round_trip=round_trip_time - encode_time,
+            decode=decode_time - round_trip_time,
+            total=decode_time - start_time)
+        logging.info("controller.step->timings: " + str(self.last_step_timings))
+
+        return obs
     
+    def step_async(self, req_action):
+        """Send an action request without waiting for the next observation,
+        which `step_wait` collects later."""
+        self._step_start = time.perf_counter()
+        if self._last_obs == None:
+            self.actions(req_action)
+            return
+        payload = self._encode_actions(req_action)
+        self._step_encoded = time.perf_counter()
+        self._transport.send_actions(payload)
+
+    def step_wait(self):
+        """Wait for the observation following the last `step_async`."""
+        if self._last_obs == None:
+            return self.observe()
+
+        round_trip_start = time.perf_counter()
+        payload = self._transport.recv_observation(self.timeout)
+        round_trip_time = time.perf_counter()
+
+        obs = self._parse_observation(payload)
+        while self._is_stale(obs):
+            obs = self._parse_observation(self._transport.recv_observation(self.timeout))
+        decode_time = time.perf_counter()
+
+        # The round trip includes the time spent between the two calls
+        encode_time = self._step_encoded
+        self.last_step_timings = StepTimings(
+            encode=encode_time - self._step_start,
+            round_trip=round_trip_time - encode_time,
+            decode=decode_time - round_trip_time,
+            total=decode_time - self._step_start)
+        logging.info("controller.step_wait->timings: %s, waited %f" % (
+            self.last_step_timings, round_trip_time - round_trip_start))
+
+        return obs
+
     def actions(self, req_action):
         """Send an action request, which may include multiple actions."""
-        for action in req_action.actions:
-            action = action.props
-            if action["type"] == "no_op":
-                self.player_noop()
-            elif action["type"] == "move":
-                x = action["move_range"].x - 4
-                y = action["move_range"].y - 4
-                print("SENDING MOVE COMMAND:", x, y)
-                self.player_move(x, y)
-            elif action["type"] == "spell":
-                spell_slot = action["spell"]
-                x = action["position"].x
-                y = action["position"].y
-                print("SENDING SPELL COMMAND:", spell_slot, x, y)
-                self.player_spell(spell_slot, x, y)
+        self._transport.send_actions(self._encode_actions(req_action))
+
+    def _encode_actions(self, req_action):
+        """Encode all of the actions of an action request as one batch."""
+        return self._encode_batch(
+            [self._encode_action(action) for action in req_action.actions],
+            getattr(req_action, "repeat", 1))
+
+    def _encode_batch(self, raw_actions, repeat=1):
+        """Encode (opcode, spell_slot, x, y) actions as the next action batch
+        and remember when it was sent to measure its latency."""
+        self._action_step += 1
+        self._action_sent.append((self._action_step, time.perf_counter()))
+        if repeat > 1:
+            self._wait_step = self._action_step
+        last_time = self._last_obs["time"] if self._last_obs != None else 0.0
+        # Let the actor base its deltas on the last observation we decoded
+        ack = self._decoder.acknowledge() if self._decoder else 0
+        return codec.encode_actions(
+            raw_actions, self._action_step, last_time, repeat, ack)
+
+    def _is_stale(self, obs):
+        """Whether `obs` was sent before the actor applied the last repeated
+        action batch or reset. The actor holds back the observations of a
+        repeated batch until its last tick, and those of a reset until the
+        players have settled, so we skip to that one."""
+        return obs != None and obs["action_step"] < self._wait_step
+
+    def _encode_action(self, action):
+        """Convert a `common.Action` into a codec (opcode, spell_slot, x, y)."""
+        action = action.props
+        if action["type"] == "no_op":
+            return codec.Opcode.NO_OP, 0, 0.0, 0.0
+        elif action["type"] == "move":
+            x = action["move_range"].x - 4
+            y = action["move_range"].y - 4
+            data = self._move_data(x, y)
+            return codec.Opcode.MOVE, 0, data["x"], data["y"]
+        elif action["type"] == "spell":
+            spell_slot = action["spell"]
+            x = action["position"].x
+            y = action["position"].y
+            data = self._spell_data(spell_slot, x, y)
+            return codec.Opcode.SPELL, data["spell_slot"], data["x"], data["y"]
+        raise ValueError("Unknown action type: %s" % action["type"])
         
     def act(self, action):
         """Send a single action. This is a shortcut for `actions`."""
@@ -219,26 +496,31 @@ class RemoteController(object):
             return self.actions(action)
     
     def player_noop(self, n=1):
-        for _ in range(n):
-            self.r.lpush("action", "noop")
-            self.r.lpush("action", "")
+        self._transport.send_actions(self._encode_batch(
+            [(codec.Opcode.NO_OP, 0, 0.0, 0.0)] * n))
         return {"type": "noop", "data": ""}
     
     def player_move(self, x, y):
-        action = {
-            "x": float(x * 100.0),
-            "y": float(y * 100.0)
-        }
-        self.r.lpush("action", "move")
-        self.r.lpush("action", json.dumps(action))
+        action = self._move_data(x, y)
+        self._transport.send_actions(self._encode_batch(
+            [(codec.Opcode.MOVE, 0, action["x"], action["y"])]))
         return {"type": "move", "data": action}
     
     def player_spell(self, spell_slot, x, y):
-        action = {
+        action = self._spell_data(spell_slot, x, y)
+        self._transport.send_actions(self._encode_batch(
+            [(codec.Opcode.SPELL, action["spell_slot"], action["x"], action["y"])]))
+        return {"type": "spell", "data": action}
+
+    def _move_data(self, x, y):
+        return {
+            "x": float(x * 100.0),
+            "y": float(y * 100.0)
+        }
+
+    def _spell_data(self, spell_slot, x, y):
+        return {
             "spell_slot": int(spell_slot),
             "x": float(x * 1.0),
             "y": float(y * 1.0)
-        }
-        self.r.lpush("action", "spell")
-        self.r.lpush("action", json.dumps(action))
-        return {"type": "spell", "data": action}
\ No newline at end of file
+        }
\ No newline at end of file
@@ -0,0 +1,74 @@
+# MIT License
+# 
+# Copyright (c) 2023 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Tests for the remote controller's setup of its Redis server."""
+
+from unittest import mock
+
+from absl.testing import absltest
+
+from tlol_rl.lib import redis_server
+from tlol_rl.lib import remote_controller
+
+
+class FakeRedisServer(object):
+
+    def __init__(self, host="127.0.0.1", port=None, unix_socket=None):
+        self.host = host
+        self.port = port if port or unix_socket else redis_server.free_port(host)
+        self.unix_socket = unix_socket
+
+    def start(self):
+        return self
+
+    def close(self):
+        pass
+
+
+class RemoteControllerTest(absltest.TestCase):
+
+    def _controller(self, **kwargs):
+        kwargs.update(tlol_rl_server_path="tlol_rl_server",
+                      tlol_rl_server_dir=".")
+        with mock.patch.object(redis_server, "RedisServer", FakeRedisServer), \
+                mock.patch.object(remote_controller.subprocess, "Popen") as popen:
+            controller = remote_controller.RemoteController(
+                "192.168.0.16", None, 1, kwargs=kwargs)
+        self.addCleanup(controller._transport.close)
+        return controller, popen.call_args[1]["env"]
+
+    def test_spawned_redis_is_private(self):
+        controller, env = self._controller(redis_port=6379)
+        server = controller._redis_server
+        self.assertEqual(server.host, "127.0.0.1")
+        self.assertNotEqual(server.port, 6379)
+        self.assertEqual(env["TLOL_RL_REDIS_HOST"], "127.0.0.1")
+        self.assertEqual(env["TLOL_RL_REDIS_PORT"], str(server.port))
+
+    def test_shared_redis(self):
+        controller, env = self._controller(spawn_redis=False, redis_port=6380)
+        self.assertIsNone(controller._redis_server)
+        self.assertEqual(env["TLOL_RL_REDIS_HOST"], "192.168.0.16")
+        self.assertEqual(env["TLOL_RL_REDIS_PORT"], "6380")
+
+
+if __name__ == "__main__":
+    absltest.main()
@@ -0,0 +1,203 @@
+# MIT License
+# 
+# Copyright (c) 2023 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Start the components of a game concurrently, waiting for each one with
+readiness probes rather than fixed sleeps, and record a timeline of how
+long every phase of the startup took."""
+
+import collections
+from concurrent import futures
+import contextlib
+import threading
+import time
+
+from absl import logging
+
+
+class StartupError(Exception):
+    pass
+
+
+def wait_for(probe, timeout, description="Component", initial_delay=0.01, max_delay=1.0):
+    """Call `probe` with exponential backoff until it returns a true value.
+
+    Args:
+        probe: Callable which checks whether a component is ready. It may
+            raise to give up early, e.g. if the component's process exited.
+        timeout: Seconds to wait for the component.
+        description: Name of the component for the error message.
+        initial_delay: Seconds to wait after the first failed probe, which
+            doubles after every failure.
+        max_delay: Longest wait between two probes.
+
+    Returns:
+        The first true value returned by `probe`.
+
+    Raises:
+        StartupError: If the component wasn't ready within `timeout`.
+    """
+    deadline = time.monotonic() + timeout
+    delay = initial_delay
+    while True:
+        result = probe()
+        if result:
+            return result
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise StartupError("%s wasn't ready after %s seconds" % (description, timeout))
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, max_delay)
+
+
+class Phase(collections.namedtuple("Phase", ["name", "start", "end"])):
+    """A phase of the startup, with its start and end in seconds since the
+    startup began."""
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+
+class Timeline(object):
+    """Records when each phase of a startup started and ended."""
+
+    def __init__(self):
+        self._start = time.monotonic()
+        self._phases = []
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Time the body of the `with` statement as the phase `name`."""
+        start = time.monotonic() - self._start
+        try:
+            yield
+        finally:
+            end = time.monotonic() - self._start
+            with self._lock:
+                self._phases.append(Phase(name, start, end))
+
+    @property
+    def phases(self):
+        """The finished phases, in the order they started."""
+        with self._lock:
+            return sorted(self._phases, key=lambda p: p.start)
+
+    @property
+    def total(self):
+        """Seconds from the start of the first phase to the end of the last."""
+        phases = self.phases
+        if not phases:
+            return 0.0
+        return max(p.end for p in phases) - min(p.start for p in phases)
+
+    def __str__(self):
+        lines = ["%-12s %7.3fs -> %7.3fs (%.3fs)" % (p.name, p.start, p.end, p.duration)
+                 for p in self.phases]
+        lines.append("%-12s %.3fs" % ("total", self.total))
+        return "\n".join(lines)
+
+
+class Startup(object):
+    """Runs the phases of a startup on a thread pool. Each phase starts as
+    soon as the phases it comes after have finished, so independent
+    components start up concurrently.
+
+    Example:
+        startup = Startup()
+        startup.add("redis", start_redis)
+        startup.add("client", launch_client)
+        startup.add("lobby", create_lobby, after=("client",))
+        results = startup.run()
+
+    Args:
+        max_workers: Number of phases run at once. Defaults to all of them.
+    """
+
+    def __init__(self, max_workers=None):
+        self._max_workers = max_workers
+        self._phases = collections.OrderedDict()
+        self.timeline = Timeline()
+
+        # Result of each phase which finished, also kept if another failed
+        # so the caller can clean up after it
+        self.results = {}
+
+    def add(self, name, fn, after=()):
+        """Add a phase.
+
+        Args:
+            name: Unique name of the phase.
+            fn: Callable which runs the phase, and whose result is kept.
+            after: Names of the phases which have to finish first. They must
+                have been added already.
+        """
+        if name in self._phases:
+            raise ValueError("Duplicate startup phase: %s" % name)
+        for dep in after:
+            if dep not in self._phases:
+                raise ValueError("Unknown startup phase: %s" % dep)
+        self._phases[name] = (fn, tuple(after))
+
+    def _run_phase(self, name, fn):
+        with self.timeline.phase(name):
+            return fn()
+
+    def run(self):
+        """Run every phase, and wait for them to finish.
+
+        Returns:
+            A dict of the result of each phase, by name.
+
+        Raises:
+            The first error raised by a phase, once the phases which were
+            already running have finished. The phases after it don't run.
+        """
+        waiting = list(self._phases)
+        running = {}
+        error = None
+        with futures.ThreadPoolExecutor(
+                max_workers=self._max_workers or len(self._phases) or 1,
+                thread_name_prefix="Startup") as pool:
+            while True:
+                if error is None:
+                    for name in list(waiting):
+                        fn, after = self._phases[name]
+                        if all(dep in self.results for dep in after):
+                            waiting.remove(name)
+                            running[pool.submit(self._run_phase, name, fn)] = name
+                if not running:
+                    break
+
+                done, _ = futures.wait(running, return_when=futures.FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        self.results[name] = future.result()
+                    except Exception as e:
+                        logging.error("Startup phase `%s` failed: %s" % (name, e))
+                        if error is None:
+                            error = e
+
+        logging.info("Startup timeline:\n%s" % self.timeline)
+        if error is not None:
+            raise error
+        return dict(self.results)
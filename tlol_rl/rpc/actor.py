@@ -21,14 +21,20 @@
 # SOFTWARE.
 """TLoL-RL RPC Server"""
 
+import collections
 import logging
-import redis
-import json
+import os
+import queue
 import sys
+import threading
 import time
 
 from lview import *
 
+from tlol_rl import transports
+from tlol_rl.lib import codec
+from tlol_rl.lib.codec import Opcode
+
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 formatter = logging.Formatter('%(asctime)s | %(levelname)s | %(message)s')
@@ -54,17 +60,114 @@ def lview_load_cfg(cfg):           pass
 def lview_save_cfg(cfg):           pass
 def lview_draw_settings(game, ui): pass
 
+class ActorIO(object):
+    """Runs all transport I/O on a background thread, so a slow transport
+    never stalls the game's frame callback.
+
+    The frame callback only enqueues encoded observations and takes
+    whatever commands and action batches the I/O thread has already
+    fetched, neither of which ever blocks. Neither does the I/O thread,
+    which polls the transport for commands and actions every
+    `poll_interval` seconds and whenever it sent an observation.
+
+    Args:
+        transport: The actor side of the transport.
+        max_pending: Most observations waiting to be sent.
+        poll_interval: Seconds between polls of the transport while no
+            observation is sent. Actions are only applied on the next tick
+            of the frame callback, so a few polls per tick suffice.
+    """
+
+    def __init__(self, transport, max_pending=64, poll_interval=0.03):
+        self._transport = transport
+        self._poll_interval = poll_interval
+
+        # Only the newest observation is worth sending in latest-only mode
+        if transport.latest_only:
+            max_pending = 1
+        self._observations = queue.Queue(maxsize=max_pending)
+
+        # Unbounded, so the I/O thread never waits for the frame callback.
+        # Every action batch has to be applied, so none can be dropped
+        self._actions = queue.Queue()
+        self._commands = queue.Queue()
+
+        # Observations dropped because the I/O thread fell behind
+        self.dropped = 0
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def send_observation(self, payload):
+        """Queue an observation, replacing the oldest queued one if full."""
+        while True:
+            try:
+                self._observations.put_nowait(payload)
+                return
+            except queue.Full:
+                try:
+                    self._observations.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def recv_command(self):
+        try:
+            return self._commands.get_nowait()
+        except queue.Empty:
+            return None
+
+    def recv_actions(self):
+        payloads = []
+        try:
+            while True:
+                payloads.append(self._actions.get_nowait())
+        except queue.Empty:
+            return payloads
+
+    def _run(self):
+        while True:
+            try:
+                try:
+                    payload = self._observations.get(timeout=self._poll_interval)
+                    self._transport.send_observation(payload)
+                except queue.Empty:
+                    pass
+
+                command = self._transport.recv_command()
+                if command != None:
+                    self._commands.put(command)
+
+                for payload in self._transport.recv_actions():
+                    self._actions.put_nowait(payload)
+            except Exception:
+                logger.exception("Actor I/O failed")
+                time.sleep(self._poll_interval)
+
 # Limit observations per second
 obs_rate = 8
 limit_rate = 1000.0 / obs_rate
 counter = -1
 
-# Controller state variables and Redis connection to
-# TLol-RL instance Redis server
+# Controller state variables and the transport to the TLoL-RL
+# instance, as configured by the controller through our environment
 step = 0
-r = redis.Redis(host="localhost", port=6379, db=0)
+action_step = 0
+tables = codec.new_tables()
+transport = transports.from_environ()
+actor_io = ActorIO(transport, poll_interval=limit_rate / 1000.0 / 4)
 being_observed = False
 
+# Actions of a batch which repeats over several ticks, and the number of
+# ticks left to apply them for
+held_actions = []
+repeat_left = 0
+
+# Send only the changed rows of the object tables between keyframes, if
+# the controller enabled delta encoded observations
+keyframe_interval = int(os.environ.get("TLOL_RL_KEYFRAME_INTERVAL", "0"))
+encoder = codec.DeltaEncoder(keyframe_interval) if keyframe_interval > 0 else None
+
 # HKey Scan Codes
 # https://www.millisecond.com/support/docs/current/html/language/scancodes.htm
 KEY_CODES = {
@@ -77,17 +180,71 @@ KEY_CODES = {
     "`": 41 # Teleport Key
 }
 
-def find_me(game, champ="ezreal"):
-    for obj in game.champs:
-        if obj.name == champ:
-            return obj
-    return None
-
-def find_dummy(game):
-	for obj in game.champs:
-		if obj.name == "practicetool_targetdummy":
-			return obj
-	return None
+# Scan codes of the practice tool hotkeys which restore the champion and
+# target dummy on a reset (e.g. refill health and mana, reset cooldowns),
+# as bound in the client, and the number of ticks to let a reset settle
+# before the first observation of the new episode. Set by the controller
+# from its `reset_keys` and `reset_ticks`
+RESET_KEYS = [int(k) for k in os.environ.get("TLOL_RL_RESET_KEYS", "").split(",") if k]
+reset_ticks = int(os.environ.get("TLOL_RL_RESET_TICKS", "1"))
+
+# Where our champion starts each episode, i.e. where it was at the first
+# reset unless the reset action gives a position
+episode_start = None
+
+class EntityIndex(object):
+    """Index of the game objects of a single frame.
+
+    Built once per `lview_update` with a single pass over each object list,
+    then shared by observation building and action execution instead of
+    every lookup scanning the object lists again.
+
+    Attributes:
+        by_type: Object list per object type (e.g. `champs`).
+        by_name: First object with each name.
+        by_team: List of objects per team.
+        by_net_id: Object per network id.
+    """
+
+    def __init__(self, game, object_types=codec.OBJECT_TYPES):
+        self.by_type = {}
+        self.by_name = {}
+        self.by_team = collections.defaultdict(list)
+        self.by_net_id = {}
+        for object_type in object_types:
+            objs = getattr(game, object_type)
+            self.by_type[object_type] = objs
+            for obj in objs:
+                if obj.name not in self.by_name:
+                    self.by_name[obj.name] = obj
+                self.by_team[obj.team].append(obj)
+                self.by_net_id[obj.net_id] = obj
+
+def find_me(index, champ="ezreal"):
+    return index.by_name.get(champ)
+
+def find_dummy(index):
+    return index.by_name.get("practicetool_targetdummy")
+
+def observe_objects(table, objs):
+    """Fill the preallocated columns of `table` with `objs`, one column at
+    a time."""
+    objs = objs[:table.capacity]
+    count = len(objs)
+    columns = table.columns
+    columns["net_id"][:count] = [obj.net_id for obj in objs]
+    columns["team"][:count] = [obj.team for obj in objs]
+    columns["pos_x"][:count] = [obj.pos.x for obj in objs]
+    columns["pos_y"][:count] = [obj.pos.z for obj in objs]
+
+    # Not every object type has health, e.g. missiles
+    columns["health"][:count] = [getattr(obj, "health", 0.0) for obj in objs]
+    columns["max_health"][:count] = [getattr(obj, "max_health", 0.0) for obj in objs]
+
+    # Zero the rows left over from the previous frame
+    for column in columns.values():
+        column[count:table.count] = 0
+    table.count = count
 
 def observe_champ(champ):
     champ = {
@@ -98,11 +255,15 @@ def observe_champ(champ):
     }
     return champ
 
-def observe(game):
-    self = find_me(game)
+def observe(game, index):
+    global step, action_step, tables
+
+    self = find_me(index)
 
     obs = {
         "time": game.time,
+        "step": step,
+        "action_step": action_step,
         "self": observe_champ(self),
         "available_actions": {
             "can_no_op":   True,
@@ -116,59 +277,82 @@ def observe(game):
             "can_spell_5": True
         }
     }
-    dummy = find_dummy(game)
+    dummy = find_dummy(index)
     if dummy:
         obs["enemy_unit"] = observe_champ(dummy)
+
+    for object_type, table in tables.items():
+        observe_objects(table, index.by_type[object_type])
+    obs["tables"] = tables
     return obs
 
-def act(action_type, action_data, game, ui):
+def act(action, game, ui, index):
     global KEY_CODES
 
-    self = find_me(game)
+    self = find_me(index)
 
-    action_type = action_type[1].decode("utf-8")
-    action_data = action_data[1].decode("utf-8")
-    if action_data == "":
-        action_data = {}
-    else:
-        action_data = json.loads(action_data)
+    opcode, spell_slot, x, y = action
 
-    logging.info("ACT: " + str(action_type) + ", " + str(action_data))
-    if action_type == "noop":
+    logging.info("ACT: " + str(opcode) + ", " + str(action))
+    if opcode == Opcode.NO_OP:
         pass
-    elif action_type == "move":
+    elif opcode == Opcode.MOVE:
         # Position relative to player
         new_pos    = self.pos.clone()
-        new_pos.x += action_data["x"]
-        new_pos.z += action_data["y"]
+        new_pos.x += x
+        new_pos.z += y
 
         # Left click
         game.click_at(False, game.world_to_screen(new_pos))
 
         logging.info("CONTROLLER CLICKING: " + str(new_pos.x) + "," + str(new_pos.y))
-    elif action_type == "spell":        
-        logging.info("Attemping spell: code->" + str(action_data["spell_slot"]) + " data:" + str(action_data))
+    elif opcode == Opcode.SPELL:
+        logging.info("Attemping spell: code->" + str(spell_slot) + " data:" + str(action))
 
-        spell_key_idx = list(KEY_CODES.keys())[action_data["spell_slot"]]
+        spell_key_idx = list(KEY_CODES.keys())[spell_slot]
         spell_key     = KEY_CODES[spell_key_idx]
-        x = action_data["x"]
-        y = action_data["y"]
         game.move_cursor(game.world_to_screen(Vec3(x, 0, y)))
         game.press_key(spell_key)
     
-    elif action_type == "teleport":
-        x = action_data["x"]
-        y = action_data["y"]
-        
+    elif opcode == Opcode.TELEPORT:
         teleport_key = KEY_CODES["`"]
         game.press_key(teleport_key)
         game.click_at(True, game.world_to_minimap(Vec3(x, 0, y)))
 
-    elif action_type == "reset":
-        pass
+    elif opcode == Opcode.RESET:
+        reset(game, ui, index, x, y)
+
+def reset(game, ui, index, x=0.0, y=0.0):
+    """Warm reset the game for a new episode, without relaunching it.
+
+    Teleports our champion back to the episode start, presses the
+    practice tool keys which restore the champion and dummy, and holds
+    back observations for `reset_ticks` ticks so the next one sent is the
+    first of the new episode."""
+    global episode_start, held_actions, repeat_left
+
+    self = find_me(index)
+
+    if x or y:
+        episode_start = (x, y)
+    elif episode_start == None:
+        episode_start = (self.pos.x, self.pos.z)
+    logging.info("RESET: episode start %s" % str(episode_start))
+
+    start_x, start_y = episode_start
+    if abs(self.pos.x - start_x) > 1.0 or abs(self.pos.z - start_y) > 1.0:
+        act((Opcode.TELEPORT, 0, start_x, start_y), game, ui, index)
+
+    for key in RESET_KEYS:
+        game.press_key(key)
+
+    # Drop any held action batch of the previous episode
+    held_actions = []
+    repeat_left = reset_ticks
 
 def lview_update(game, ui):
-    global r, being_observed, logger, step, limit_rate, counter
+    global actor_io, transport, encoder, being_observed, logger, step, action_step, limit_rate, counter
+    global held_actions, repeat_left
 
     if game.time < 30:
         return 
@@ -184,44 +368,72 @@ def lview_update(game, ui):
     logger.info("GAME TIME: %f" % game.time)
     logger.info("CURRENT COUNTER: %f" % cur_counter)
 
+    # Repeat the last action batch (or let a reset settle) without
+    # observing, until its last tick
+    if being_observed and repeat_left > 0:
+        logger.info("REPEATING ACT(S): %d left" % repeat_left)
+        index = EntityIndex(game)
+        for action in held_actions:
+            act(action, game, ui, index)
+        repeat_left -= 1
+        counter = cur_counter
+        return
+
     step += 1
 
     logger.info("CURRENT STEP: %d" % step)
 
-    json_txt = r.rpop("command")
-    if json_txt != None:
+    current_command = actor_io.recv_command()
+    if current_command != None:
         # Get current command
-        logger.info("REDIS GET CMD: " + str(json_txt.decode("utf-8")))
-        current_command = str(json_txt.decode("utf-8"))
+        logger.info("TRANSPORT GET CMD: " + current_command)
 
         # Initialise obs / act
         if current_command == "start_observing":
             being_observed = True
+            if encoder:
+                encoder.request_keyframe()
+
+        # The controller can't apply our deltas anymore
+        elif current_command == "keyframe":
+            if encoder:
+                encoder.request_keyframe()
         
     if being_observed:
         logger.info("SENDING OBS")
 
+        # Index this frame's objects once for both observing and acting
+        index = EntityIndex(game)
+
         # Send observation
-        r.lpush("observation", json.dumps(observe(game)))
+        obs = observe(game, index)
+        if encoder:
+            actor_io.send_observation(encoder.encode(obs))
+        else:
+            actor_io.send_observation(codec.encode_observation(obs))
+        if actor_io.dropped or transport.dropped:
+            logger.info("DROPPED OBS: %d" % (actor_io.dropped + transport.dropped))
 
         logger.info("GETTING ACT(S)")
 
-        # Get action
-        action_len = r.llen("action")
-
-        logger.info("ACT LEN: " + str(action_len))
+        # Take every action batch the I/O thread has fetched so far, then
+        # dispatch them locally. Each action batch is a single message, so
+        # batches can't be split
+        for payload in actor_io.recv_actions():
+            batch = codec.decode_actions(payload)
 
-        while action_len > 0 and action_len % 2 == 0:
-            # Get action type and data
-            action_type = r.brpop("action")
-            action_data = r.brpop("action")
+            logging.info("Action Batch: " + str(batch))
 
-            logging.info("Action Type: " + str(action_type))
-            logging.info("Action Data: " + str(action_data))
+            # Hold the batch for its remaining ticks, unless it resets
+            held_actions = batch.actions
+            repeat_left = batch.repeat - 1
 
-            act(action_type, action_data, game, ui)
+            for action in batch.actions:
+                act(action, game, ui, index)
 
-            action_len = r.llen("action")
+            action_step = batch.step
+            if encoder:
+                encoder.acknowledge(batch.ack)
         
         logger.info("End of current obs/act iteration: Step %d" % step)
     
@@ -0,0 +1,51 @@
+# MIT License
+# 
+# Copyright (c) 2023 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Transports which move encoded messages between a `RemoteController`
+and the TLoL-RL actor."""
+
+import os
+
+from tlol_rl.transports import lib
+from tlol_rl.transports import redis_transport
+from tlol_rl.transports import redis_streams_transport
+from tlol_rl.transports import shm_transport
+from tlol_rl.transports import tcp_transport
+
+TRANSPORT_ENV = "TLOL_RL_TRANSPORT"
+
+
+def get(transport_name):
+    """Get a transport class by name. Errors if the transport doesn't exist."""
+    transports = {c.name(): c for c in lib.Transport.all_subclasses()}
+    if transport_name not in transports:
+        raise lib.TransportError(
+            "Unknown transport: '%s', valid transports: %s" % (
+                transport_name, ", ".join(sorted(transports))))
+    return transports[transport_name]
+
+
+def from_environ(environ=None):
+    """Create the actor side of the transport described by the environment
+    variables which `Transport.actor_environ` gave the TLoL-RL server."""
+    environ = os.environ if environ is None else environ
+    transport_cls = get(environ.get(TRANSPORT_ENV, "redis"))
+    return transport_cls.from_environ(environ)
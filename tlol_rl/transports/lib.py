@@ -0,0 +1,136 @@
+# MIT License
+# 
+# Copyright (c) 2023 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""The base transport which every `RemoteController` transport implements.
+
+A transport carries three channels of opaque `codec` payloads:
+    observation: Observations sent by the actor to the controller.
+    action:      Action batches sent by the controller to the actor.
+    command:     Control commands (e.g. `start_observing`) sent by the
+                 controller to the actor.
+
+The controller side uses `send_command`, `send_actions`, `recv_observation`
+and `step`, while the actor side uses `recv_command`, `send_observation` and
+`recv_actions`.
+
+In `latest_only` mode, a newer observation replaces any observation which
+the controller hasn't received yet, so a slow controller always gets the
+newest observation instead of an ever growing backlog.
+
+The controller passes the settings the actor needs to construct its side
+of the transport through the environment of the TLoL-RL server process
+(see `actor_environ` and `from_environ`).
+"""
+
+OBSERVATION = "observation"
+ACTION      = "action"
+COMMAND     = "command"
+
+CHANNELS = (OBSERVATION, ACTION, COMMAND)
+
+
+class TransportError(Exception):
+    pass
+
+
+class Transport(object):
+    """Base class for the different ways of reaching a TLoL-RL actor.
+    Args:
+        latest_only: Whether only the newest observation is kept.
+    """
+
+    # Whether pending messages and read offsets survive a controller
+    # reconnect, in which case the controller doesn't flush them.
+    resumable = False
+
+    def __init__(self, latest_only=False):
+        self.latest_only = latest_only
+
+        # Observations replaced before they were received, as seen by this
+        # side of the transport
+        self.dropped = 0
+
+    @classmethod
+    def name(cls):
+        return cls.__name__
+
+    @classmethod
+    def all_subclasses(cls):
+        """An iterator over all subclasses of `cls`."""
+        for s in cls.__subclasses__():
+            yield s
+            for c in s.all_subclasses():
+                yield c
+
+    @classmethod
+    def from_environ(cls, environ):
+        """Create the actor side of this transport from `actor_environ`."""
+        raise NotImplementedError()
+
+    @staticmethod
+    def latest_only_from_environ(environ):
+        return environ.get("TLOL_RL_LATEST_ONLY", "0") == "1"
+
+    def actor_environ(self):
+        """Environment variables which let the actor reach this transport."""
+        return {
+            "TLOL_RL_TRANSPORT": self.name(),
+            "TLOL_RL_LATEST_ONLY": "1" if self.latest_only else "0"
+        }
+
+    def clear(self, *channels):
+        """Drop any pending messages on `channels`."""
+        raise NotImplementedError()
+
+    def send_command(self, command):
+        """Send a command string to the actor."""
+        raise NotImplementedError()
+
+    def send_actions(self, payload):
+        """Send an encoded action batch to the actor."""
+        raise NotImplementedError()
+
+    def recv_observation(self, timeout):
+        """Block for up to `timeout` seconds for the next encoded observation.
+        Returns None if no observation arrived in time."""
+        raise NotImplementedError()
+
+    def step(self, payload, timeout):
+        """Send an encoded action batch and wait for the next observation.
+        Transports which can do both in one round trip override this."""
+        self.send_actions(payload)
+        return self.recv_observation(timeout)
+
+    def recv_command(self):
+        """Get the next pending command string, or None. Never blocks."""
+        raise NotImplementedError()
+
+    def send_observation(self, payload):
+        """Send an encoded observation to the controller."""
+        raise NotImplementedError()
+
+    def recv_actions(self):
+        """Get all of the pending encoded action batches. Never blocks."""
+        raise NotImplementedError()
+
+    def close(self):
+        """Release any resources held by the transport."""
+        pass
@@ -0,0 +1,186 @@
+# MIT License
+# 
+# Copyright (c) 2023 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Transport over Redis Streams, which keeps per-consumer offsets."""
+
+import redis
+
+from tlol_rl.transports import lib
+from tlol_rl.transports import redis_transport
+
+_DATA = b"data"
+
+
+class RedisStreamsTransport(redis_transport.RedisTransport):
+    """Sends every message through a Redis stream per channel.
+
+    The controller reads observations through a consumer group, so its read
+    offset lives in Redis and a reconnecting controller resumes where it
+    left off instead of flushing the queues. The actor only reads the action
+    and command streams, keeping its offsets in memory. They start at the
+    end of the streams when the actor attaches, so a restarted actor doesn't
+    replay the actions and commands its predecessor already applied.
+
+    Args:
+        host: Host of the Redis server.
+        port: Port of the Redis server.
+        db: Redis logical database.
+        prefix: Prefix of every key used by this instance.
+        unix_socket: Optional Unix domain socket path of the Redis server.
+        group: Consumer group the controller reads observations with. None
+            for the actor side of the transport.
+        consumer: Consumer name within `group`.
+        maxlen: Approximate number of entries kept in each stream.
+        skip_backlog: Whether `recv_observation` skips straight to the newest
+            pending observation, instead of returning them in order.
+        latest_only: Whether the actor trims the observation stream down to
+            its newest entry. Implies `skip_backlog`.
+    """
+
+    resumable = True
+
+    def __init__(self,
+                 host="localhost",
+                 port=6379,
+                 db=0,
+                 prefix="",
+                 unix_socket=None,
+                 group="controller",
+                 consumer="controller",
+                 maxlen=1024,
+                 skip_backlog=False,
+                 latest_only=False):
+        super(RedisStreamsTransport, self).__init__(
+            host=host,
+            port=port,
+            db=db,
+            prefix=prefix,
+            unix_socket=unix_socket,
+            latest_only=latest_only)
+        self.group = group
+        self.consumer = consumer
+        self.maxlen = maxlen
+        self.skip_backlog = skip_backlog or latest_only
+        if group:
+            self._create_group()
+        else:
+            self._last_ids = {channel: self._last_id(channel)
+                              for channel in (lib.ACTION, lib.COMMAND)}
+
+    @classmethod
+    def name(cls):
+        return "redis_streams"
+
+    @classmethod
+    def from_environ(cls, environ):
+        return cls(host=environ.get("TLOL_RL_REDIS_HOST", "localhost"),
+                   port=int(environ.get("TLOL_RL_REDIS_PORT", 6379)),
+                   db=int(environ.get("TLOL_RL_REDIS_DB", 0)),
+                   prefix=environ.get("TLOL_RL_REDIS_PREFIX", ""),
+                   unix_socket=environ.get("TLOL_RL_REDIS_SOCKET") or None,
+                   group=None,
+                   maxlen=int(environ.get("TLOL_RL_REDIS_STREAMS_MAXLEN", 1024)),
+                   latest_only=cls.latest_only_from_environ(environ))
+
+    def actor_environ(self):
+        environ = super(RedisStreamsTransport, self).actor_environ()
+        environ["TLOL_RL_REDIS_STREAMS_MAXLEN"] = str(self.maxlen)
+        return environ
+
+    def _create_group(self):
+        try:
+            self.r.xgroup_create(self.keys[lib.OBSERVATION], self.group, id="$", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def _last_id(self, channel):
+        """Id of the newest entry ever added to a channel's stream."""
+        try:
+            return self.r.xinfo_stream(self.keys[channel])["last-generated-id"]
+        except redis.ResponseError:
+            # No such stream yet, so every entry is new
+            return b"0-0"
+
+    def clear(self, *channels):
+        """Trim the streams rather than deleting them, so the offsets of the
+        consumer group and the actor stay valid."""
+        pipe = self.r.pipeline(transaction=False)
+        for channel in channels:
+            pipe.xtrim(self.keys[channel], maxlen=0, approximate=False)
+        pipe.execute()
+
+    def _add(self, pipe, channel, payload, maxlen=None):
+        pipe.xadd(self.keys[channel], {_DATA: payload},
+                  maxlen=maxlen or self.maxlen,
+                  approximate=maxlen is None)
+
+    def send_command(self, command):
+        self._add(self.r, lib.COMMAND, command)
+
+    def send_actions(self, payload):
+        self._add(self.r, lib.ACTION, payload)
+
+    def _read_observations(self, client, timeout):
+        return client.xreadgroup(
+            self.group,
+            self.consumer,
+            {self.keys[lib.OBSERVATION]: ">"},
+            count=self.maxlen if self.skip_backlog else 1,
+            block=int(timeout * 1000),
+            noack=True)
+
+    def _parse_observations(self, reply):
+        if not reply:
+            return None
+        entries = reply[0][1]
+        self.dropped += len(entries) - 1
+        return entries[-1][1][_DATA]
+
+    def recv_observation(self, timeout):
+        return self._parse_observations(self._read_observations(self.r, timeout))
+
+    def step(self, payload, timeout):
+        pipe = self.r.pipeline(transaction=False)
+        self._add(pipe, lib.ACTION, payload)
+        self._read_observations(pipe, timeout)
+        return self._parse_observations(pipe.execute()[-1])
+
+    def _read(self, channel, count=None):
+        reply = self.r.xread({self.keys[channel]: self._last_ids[channel]}, count=count)
+        if not reply:
+            return []
+        entries = reply[0][1]
+        self._last_ids[channel] = entries[-1][0]
+        return [fields[_DATA] for _, fields in entries]
+
+    def recv_command(self):
+        commands = self._read(lib.COMMAND, count=1)
+        return commands[0].decode("utf-8") if commands else None
+
+    def send_observation(self, payload):
+        if self.latest_only:
+            self._add(self.r, lib.OBSERVATION, payload, maxlen=1)
+        else:
+            self._add(self.r, lib.OBSERVATION, payload)
+
+    def recv_actions(self):
+        return self._read(lib.ACTION)
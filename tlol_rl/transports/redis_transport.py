@@ -0,0 +1,204 @@
+# MIT License
+# 
+# Copyright (c) 2023 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Transport over the `observation`, `action` and `command` Redis lists."""
+
+import redis
+from redis import asyncio as redis_asyncio
+
+from tlol_rl.transports import lib
+
+
+class RedisTransport(lib.Transport):
+    """Sends every message through a Redis server using one list per channel.
+
+    Messages are `lpush`ed by the sender and popped from the other end of the
+    list by the receiver, so each channel is a FIFO queue. In `latest_only`
+    mode the actor atomically trims the observation list down to the
+    observation it has just pushed.
+
+    Every key is namespaced by `prefix`, so many game instances can share
+    one Redis server, e.g. with a prefix of `game_3:` the observations of
+    that instance go through the `game_3:observation` list.
+
+    Args:
+        host: Host of the Redis server.
+        port: Port of the Redis server.
+        db: Redis logical database.
+        prefix: Prefix of every key used by this instance.
+        unix_socket: Optional Unix domain socket path of the Redis server,
+            which is used instead of `host` and `port`.
+        latest_only: Whether only the newest observation is kept.
+    """
+
+    def __init__(self,
+                 host="localhost",
+                 port=6379,
+                 db=0,
+                 prefix="",
+                 unix_socket=None,
+                 latest_only=False):
+        super(RedisTransport, self).__init__(latest_only=latest_only)
+        self.host = host
+        self.port = port
+        self.db = db
+        self.prefix = prefix
+        self.unix_socket = unix_socket
+        self.keys = {channel: prefix + channel for channel in lib.CHANNELS}
+        if unix_socket:
+            self.pool = redis.ConnectionPool(
+                connection_class=redis.UnixDomainSocketConnection,
+                path=unix_socket,
+                db=db)
+        else:
+            self.pool = redis.ConnectionPool(host=host, port=port, db=db)
+        self.r = redis.Redis(connection_pool=self.pool)
+
+    @classmethod
+    def name(cls):
+        return "redis"
+
+    @classmethod
+    def from_environ(cls, environ):
+        return cls(host=environ.get("TLOL_RL_REDIS_HOST", "localhost"),
+                   port=int(environ.get("TLOL_RL_REDIS_PORT", 6379)),
+                   db=int(environ.get("TLOL_RL_REDIS_DB", 0)),
+                   prefix=environ.get("TLOL_RL_REDIS_PREFIX", ""),
+                   unix_socket=environ.get("TLOL_RL_REDIS_SOCKET") or None,
+                   latest_only=cls.latest_only_from_environ(environ))
+
+    def actor_environ(self):
+        environ = super(RedisTransport, self).actor_environ()
+        environ.update({
+            "TLOL_RL_REDIS_HOST": str(self.host),
+            "TLOL_RL_REDIS_PORT": str(self.port),
+            "TLOL_RL_REDIS_DB": str(self.db),
+            "TLOL_RL_REDIS_PREFIX": self.prefix,
+            "TLOL_RL_REDIS_SOCKET": self.unix_socket or ""
+        })
+        return environ
+
+    def clear(self, *channels):
+        self.r.delete(*[self.keys[channel] for channel in channels])
+
+    def send_command(self, command):
+        self.r.lpush(self.keys[lib.COMMAND], command)
+
+    def send_actions(self, payload):
+        self.r.lpush(self.keys[lib.ACTION], payload)
+
+    def recv_observation(self, timeout):
+        reply = self.r.brpop(self.keys[lib.OBSERVATION], timeout)
+        return reply[1] if reply != None else None
+
+    def step(self, payload, timeout):
+        """Pipeline the action batch with the blocking observation fetch so
+        the step only costs a single round trip."""
+        pipe = self.r.pipeline(transaction=False)
+        pipe.lpush(self.keys[lib.ACTION], payload)
+        pipe.brpop(self.keys[lib.OBSERVATION], timeout)
+        reply = pipe.execute()[-1]
+        return reply[1] if reply != None else None
+
+    def recv_command(self):
+        command = self.r.rpop(self.keys[lib.COMMAND])
+        return command.decode("utf-8") if command != None else None
+
+    def send_observation(self, payload):
+        if not self.latest_only:
+            self.r.lpush(self.keys[lib.OBSERVATION], payload)
+            return
+        pipe = self.r.pipeline(transaction=True)
+        pipe.lpush(self.keys[lib.OBSERVATION], payload)
+        pipe.ltrim(self.keys[lib.OBSERVATION], 0, 0)
+        length, _ = pipe.execute()
+        self.dropped += length - 1
+
+    def recv_actions(self):
+        """Fetch and remove every pending action batch in one atomic round
+        trip, oldest first."""
+        pipe = self.r.pipeline(transaction=True)
+        pipe.lrange(self.keys[lib.ACTION], 0, -1)
+        pipe.delete(self.keys[lib.ACTION])
+        payloads, _ = pipe.execute()
+        payloads.reverse()
+        return payloads
+
+    def close(self):
+        self.pool.disconnect()
+
+
+class AsyncRedisTransport(object):
+    """The controller side of `RedisTransport` on an asyncio Redis client.
+
+    It reaches the same keys as the `RedisTransport` it's created from with
+    `from_transport`, whose actor side is unchanged, but its methods are
+    coroutines, so many controllers can wait on their observations in one
+    event loop.
+    """
+
+    def __init__(self, host="localhost", port=6379, db=0, prefix="", unix_socket=None):
+        self.keys = {channel: prefix + channel for channel in lib.CHANNELS}
+        if unix_socket:
+            self.pool = redis_asyncio.ConnectionPool(
+                connection_class=redis_asyncio.UnixDomainSocketConnection,
+                path=unix_socket,
+                db=db)
+        else:
+            self.pool = redis_asyncio.ConnectionPool(host=host, port=port, db=db)
+        self.r = redis_asyncio.Redis(connection_pool=self.pool)
+
+    @classmethod
+    def from_transport(cls, transport):
+        """Create the asyncio equivalent of a `RedisTransport`."""
+        if type(transport) is not RedisTransport:
+            raise lib.TransportError(
+                "No asyncio equivalent of the %s transport" % transport.name())
+        return cls(host=transport.host,
+                   port=transport.port,
+                   db=transport.db,
+                   prefix=transport.prefix,
+                   unix_socket=transport.unix_socket)
+
+    async def clear(self, *channels):
+        await self.r.delete(*[self.keys[channel] for channel in channels])
+
+    async def send_command(self, command):
+        await self.r.lpush(self.keys[lib.COMMAND], command)
+
+    async def send_actions(self, payload):
+        await self.r.lpush(self.keys[lib.ACTION], payload)
+
+    async def recv_observation(self, timeout):
+        reply = await self.r.brpop(self.keys[lib.OBSERVATION], timeout)
+        return reply[1] if reply != None else None
+
+    async def step(self, payload, timeout):
+        """Pipeline the action batch with the blocking observation fetch."""
+        async with self.r.pipeline(transaction=False) as pipe:
+            pipe.lpush(self.keys[lib.ACTION], payload)
+            pipe.brpop(self.keys[lib.OBSERVATION], timeout)
+            reply = (await pipe.execute())[-1]
+        return reply[1] if reply != None else None
+
+    async def close(self):
+        await self.r.close()
+        await self.pool.disconnect()
@@ -0,0 +1,253 @@
+# MIT License
+# 
+# Copyright (c) 2023 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Transport over memory-mapped single-producer/single-consumer ring buffers.
+
+Only works when the controller and the TLoL-RL server run on the same host,
+but removes the Redis server and the socket stack from every step.
+
+The controller creates a file holding one `RingBuffer` per channel and maps
+it into memory, then the actor maps the same file. Each ring stores
+length-prefixed messages between a `head` counter, which only the producer
+writes, and a `tail` counter, which only the consumer writes.
+"""
+
+import mmap
+import os
+import struct
+import tempfile
+import time
+
+from tlol_rl.transports import lib
+
+_INDEX  = struct.Struct("<Q")
+_LENGTH = struct.Struct("<I")
+
+
+class RingBuffer(object):
+    """A single-producer/single-consumer ring of length-prefixed messages
+    stored in a shared buffer."""
+
+    # `head` and `tail` live on separate cache lines.
+    HEADER_SIZE = 128
+    _TAIL_OFFSET = 64
+
+    def __init__(self, buf, offset, capacity):
+        self._buf = buf
+        self._head = offset
+        self._tail = offset + self._TAIL_OFFSET
+        self._data = offset + self.HEADER_SIZE
+        self.capacity = capacity
+
+    @classmethod
+    def size(cls, capacity):
+        """Bytes of shared buffer used by a ring with `capacity` bytes of data."""
+        return cls.HEADER_SIZE + capacity
+
+    def _load(self, offset):
+        return _INDEX.unpack_from(self._buf, offset)[0]
+
+    def _store(self, offset, value):
+        _INDEX.pack_into(self._buf, offset, value)
+
+    def _write(self, pos, data):
+        start = pos % self.capacity
+        first = min(len(data), self.capacity - start)
+        self._buf[self._data + start:self._data + start + first] = data[:first]
+        if first < len(data):
+            rest = len(data) - first
+            self._buf[self._data:self._data + rest] = data[first:]
+
+    def _read(self, pos, size):
+        start = pos % self.capacity
+        first = min(size, self.capacity - start)
+        data = self._buf[self._data + start:self._data + start + first]
+        if first < size:
+            data += self._buf[self._data:self._data + size - first]
+        return data
+
+    def put(self, payload):
+        """Append a message. Returns False if the ring doesn't have room."""
+        size = _LENGTH.size + len(payload)
+        if size > self.capacity:
+            raise lib.TransportError(
+                "Message of %d bytes is larger than the ring" % len(payload))
+        head = self._load(self._head)
+        if size > self.capacity - (head - self._load(self._tail)):
+            return False
+        self._write(head, _LENGTH.pack(len(payload)))
+        self._write(head + _LENGTH.size, payload)
+        # Publish the message only once it has been completely written
+        self._store(self._head, head + size)
+        return True
+
+    def get(self):
+        """Pop the oldest message, or return None if the ring is empty."""
+        tail = self._load(self._tail)
+        if tail == self._load(self._head):
+            return None
+        (length,) = _LENGTH.unpack(self._read(tail, _LENGTH.size))
+        payload = self._read(tail + _LENGTH.size, length)
+        self._store(self._tail, tail + _LENGTH.size + length)
+        return payload
+
+    def clear(self):
+        """Drop all pending messages. Must only be called by the consumer."""
+        self._store(self._tail, self._load(self._head))
+
+
+class ShmTransport(lib.Transport):
+    """Exchanges messages with an actor on the same host through ring
+    buffers in a memory-mapped file.
+
+    Args:
+        path: File backing the shared memory. Defaults to a new, uniquely
+            named file in the temporary directory, so every controller of a
+            process gets its own rings.
+        capacity: Bytes of message data each channel can hold.
+        create: Whether to create (and truncate) the file. The controller
+            creates it and the actor attaches to it.
+        spin_seconds: How long a blocking receive busy-polls, only yielding
+            its time slice, before it starts sleeping between polls.
+        poll_interval: Sleep between polls once spinning has finished.
+        latest_only: Whether `recv_observation` drains the observation ring
+            and only returns the newest observation.
+    """
+
+    def __init__(self,
+                 path=None,
+                 capacity=1 << 20,
+                 create=True,
+                 spin_seconds=0.002,
+                 poll_interval=0.0002,
+                 latest_only=False):
+        super(ShmTransport, self).__init__(latest_only=latest_only)
+        if path is None:
+            if not create:
+                raise ValueError("The actor needs the path of the controller's rings.")
+            fd, path = tempfile.mkstemp(prefix="tlol_rl_", suffix=".shm")
+            os.close(fd)
+        self.path = path
+        self.capacity = capacity
+        self.spin_seconds = spin_seconds
+        self.poll_interval = poll_interval
+        self._create = create
+
+        size = len(lib.CHANNELS) * RingBuffer.size(capacity)
+        if create:
+            with open(path, "wb") as f:
+                f.truncate(size)
+        with open(path, "r+b") as f:
+            self._mmap = mmap.mmap(f.fileno(), size)
+
+        self._rings = {
+            channel: RingBuffer(self._mmap, i * RingBuffer.size(capacity), capacity)
+            for i, channel in enumerate(lib.CHANNELS)}
+
+        # Rings which this side of the transport consumes
+        if create:
+            self._consumed = (lib.OBSERVATION,)
+        else:
+            self._consumed = (lib.ACTION, lib.COMMAND)
+
+    @classmethod
+    def name(cls):
+        return "shm"
+
+    @classmethod
+    def from_environ(cls, environ):
+        return cls(path=environ["TLOL_RL_SHM_PATH"],
+                   capacity=int(environ["TLOL_RL_SHM_CAPACITY"]),
+                   create=False,
+                   latest_only=cls.latest_only_from_environ(environ))
+
+    def actor_environ(self):
+        environ = super(ShmTransport, self).actor_environ()
+        environ.update({
+            "TLOL_RL_SHM_PATH": self.path,
+            "TLOL_RL_SHM_CAPACITY": str(self.capacity)
+        })
+        return environ
+
+    def clear(self, *channels):
+        """Drop pending messages on the channels which this side consumes.
+        Channels produced by this side are left to their consumer."""
+        for channel in channels:
+            if channel in self._consumed:
+                self._rings[channel].clear()
+
+    def _put(self, channel, payload):
+        if not self._rings[channel].put(payload):
+            raise lib.TransportError("The %s ring is full" % channel)
+
+    def send_command(self, command):
+        self._put(lib.COMMAND, command.encode("utf-8"))
+
+    def send_actions(self, payload):
+        self._put(lib.ACTION, payload)
+
+    def recv_observation(self, timeout):
+        ring = self._rings[lib.OBSERVATION]
+        start_time = time.perf_counter()
+        while True:
+            payload = ring.get()
+            if payload != None:
+                if self.latest_only:
+                    newer = ring.get()
+                    while newer != None:
+                        self.dropped += 1
+                        payload, newer = newer, ring.get()
+                return payload
+            elapsed = time.perf_counter() - start_time
+            if elapsed > timeout:
+                return None
+            # Yield while spinning so a producer sharing our core can run
+            time.sleep(self.poll_interval if elapsed > self.spin_seconds else 0)
+
+    def recv_command(self):
+        command = self._rings[lib.COMMAND].get()
+        return command.decode("utf-8") if command != None else None
+
+    def send_observation(self, payload):
+        """Observations are dropped rather than blocking the game when the
+        controller has fallen a whole ring behind."""
+        if not self._rings[lib.OBSERVATION].put(payload):
+            self.dropped += 1
+
+    def recv_actions(self):
+        ring = self._rings[lib.ACTION]
+        payloads = []
+        payload = ring.get()
+        while payload != None:
+            payloads.append(payload)
+            payload = ring.get()
+        return payloads
+
+    def close(self):
+        if self._mmap is not None:
+            self._rings = {}
+            self._mmap.close()
+            self._mmap = None
+            if self._create:
+                try:
+                    os.remove(self.path)
+                except OSError:
+                    pass
@@ -0,0 +1,65 @@
+# MIT License
+# 
+# Copyright (c) 2023 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Tests for the shared memory transport."""
+
+import os
+
+from absl.testing import absltest
+
+from tlol_rl.transports import shm_transport
+
+
+class ShmTransportTest(absltest.TestCase):
+
+    def _attach(self, controller):
+        actor = shm_transport.ShmTransport.from_environ(controller.actor_environ())
+        self.addCleanup(actor.close)
+        return actor
+
+    def test_transports_of_one_process_are_isolated(self):
+        first = shm_transport.ShmTransport(capacity=1 << 12)
+        self.addCleanup(first.close)
+        second = shm_transport.ShmTransport(capacity=1 << 12)
+        self.addCleanup(second.close)
+        self.assertNotEqual(first.path, second.path)
+
+        first_actor = self._attach(first)
+        second_actor = self._attach(second)
+
+        first.send_actions(b"first")
+        second.send_actions(b"second")
+        self.assertEqual(first_actor.recv_actions(), [b"first"])
+        self.assertEqual(second_actor.recv_actions(), [b"second"])
+
+        second_actor.send_observation(b"obs")
+        self.assertIsNone(first.recv_observation(0))
+        self.assertEqual(second.recv_observation(1), b"obs")
+
+    def test_close_removes_file(self):
+        transport = shm_transport.ShmTransport(capacity=1 << 12)
+        self.assertTrue(os.path.exists(transport.path))
+        transport.close()
+        self.assertFalse(os.path.exists(transport.path))
+
+
+if __name__ == "__main__":
+    absltest.main()
@@ -0,0 +1,249 @@
+# MIT License
+# 
+# Copyright (c) 2023 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Transport over a direct TCP connection between the controller and the
+actor, without a broker in between.
+
+The controller listens for the actor, which connects to it once the game
+has loaded the actor. Every message travels over that single connection as
+a `_FRAME`, i.e. the index of its channel in `lib.CHANNELS` and its length,
+followed by the message itself. Each side buffers the messages it receives
+per channel until they are asked for.
+"""
+
+import collections
+import select
+import socket
+import struct
+import time
+
+from tlol_rl.transports import lib
+
+_FRAME = struct.Struct("<BI") # channel index, message length
+_RECV_SIZE = 1 << 16
+
+
+class TcpTransport(lib.Transport):
+    """Exchanges length-prefixed messages with the actor over TCP.
+
+    Args:
+        host: Address the controller listens on.
+        port: Port the controller listens on. A free port is picked if 0.
+        listen: Whether to listen for the other side (the controller) or
+            connect to it (the actor).
+        actor_host: Address the actor connects to. Defaults to `host`, or
+            the loopback address if `host` is a wildcard address.
+        connect_timeout: Seconds the actor waits for each connection attempt.
+        latest_only: Whether `recv_observation` skips to the newest received
+            observation.
+    """
+
+    def __init__(self,
+                 host="127.0.0.1",
+                 port=0,
+                 listen=True,
+                 actor_host=None,
+                 connect_timeout=1.0,
+                 latest_only=False):
+        super(TcpTransport, self).__init__(latest_only=latest_only)
+        self.host = host
+        self.port = port
+        self.listen = listen
+        self.connect_timeout = connect_timeout
+        if actor_host is None:
+            actor_host = "127.0.0.1" if host in ("", "0.0.0.0") else host
+        self.actor_host = actor_host
+
+        self._sock = None
+        self._buffer = bytearray()
+        self._inbox = {channel: collections.deque() for channel in lib.CHANNELS}
+
+        # Messages sent by the controller before the actor connected
+        self._outbox = []
+
+        self._server = None
+        if listen:
+            self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self._server.bind((host, port))
+            self._server.listen(1)
+            self.port = self._server.getsockname()[1]
+            self._consumed = (lib.OBSERVATION,)
+        else:
+            self._consumed = (lib.ACTION, lib.COMMAND)
+
+    @classmethod
+    def name(cls):
+        return "tcp"
+
+    @classmethod
+    def from_environ(cls, environ):
+        return cls(host=environ["TLOL_RL_TCP_HOST"],
+                   port=int(environ["TLOL_RL_TCP_PORT"]),
+                   listen=False,
+                   latest_only=cls.latest_only_from_environ(environ))
+
+    def actor_environ(self):
+        environ = super(TcpTransport, self).actor_environ()
+        environ.update({
+            "TLOL_RL_TCP_HOST": self.actor_host,
+            "TLOL_RL_TCP_PORT": str(self.port)
+        })
+        return environ
+
+    def _connection(self, timeout):
+        """Get the connection to the other side, waiting up to `timeout`
+        seconds for it. Returns None if there's no connection yet."""
+        if self._sock is not None:
+            return self._sock
+
+        if self.listen:
+            ready, _, _ = select.select([self._server], [], [], max(timeout, 0))
+            if not ready:
+                return None
+            sock, _ = self._server.accept()
+        else:
+            try:
+                sock = socket.create_connection(
+                    (self.host, self.port), self.connect_timeout)
+            except OSError:
+                return None
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setblocking(True)
+        self._sock = sock
+        self._buffer = bytearray()
+
+        outbox, self._outbox = self._outbox, []
+        for channel, payload in outbox:
+            self._send(channel, payload)
+        return sock
+
+    def _disconnect(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def _send(self, channel, payload):
+        """Send a message, which the controller keeps until the actor
+        connects and the actor drops if the controller is unreachable."""
+        sock = self._connection(0)
+        if sock is None:
+            if self.listen:
+                self._outbox.append((channel, payload))
+            elif channel == lib.OBSERVATION:
+                self.dropped += 1
+            return
+        try:
+            sock.sendall(
+                _FRAME.pack(lib.CHANNELS.index(channel), len(payload)) + payload)
+        except OSError:
+            self._disconnect()
+            if self.listen:
+                self._outbox.append((channel, payload))
+
+    def _poll(self, timeout):
+        """Receive whatever arrives within `timeout` seconds and sort the
+        complete messages into the inbox of their channel."""
+        deadline = time.perf_counter() + timeout
+        sock = self._connection(timeout)
+        while sock is not None:
+            remaining = max(deadline - time.perf_counter(), 0)
+            ready, _, _ = select.select([sock], [], [], remaining)
+            if not ready:
+                return
+            try:
+                data = sock.recv(_RECV_SIZE)
+            except OSError:
+                data = b""
+            if not data:
+                # The other side went away, e.g. the game was restarted
+                self._disconnect()
+                return
+            self._buffer += data
+            self._parse()
+            # Only keep waiting while nothing has been received
+            deadline = time.perf_counter()
+
+    def _parse(self):
+        offset = 0
+        while len(self._buffer) - offset >= _FRAME.size:
+            index, length = _FRAME.unpack_from(self._buffer, offset)
+            end = offset + _FRAME.size + length
+            if len(self._buffer) < end:
+                break
+            if index >= len(lib.CHANNELS):
+                raise lib.TransportError("Invalid channel index: %d" % index)
+            self._inbox[lib.CHANNELS[index]].append(
+                bytes(self._buffer[offset + _FRAME.size:end]))
+            offset = end
+        del self._buffer[:offset]
+
+    def clear(self, *channels):
+        """Drop pending messages on the channels which this side consumes,
+        and the not yet sent messages on the ones it produces."""
+        self._poll(0)
+        for channel in channels:
+            if channel in self._consumed:
+                self._inbox[channel].clear()
+        self._outbox = [(c, p) for c, p in self._outbox if c not in channels]
+
+    def send_command(self, command):
+        self._send(lib.COMMAND, command.encode("utf-8"))
+
+    def send_actions(self, payload):
+        self._send(lib.ACTION, payload)
+
+    def recv_observation(self, timeout):
+        inbox = self._inbox[lib.OBSERVATION]
+        deadline = time.perf_counter() + timeout
+        while not inbox:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return None
+            self._poll(remaining)
+        if self.latest_only:
+            self._poll(0)
+            self.dropped += len(inbox) - 1
+            payload = inbox.pop()
+            inbox.clear()
+            return payload
+        return inbox.popleft()
+
+    def recv_command(self):
+        self._poll(0)
+        inbox = self._inbox[lib.COMMAND]
+        return inbox.popleft().decode("utf-8") if inbox else None
+
+    def send_observation(self, payload):
+        self._send(lib.OBSERVATION, payload)
+
+    def recv_actions(self):
+        self._poll(0)
+        inbox = self._inbox[lib.ACTION]
+        payloads = list(inbox)
+        inbox.clear()
+        return payloads
+
+    def close(self):
+        self._disconnect()
+        if self._server is not None:
+            self._server.close()
+            self._server = None
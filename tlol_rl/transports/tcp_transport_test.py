@@ -0,0 +1,140 @@
+# MIT License
+# 
+# Copyright (c) 2023 MiscellaneousStuff
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Tests for the TCP transport."""
+
+import socket
+import time
+
+from absl.testing import absltest
+
+from tlol_rl.transports import lib
+from tlol_rl.transports import tcp_transport
+
+
+def poll(fn, timeout=2.0):
+    """Call `fn` until it returns something, for up to `timeout` seconds."""
+    deadline = time.perf_counter() + timeout
+    while True:
+        result = fn()
+        if result or time.perf_counter() > deadline:
+            return result
+        time.sleep(0.001)
+
+
+class TcpTransportTest(absltest.TestCase):
+
+    def setUp(self):
+        super(TcpTransportTest, self).setUp()
+        self.controller = tcp_transport.TcpTransport()
+        self.addCleanup(self.controller.close)
+
+    def _attach(self):
+        actor = tcp_transport.TcpTransport.from_environ(
+            self.controller.actor_environ())
+        self.addCleanup(actor.close)
+        return actor
+
+    def test_framing(self):
+        actor = self._attach()
+        payloads = [b"", b"a", bytes(range(256)) * 1024]
+        for payload in payloads:
+            actor.send_observation(payload)
+        for payload in payloads:
+            self.assertEqual(self.controller.recv_observation(2), payload)
+
+        self.controller.send_actions(b"first")
+        self.controller.send_actions(b"second")
+        self.controller.send_command("start_observing")
+        actions = poll(actor.recv_actions)
+        if len(actions) < 2:
+            actions += poll(actor.recv_actions)
+        self.assertEqual(actions, [b"first", b"second"])
+        self.assertEqual(poll(actor.recv_command), "start_observing")
+
+    def test_frames_split_across_reads(self):
+        sock = socket.create_connection(("127.0.0.1", self.controller.port))
+        self.addCleanup(sock.close)
+        index = lib.CHANNELS.index(lib.OBSERVATION)
+        message = b"".join(
+            tcp_transport._FRAME.pack(index, len(p)) + p for p in (b"obs1", b"obs2"))
+        for i in range(len(message)):
+            sock.sendall(message[i:i + 1])
+            # Give every byte its own read
+            self.controller._poll(0.005)
+        self.assertEqual(self.controller.recv_observation(0), b"obs1")
+        self.assertEqual(self.controller.recv_observation(0), b"obs2")
+
+    def test_invalid_channel(self):
+        sock = socket.create_connection(("127.0.0.1", self.controller.port))
+        self.addCleanup(sock.close)
+        sock.sendall(tcp_transport._FRAME.pack(len(lib.CHANNELS), 0))
+        with self.assertRaises(lib.TransportError):
+            self.controller.recv_observation(1)
+
+    def test_outbox_flushed_once_actor_connects(self):
+        self.controller.send_command("start_observing")
+        self.controller.send_actions(b"actions")
+        self.assertLen(self.controller._outbox, 2)
+
+        actor = self._attach()
+        # The actor connects on its first poll, and the controller accepts
+        # it while polling for observations
+        self.assertIsNone(actor.recv_command())
+        self.assertIsNone(self.controller.recv_observation(0.05))
+        self.assertEmpty(self.controller._outbox)
+        self.assertEqual(poll(actor.recv_command), "start_observing")
+        self.assertEqual(poll(actor.recv_actions), [b"actions"])
+
+    def test_clear_drops_outbox(self):
+        self.controller.send_command("start_observing")
+        self.controller.clear(lib.COMMAND)
+        actor = self._attach()
+        self.assertIsNone(actor.recv_command())
+        self.controller.send_actions(b"actions")
+        self.assertEqual(poll(actor.recv_actions), [b"actions"])
+        self.assertIsNone(actor.recv_command())
+
+    def test_actor_reconnects(self):
+        actor = self._attach()
+        actor.send_observation(b"obs1")
+        self.assertEqual(self.controller.recv_observation(2), b"obs1")
+
+        # Drop the connection, the actor notices on its next poll
+        self.controller._disconnect()
+        self.assertTrue(poll(lambda: actor._sock is None or actor.recv_actions()))
+        self.controller.send_actions(b"queued")
+
+        actor.send_observation(b"obs2")
+        self.assertEqual(self.controller.recv_observation(2), b"obs2")
+        self.assertEqual(poll(actor.recv_actions), [b"queued"])
+        self.assertEqual(actor.dropped, 0)
+
+    def test_actor_drops_observations_without_controller(self):
+        actor = self._attach()
+        self.controller.close()
+        poll(lambda: actor._sock is None or actor.recv_actions())
+        actor.send_observation(b"obs")
+        self.assertEqual(actor.dropped, 1)
+
+
+if __name__ == "__main__":
+    absltest.main()